@@ -0,0 +1,264 @@
+# analitica.py
+"""
+Salida Parquet de los pedimentos para análisis (BI), junto al Excel.
+
+Tres datasets con esquema fijo bajo un directorio destino:
+
+    <destino>/items/mes=2025-11/pedimento=254739995004476/part-0.parquet
+    <destino>/fracciones/...
+    <destino>/contribuciones/...
+
+- items:          items costeados (mismo resultado que el API)
+- fracciones:     fracciones del pedimento
+- contribuciones: contribuciones generales y por fracción
+
+Importes y cantidades son float64 (no texto) y fecha_pago es date32.
+Particionar por mes y pedimento permite leer un mes completo con un
+filtro, y volver a exportar un pedimento reemplaza solo su partición
+(también si cambió de mes: se borra la del mes anterior).
+
+Requiere pyarrow.
+"""
+
+import glob
+import shutil
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from builder import (
+    CAMPOS_CONTRIBUCION, CAMPOS_FRACCION,
+    NUMERICOS_CONTRIBUCION, NUMERICOS_FRACCION,
+)
+from snapshot import cargar_para
+from utils import parse_fecha
+from vectorized import ColumnarProcessor
+
+TABLAS = ("items", "fracciones", "contribuciones")
+PARTICIONES = ["mes", "pedimento"]
+SIN_FECHA = "sin_fecha"
+
+
+# ============================================================
+#  ESQUEMAS
+# ============================================================
+# (columna Parquet, clave en el resultado del costeo)
+COLUMNAS_ITEMS = (
+    ("codigo", "codigo"),
+    ("cantidad", "cantidad"),
+    ("precio_unitario", "precio_unitario"),
+    ("valor_aduana", "valor_aduana"),
+    ("tipo_de_cambio", "tipo_de_cambio"),
+    ("dta_fraccion", "dta"),
+    ("contribuciones_fraccion", "contribuciones_fraccion"),
+    ("igi_ige", "IGI/IGE"),
+    ("iva", "IVA"),
+    ("cc", "CC"),
+    ("dta_general", "DTA"),
+    ("prv", "PRV"),
+    ("iva_prv", "IVA/PRV"),
+    ("contrib_gen_prorrateado", "contrib_gen_prorrateado"),
+    ("costo_total", "costo_total"),
+    ("costo_final", "costo_final"),
+)
+
+_CLAVES_ITEMS = frozenset(clave for _, clave in COLUMNAS_ITEMS)
+
+_LLAVES = [
+    pa.field("numero_pedimento", pa.string()),
+    pa.field("fecha_pago", pa.date32()),
+]
+
+_PARTICION = [pa.field(nombre, pa.string()) for nombre in PARTICIONES]
+
+
+def _campos(campos, numericos):
+    return [
+        pa.field(attr, pa.float64() if attr in numericos else pa.string())
+        for attr, _ in campos
+    ]
+
+
+SCHEMA_ITEMS = pa.schema(
+    _LLAVES
+    + [pa.field("codigo", pa.string())]
+    + [pa.field(nombre, pa.float64()) for nombre, _ in COLUMNAS_ITEMS[1:]]
+    # claves de impuesto sin columna propia (CONTRIB_*, GEN_*)
+    + [pa.field("otras_contribuciones", pa.map_(pa.string(), pa.float64()))]
+    + _PARTICION
+)
+
+SCHEMA_FRACCIONES = pa.schema(
+    _LLAVES
+    + [pa.field("fraccion_id", pa.int64())]
+    + _campos(CAMPOS_FRACCION, NUMERICOS_FRACCION)
+    + _PARTICION
+)
+
+SCHEMA_CONTRIBUCIONES = pa.schema(
+    _LLAVES
+    + [pa.field("nivel", pa.string()), pa.field("numero_fraccion", pa.string())]
+    + _campos(CAMPOS_CONTRIBUCION, NUMERICOS_CONTRIBUCION)
+    + _PARTICION
+)
+
+SCHEMAS = {
+    "items": SCHEMA_ITEMS,
+    "fracciones": SCHEMA_FRACCIONES,
+    "contribuciones": SCHEMA_CONTRIBUCIONES,
+}
+
+
+# ============================================================
+#  LLAVES DEL PEDIMENTO
+# ============================================================
+def llaves_pedimento(pedimento):
+    """Columnas comunes a todas las tablas de un pedimento."""
+    fecha = parse_fecha(pedimento.fecha_pago)
+    numero = pedimento.numero_completo or pedimento.numero_pedimento
+    return {
+        "numero_pedimento": numero,
+        "fecha_pago": fecha,
+        "mes": fecha.strftime("%Y-%m") if fecha else SIN_FECHA,
+        "pedimento": numero.replace(" ", ""),
+    }
+
+
+def _con_llaves(columnas, llaves, n, schema):
+    """Tabla con las columnas dadas + las llaves repetidas n veces."""
+    for nombre, valor in llaves.items():
+        columnas[nombre] = [valor] * n
+    return pa.table({f.name: columnas[f.name] for f in schema}, schema=schema)
+
+
+# ============================================================
+#  TABLAS DE UN PEDIMENTO
+# ============================================================
+def tabla_items(resultado, llaves):
+    items = resultado["items"]
+    columnas = {
+        nombre: [item.get(clave) for item in items]
+        for nombre, clave in COLUMNAS_ITEMS
+    }
+    columnas["otras_contribuciones"] = [
+        [(k, v) for k, v in item.items() if k not in _CLAVES_ITEMS]
+        for item in items
+    ]
+    return _con_llaves(columnas, llaves, len(items), SCHEMA_ITEMS)
+
+
+def tabla_fracciones(columnar, llaves):
+    fracciones = columnar.fracciones
+    n = len(fracciones["dta"])
+    columnas = {attr: fracciones[attr] for attr, _ in CAMPOS_FRACCION}
+    columnas["fraccion_id"] = list(range(n))
+    return _con_llaves(columnas, llaves, n, SCHEMA_FRACCIONES)
+
+
+def tabla_contribuciones(columnar, llaves):
+    generales = columnar.pedimento.contribuciones_generales
+    contrib = columnar.contribuciones
+    numero_fraccion = columnar.fracciones["numero_fraccion"]
+
+    columnas = {
+        attr: [getattr(c, attr) for c in generales] + contrib[attr].tolist()
+        for attr, _ in CAMPOS_CONTRIBUCION
+    }
+    # importes no numéricos del XML quedan como nulos
+    for attr in NUMERICOS_CONTRIBUCION:
+        columnas[attr] = [v if isinstance(v, float) else None for v in columnas[attr]]
+
+    n_fraccion = len(contrib["fraccion_id"])
+    columnas["nivel"] = ["pedimento"] * len(generales) + ["fraccion"] * n_fraccion
+    columnas["numero_fraccion"] = [None] * len(generales) + numero_fraccion[contrib["fraccion_id"]].tolist()
+    return _con_llaves(columnas, llaves, len(generales) + n_fraccion, SCHEMA_CONTRIBUCIONES)
+
+
+def tablas_pedimento(columnar, resultado):
+    """{tabla: pyarrow.Table} de un PedimentoColumnar ya costeado."""
+    llaves = llaves_pedimento(columnar.pedimento)
+    return {
+        "items": tabla_items(resultado, llaves),
+        "fracciones": tabla_fracciones(columnar, llaves),
+        "contribuciones": tabla_contribuciones(columnar, llaves),
+    }
+
+
+# ============================================================
+#  ESCRITURA / LECTURA
+# ============================================================
+def borrar_pedimentos(destino, pedimentos, tablas=TABLAS):
+    """Borra las particiones de los pedimentos en todos los meses (un
+       pedimento reexportado con otra fecha de pago cambia de mes)."""
+    for nombre in tablas:
+        raiz = Path(destino) / nombre
+        for pedimento in pedimentos:
+            for particion in raiz.glob(f"mes=*/pedimento={glob.escape(pedimento)}"):
+                shutil.rmtree(particion, ignore_errors=True)
+                # el mes queda vacío si era su único pedimento
+                try:
+                    particion.parent.rmdir()
+                except OSError:
+                    pass
+
+
+def escribir_dataset(tablas, destino):
+    """Escribe cada tabla en su dataset particionado por mes/pedimento.
+       Las particiones existentes de los mismos pedimentos se reemplazan,
+       estén en el mes que estén."""
+    pedimentos = set()
+    for tabla in tablas.values():
+        pedimentos.update(tabla.column("pedimento").unique().to_pylist())
+    borrar_pedimentos(destino, pedimentos, tablas)
+
+    for nombre, tabla in tablas.items():
+        pq.write_to_dataset(
+            tabla,
+            root_path=str(Path(destino) / nombre),
+            partition_cols=PARTICIONES,
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="delete_matching",
+        )
+
+
+def exportar_parquet(xml_source, destino, processor=None, snapshot_dir=None):
+    """Carga (en columnas), costea y escribe los tres datasets de un
+       pedimento. Regresa el resultado del costeo.
+       Con snapshot_dir (y xml_source una ruta) usa el snapshot columnar."""
+    processor = processor or ColumnarProcessor()
+    if snapshot_dir:
+        columnar = cargar_para(processor, xml_source, snapshot_dir)
+    else:
+        columnar = processor.load_pedimento(xml_source)
+    if columnar is None:
+        raise Exception("Error al cargar el pedimento")
+
+    resultado = processor.costear(columnar)
+    escribir_dataset(tablas_pedimento(columnar, resultado), destino)
+    return resultado
+
+
+def tabla_parquet(tabla):
+    """Una tabla (sin particionar) como bytes Parquet, para el API."""
+    buffer = pa.BufferOutputStream()
+    pq.write_table(tabla, buffer)
+    return buffer.getvalue().to_pybytes()
+
+
+def leer_dataset(destino, tabla="items", mes=None, pedimento=None):
+    """DataFrame de un dataset, opcionalmente filtrado por mes ('2025-11')
+       o pedimento (número completo sin espacios)."""
+    dataset = ds.dataset(
+        str(Path(destino) / tabla),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema(_PARTICION), flavor="hive"),
+    )
+    filtro = None
+    if mes is not None:
+        filtro = ds.field("mes") == mes
+    if pedimento is not None:
+        condicion = ds.field("pedimento") == pedimento
+        filtro = condicion if filtro is None else filtro & condicion
+    return dataset.to_table(filter=filtro).to_pandas()
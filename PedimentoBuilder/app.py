@@ -1,5 +1,6 @@
-from flask import Flask, request, jsonify, send_file, render_template
+from flask import Flask, Request, Response, request, jsonify, send_file, render_template, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 import pandas as pd
 import io
 import logging
@@ -8,211 +9,106 @@ import json
 from typing import Dict, List, Any
 
 # Importaciones de tu proyecto existente
-from builder import PedimentoBuilder
-from domain import Pedimento
-from copy import deepcopy
+from vectorized import MOTORES
+from cache import ResultCache, clave_resultado
+from jobs import JobStore, JobRunner
+from store import PedimentoStore
+from historial import CAMPOS_ITEM, HistorialCostos
+from utils import linea_ndjson
 
-app = Flask(__name__)
-CORS(app)
-logging.basicConfig(level=logging.INFO)
+# Tamaño máximo de un XML subido; se valida mientras se lee el stream
+MAX_UPLOAD_BYTES = int(os.environ.get("PEDIMENTO_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+UPLOAD_CHUNK = 64 * 1024
+XML_MIMETYPES = ("application/xml", "text/xml")
+NDJSON_MIMETYPE = "application/x-ndjson"
 
-# Mapeos de impuestos (los que ya tenías)
-MAP_CLAVE_IMPUESTO = {
-    "6": "IGI/IGE",
-    "3": "IVA",
-    "2": "CC"
-}
-
-MAP_CLAVE_IMPUESTO_GENERAL = {
-    "1": "DTA",
-    "15": "PRV",
-    "23": "IVA/PRV",
-}
-
-class PedimentoProcessor:
-    """Clase para procesar pedimentos - Manteniendo tu lógica original"""
-    
-    def __init__(self):
-        self.pedimento = None
-        self.contrib_gen_keys = {}
-        self.contrib_gen_total = 0
-        
-    def load_pedimento(self, xml_file_path: str):
-        """Carga el pedimento desde archivo XML"""
-        try:
-            builder = (
-                PedimentoBuilder(xml_file_path)
-                .build_header()
-                .build_cliente()
-                .build_facturas()
-                .build_fracciones()
-                .build_identificadores()
-                .build_incrementables()
-                .build_contribuciones_generales()
-            )
-            self.pedimento = builder.build()
-            return True
-        except Exception as e:
-            logging.error(f"Error cargando pedimento: {e}")
-            return False
-    
-    def _procesar_contribuciones_generales(self):
-        """Procesa las contribuciones generales del pedimento"""
-        self.contrib_gen_total = 0
-        self.contrib_gen_keys = {}
-        
-        for c in self.pedimento.contribuciones_generales:
-            tipo = (c.tipo_de_tasa or "").strip()
-            if tipo == "0":
-                continue
 
-            importe = float(c.importe or 0)
-            self.contrib_gen_total += importe
+class InMemoryRequest(Request):
+    """Los archivos multipart se reciben en memoria (BytesIO) en lugar del
+       SpooledTemporaryFile de Werkzeug, que pasa a disco arriba de 500 KB."""
 
-            clave_raw = (c.clave_impuesto or "").strip()
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
-            if clave_raw in MAP_CLAVE_IMPUESTO_GENERAL:
-                clave = MAP_CLAVE_IMPUESTO_GENERAL[clave_raw]
-            else:
-                clave = f"GEN_{clave_raw}"
 
-            self.contrib_gen_keys[clave] = self.contrib_gen_keys.get(clave, 0) + importe
-    
-    def _procesar_items_raw(self):
-        """Procesa los items del pedimento y retorna lista de items raw"""
-        items_raw = []
-        cantidad_total_pedimento = 0
-
-        for fraccion in self.pedimento.fracciones:
-            dta = float(fraccion.dta or 0)
-            contrib_frac_total = 0
-            contrib_frac_keys = {}
-
-            for contribucion in fraccion.contribuciones:
-                tipo = (contribucion.tipo_de_tasa or "").strip()
-                if tipo == "0":
-                    continue
-
-                importe = float(contribucion.importe or 0)
-                contrib_frac_total += importe
-
-                clave_raw = (contribucion.clave_impuesto or "").strip()
-
-                if clave_raw in MAP_CLAVE_IMPUESTO:
-                    clave = MAP_CLAVE_IMPUESTO[clave_raw]
-                else:
-                    clave = f"CONTRIB_{clave_raw}"
-
-                contrib_frac_keys[clave] = contrib_frac_keys.get(clave, 0) + importe
-
-            for item in fraccion.items:
-                cantidad = float(item.cantidad or 0)
-                cantidad_total_pedimento += cantidad
-
-                factor = float(self.pedimento.valor_aduana) / float(self.pedimento.precio_pagado_valor_comecrial)
-
-                vals = {
-                    "codigo": item.item_number,
-                    "valor_aduana": (float(item.total or 0) * float(self.pedimento.tipo_de_cambio or 0)) * factor,
-                    "precio_unitario": float(item.precio_unitario or 0),
-                    "cantidad": cantidad,
-                    "dta": dta,
-                    "contribuciones_fraccion": contrib_frac_total,
-                    "tipo_de_cambio": float(self.pedimento.tipo_de_cambio or 0),
-                }
-
-                vals.update(contrib_frac_keys)
-                items_raw.append(vals)
-                
-        return items_raw, cantidad_total_pedimento
-    
-    def _aplicar_prorrateo(self, items_raw, cantidad_total):
-        """Aplica prorrateo de contribuciones generales a los items"""
-        for vals in items_raw:
-            cantidad_item = vals["cantidad"]
-            factor = (cantidad_item / cantidad_total) if cantidad_total else 0
-
-            for k, v in self.contrib_gen_keys.items():
-                vals[k] = v * factor
-
-            vals["contrib_gen_prorrateado"] = self.contrib_gen_total * factor
-            
-        return items_raw
-    
-    def _agrupar_items(self, items_raw):
-        """Agrupa items por código"""
-        agrupado = {}
-
-        for item in items_raw:
-            codigo = item["codigo"]
-
-            if codigo not in agrupado:
-                agrupado[codigo] = deepcopy(item)
-            else:
-                agrupado[codigo]["cantidad"] += item["cantidad"]
-                agrupado[codigo]["valor_aduana"] += item["valor_aduana"]
-
-                for key, value in item.items():
-                    if key not in [
-                        "codigo", "cantidad", "valor_aduana",
-                        "precio_unitario", "precio_final",
-                        "tipo_de_cambio", "dta", "contribuciones_fraccion",
-                        'IVA', 'IGI/IGE', 'CC'
-                    ]:
-                        if isinstance(value, (int, float)):
-                            agrupado[codigo][key] = agrupado[codigo].get(key, 0) + value
-                            
-        return agrupado
-    
-    def _calcular_costos_finales(self, items_agrupados):
-        """Calcula costos finales para items agrupados"""
-        items_final = []
-        
-        for codigo, vals in items_agrupados.items():
-            cantidad = vals.get("cantidad", 0)
-            va = vals.get("valor_aduana", 0)
-            dta = vals.get("dta", 0)
-            iva = vals.get("IVA", 0)
-            igi = vals.get("IGI/IGE", 0)
-            prv = vals.get("PRV", 0)
-            cc = vals.get("CC", 0)
-            iva_prv = vals.get("IVA/PRV", 0)
-
-            costo_total = va + iva + igi + prv + iva_prv + dta + cc
-            vals["costo_final"] = costo_total / cantidad if cantidad else 0
-            vals["costo_total"] = costo_total
-            
-            items_final.append(vals)
-            
-        return items_final
-    
-    def procesar_pedimento(self, xml_file_path: str):
-        """Procesa completo el pedimento y retorna resultados"""
-        if not self.load_pedimento(xml_file_path):
-            raise Exception("Error al cargar el pedimento")
-        
-        self._procesar_contribuciones_generales()
-        items_raw, cantidad_total = self._procesar_items_raw()
-        items_con_prorrateo = self._aplicar_prorrateo(items_raw, cantidad_total)
-        items_agrupados = self._agrupar_items(items_con_prorrateo)
-        items_final = self._calcular_costos_finales(items_agrupados)
-        
-        info_pedimento = {
-            "numero_completo": self.pedimento.numero_completo,
-            "total_fracciones": len(self.pedimento.fracciones),
-            "total_facturas": len(self.pedimento.facturas),
-            "items_agrupados": len(items_final),
-            "contribuciones_generales": self.contrib_gen_keys,
-            "total_contribuciones_generales": self.contrib_gen_total
-        }
-        
-        return {
-            "pedimento": info_pedimento,
-            "items": items_final
-        }
+app = Flask(__name__)
+app.request_class = InMemoryRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
+CORS(app)
+logging.basicConfig(level=logging.INFO)
 
-# Instancia global del procesador
-processor = PedimentoProcessor()
+
+def leer_limitado(stream, max_bytes=MAX_UPLOAD_BYTES):
+    """Lee el stream por bloques y corta en cuanto rebasa max_bytes,
+       aunque el cliente no haya enviado Content-Length."""
+    buffer = io.BytesIO()
+    while True:
+        chunk = stream.read(UPLOAD_CHUNK)
+        if not chunk:
+            break
+        if buffer.tell() + len(chunk) > max_bytes:
+            raise RequestEntityTooLarge()
+        buffer.write(chunk)
+    return buffer.getvalue()
+
+
+def leer_xml_subido():
+    """Regresa (bytes, error) del XML subido como multipart ('file')
+       o directo en el cuerpo con Content-Type XML."""
+    if request.mimetype in XML_MIMETYPES:
+        return leer_limitado(request.stream), None
+
+    if 'file' not in request.files:
+        return None, "No se proporcionó archivo"
+
+    file = request.files['file']
+    if file.filename == '':
+        return None, "Nombre de archivo vacío"
+
+    if not file.filename.endswith('.xml'):
+        return None, "El archivo debe ser XML"
+
+    return leer_limitado(file.stream), None
+
+# Instancia global del procesador (sin estado, segura entre hilos)
+processor = MOTORES[os.environ.get("PEDIMENTO_MOTOR", "dicts")]()
+
+# Caché de resultados por hash del XML (memoria + disco opcional)
+result_cache = ResultCache(
+    max_items=int(os.environ.get("PEDIMENTO_CACHE_MAX_ITEMS", "256")),
+    ttl=int(os.environ.get("PEDIMENTO_CACHE_TTL", "3600")),
+    disk_dir=os.environ.get("PEDIMENTO_CACHE_DIR") or None,
+)
+
+# Historial de costos por item_number (se llena con cada pedimento costeado)
+historial_costos = HistorialCostos(
+    os.environ.get("PEDIMENTO_HISTORIAL_DB", os.path.join("temp_uploads", "historial.sqlite3"))
+)
+
+# Trabajos asíncronos para pedimentos grandes (SQLite local + pool de hilos)
+job_runner = JobRunner(
+    JobStore(
+        os.environ.get("PEDIMENTO_JOBS_DB", os.path.join("temp_uploads", "jobs.sqlite3")),
+        ttl=int(os.environ.get("PEDIMENTO_JOBS_TTL", "3600")),
+    ),
+    processor,
+    cache=result_cache,
+    workers=int(os.environ.get("PEDIMENTO_JOB_WORKERS", "2")),
+    historial=historial_costos,
+)
+
+# Almacén de pedimentos para consultas entre pedimentos (SQLite en WAL)
+pedimento_store = PedimentoStore(
+    os.environ.get("PEDIMENTO_STORE_DB", os.path.join("temp_uploads", "pedimentos.sqlite3"))
+)
+
+def registrar_historial(resultado):
+    """Agrega el pedimento costeado al historial de costos; un error aquí
+       no debe tumbar la respuesta del costeo"""
+    try:
+        historial_costos.registrar(resultado)
+    except Exception as e:
+        logging.warning(f"No se registró el historial de costos: {e}")
 
 # ==========================================
 # RUTAS DE LA API
@@ -223,38 +119,102 @@ def index():
     """Página principal con la interfaz web"""
     return render_template('index.html')
 
+def quiere_ndjson():
+    """?formato=ndjson o Accept: application/x-ndjson"""
+    if request.args.get('formato') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def respuesta_ndjson(info_pedimento, items, al_terminar=None, cache="MISS"):
+    """Resultado como NDJSON, una línea por registro y en este orden:
+
+        {"tipo": "pedimento", "data": {...}}     encabezado
+        {"tipo": "item", "data": {...}}          un item costeado por línea
+        {"tipo": "fin", "items": n}              cierre (o {"tipo": "error", ...})
+
+    Cada línea se envía en cuanto está lista y no se conserva: no se arma
+    el JSON completo ni la lista de items. El agrupado por código sí se
+    termina antes de la primera línea (el costo de un código depende de
+    todas sus fracciones), así que la memoria sigue creciendo con el
+    número de códigos distintos.
+
+    Con al_terminar, de cada item se guardan solo los CAMPOS_ITEM del
+    historial y al final se llama al_terminar(filas)."""
+    def generar():
+        yield linea_ndjson({"tipo": "pedimento", "data": info_pedimento})
+        enviados = 0
+        filas = []
+        try:
+            for item in items:
+                yield linea_ndjson({"tipo": "item", "data": item})
+                enviados += 1
+                if al_terminar is not None:
+                    filas.append({campo: item.get(campo) for campo in CAMPOS_ITEM})
+        except Exception as e:
+            # los encabezados HTTP ya salieron: el error va en el cuerpo
+            logging.error(f"Error costeando pedimento (stream): {e}")
+            yield linea_ndjson({"tipo": "error", "error": str(e)})
+            return
+        if al_terminar is not None:
+            al_terminar(filas)
+        yield linea_ndjson({"tipo": "fin", "items": enviados})
+
+    response = Response(stream_with_context(generar()), mimetype=NDJSON_MIMETYPE)
+    response.headers["X-Cache"] = cache
+    # que los proxies (nginx) no junten las líneas en un solo bloque
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 @app.route('/api/pedimento/procesar', methods=['POST'])
 def procesar_pedimento():
-    """Endpoint para procesar un pedimento"""
+    """Endpoint para procesar un pedimento.
+    Con ?formato=ndjson (o Accept: application/x-ndjson) responde en
+    streaming: encabezado, un item por línea y cierre (ver respuesta_ndjson)"""
     try:
-        if 'file' not in request.files:
-            return jsonify({"error": "No se proporcionó archivo"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "Nombre de archivo vacío"}), 400
+        xml_bytes, error = leer_xml_subido()
+        if error:
+            return jsonify({"error": error}), 400
         
-        if not file.filename.endswith('.xml'):
-            return jsonify({"error": "El archivo debe ser XML"}), 400
+        stream = quiere_ndjson()
+        cache_key = clave_resultado(xml_bytes)
+        resultado = result_cache.get(cache_key)
+        if resultado is not None:
+            if stream:
+                return respuesta_ndjson(resultado["pedimento"], resultado["items"], cache="HIT")
+            response = jsonify({
+                "success": True,
+                "data": resultado
+            })
+            response.headers["X-Cache"] = "HIT"
+            return response
         
-        # Guardar archivo temporalmente
-        import tempfile
-        import os
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xml') as tmp_file:
-            file.save(tmp_file.name)
-            file_path = tmp_file.name
+        if stream:
+            # el pedimento se carga y agrupa antes de responder (los errores
+            # de XML siguen siendo un 500 normal); los items salen uno a uno.
+            # No se guarda en la caché de resultados: habría que conservar
+            # todos los items enviados, justo lo que el streaming evita
+            info_pedimento, items = processor.procesar_stream(xml_bytes)
+
+            def al_terminar(filas):
+                registrar_historial({"pedimento": info_pedimento, "items": filas})
+
+            return respuesta_ndjson(info_pedimento, items, al_terminar)
         
-        # Procesar pedimento
-        resultado = processor.procesar_pedimento(file_path)
+        # Procesar pedimento directo desde memoria (sin archivo temporal)
+        resultado = processor.procesar_pedimento(xml_bytes)
         
-        # Limpiar archivo temporal
-        os.unlink(file_path)
+        result_cache.put(cache_key, resultado)
+        registrar_historial(resultado)
         
-        return jsonify({
+        response = jsonify({
             "success": True,
             "data": resultado
         })
+        response.headers["X-Cache"] = "MISS"
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error procesando pedimento: {e}")
         return jsonify({
@@ -262,6 +222,43 @@ def procesar_pedimento():
             "error": str(e)
         }), 500
 
+@app.route('/api/pedimento/jobs', methods=['POST'])
+def crear_job():
+    """Encola el costeo de un pedimento y responde de inmediato con el id"""
+    try:
+        xml_bytes, error = leer_xml_subido()
+        if error:
+            return jsonify({"error": error}), 400
+        
+        job_id = job_runner.submit(xml_bytes, clave_resultado(xml_bytes))
+        
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status_url": f"/api/pedimento/jobs/{job_id}"
+        }), 202
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error encolando pedimento: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/pedimento/jobs/<job_id>', methods=['GET'])
+def estado_job(job_id):
+    """Estado, progreso (fracciones procesadas) y resultado de un trabajo"""
+    job = job_runner.store.obtener(job_id)
+    if job is None:
+        return jsonify({"error": "Trabajo no encontrado o expirado"}), 404
+    
+    return jsonify({
+        "success": True,
+        "data": job
+    })
+
 @app.route('/api/pedimento/exportar-excel', methods=['POST'])
 def exportar_excel():
     """Endpoint para exportar resultados a Excel"""
@@ -293,12 +290,156 @@ def exportar_excel():
             "error": str(e)
         }), 500
 
+@app.route('/api/pedimento/exportar-parquet', methods=['POST'])
+def exportar_parquet():
+    """Exporta una tabla del pedimento subido (?tabla=items|fracciones|contribuciones)
+    como Parquet con el esquema fijo de analitica.py"""
+    try:
+        import analitica
+    except ImportError:
+        return jsonify({"success": False, "error": "Exportación Parquet no disponible (falta pyarrow)"}), 501
+
+    try:
+        tabla = request.args.get('tabla', 'items')
+        if tabla not in analitica.TABLAS:
+            return jsonify({"error": f"Tabla inválida, opciones: {', '.join(analitica.TABLAS)}"}), 400
+
+        xml_bytes, error = leer_xml_subido()
+        if error:
+            return jsonify({"error": error}), 400
+
+        columnar_processor = MOTORES["columnar"]()
+        columnar = columnar_processor.load_pedimento(xml_bytes)
+        if columnar is None:
+            raise Exception("Error al cargar el pedimento")
+
+        tablas = analitica.tablas_pedimento(columnar, columnar_processor.costear(columnar))
+        llaves = analitica.llaves_pedimento(columnar.pedimento)
+
+        return send_file(
+            io.BytesIO(analitica.tabla_parquet(tablas[tabla])),
+            mimetype='application/vnd.apache.parquet',
+            as_attachment=True,
+            download_name=f"{llaves['pedimento'] or 'pedimento'}_{tabla}.parquet"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error exportando a Parquet: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+# ==========================================
+# ALMACÉN DE PEDIMENTOS
+# ==========================================
+
+def filtros_fecha():
+    """desde / hasta (aaaa-mm-dd) y límite de la query string"""
+    return {
+        "desde": request.args.get('desde') or None,
+        "hasta": request.args.get('hasta') or None,
+        "limite": min(request.args.get('limite', 1000, type=int), 10000),
+    }
+
+@app.route('/api/pedimentos', methods=['POST'])
+def cargar_pedimento_store():
+    """Guarda el pedimento subido en el almacén (reemplaza si ya estaba)"""
+    try:
+        xml_bytes, error = leer_xml_subido()
+        if error:
+            return jsonify({"error": error}), 400
+
+        archivo = request.files['file'].filename if 'file' in request.files else None
+        pedimento_id = pedimento_store.cargar_xml(xml_bytes, archivo=archivo)
+
+        return jsonify({
+            "success": True,
+            "pedimento_id": pedimento_id
+        }), 201
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error guardando pedimento: {e}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+@app.route('/api/pedimentos', methods=['GET'])
+def listar_pedimentos():
+    """Pedimentos guardados, opcionalmente de un RFC (?rfc=) y rango de fechas"""
+    return jsonify({
+        "success": True,
+        "data": pedimento_store.pedimentos(rfc=request.args.get('rfc') or None, **filtros_fecha())
+    })
+
+@app.route('/api/pedimentos/items/<item_number>', methods=['GET'])
+def items_por_numero(item_number):
+    """Todos los items de un item_number en los pedimentos guardados"""
+    return jsonify({
+        "success": True,
+        "data": pedimento_store.items(item_number, **filtros_fecha())
+    })
+
+@app.route('/api/pedimentos/fracciones/<numero_fraccion>', methods=['GET'])
+def fracciones_por_numero(numero_fraccion):
+    """Todas las fracciones de un número arancelario en los pedimentos guardados"""
+    return jsonify({
+        "success": True,
+        "data": pedimento_store.fracciones(numero_fraccion, **filtros_fecha())
+    })
+
+@app.route('/api/pedimentos/impuestos', methods=['GET'])
+def impuestos_por_fraccion():
+    """Importe total de un impuesto (?clave=6 IGI por omisión) por fracción arancelaria"""
+    filtros = filtros_fecha()
+    return jsonify({
+        "success": True,
+        "data": pedimento_store.impuestos_por_fraccion(
+            request.args.get('clave', '6'), filtros["desde"], filtros["hasta"]
+        )
+    })
+
+@app.route('/api/items/<item_number>/costos', methods=['GET'])
+def costos_item(item_number):
+    """Historial de costos de un item_number: serie de tiempo (?desde=&hasta=),
+    promedio ponderado por cantidad y último costo"""
+    filtros = filtros_fecha()
+    historial = historial_costos.costos(item_number, **filtros)
+    if historial is None:
+        return jsonify({"error": "Sin costos registrados para el item"}), 404
+
+    return jsonify({
+        "success": True,
+        "data": historial
+    })
+
+@app.errorhandler(RequestEntityTooLarge)
+def archivo_demasiado_grande(e):
+    """Respuesta JSON cuando el XML rebasa MAX_UPLOAD_BYTES"""
+    return jsonify({
+        "success": False,
+        "error": f"El archivo excede el máximo de {MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+    }), 413
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Endpoint para verificar estado del servicio"""
-    return jsonify({"status": "healthy", "service": "pedimento-processor"})
+    """Endpoint para verificar estado del servicio.
+
+    Las estadísticas de caché son del worker que atiende la petición
+    (cache.pid), no de todo el servicio."""
+    return jsonify({
+        "status": "healthy",
+        "service": "pedimento-processor",
+        "cache": result_cache.stats()
+    })
 
 if __name__ == '__main__':
+    # Servidor de desarrollo; en producción usar: gunicorn -c gunicorn.conf.py app:app
     # Crear directorio de templates si no existe
     os.makedirs('templates', exist_ok=True)
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get("FLASK_DEBUG") == "1")
\ No newline at end of file
@@ -0,0 +1,257 @@
+# batch.py
+"""
+Costea en paralelo todos los pedimentos XML de un directorio o patrón glob,
+con los mismos pasos que PedimentoProcessor.procesar_pedimento.
+
+Uso:
+    python3 batch.py Pedimentos/ --workers 8 --salida "Files Pedimentos"
+    python3 batch.py "Pedimentos/5004*.xml"
+    python3 batch.py Pedimentos/ --parquet dataset/
+    python3 batch.py Pedimentos/ --incremental
+    python3 batch.py Pedimentos/ --snapshots
+    python3 batch.py Pedimentos/ --historial historial.sqlite3
+
+Resultado:
+    <salida>/Costo <archivo>.xlsx      (uno por pedimento)
+    <salida>/Costo consolidado.xlsx    (Items, Pedimentos y Errores)
+    <parquet>/{items,fracciones,contribuciones}/mes=.../pedimento=.../
+                                       (con --parquet, ver analitica.py)
+
+Con --incremental solo se costean los XML nuevos o modificados (o todos si
+cambiaron las reglas de impuestos); los demás reutilizan su resultado. El
+manifest y los resultados guardados viven en <salida>/.manifest.json y
+<salida>/.resultados/.
+
+Con --snapshots los pedimentos ya construidos se guardan en el caché
+privado del usuario (o en DIR, con --snapshots DIR) y las corridas
+siguientes (por ejemplo, tras cambiar las reglas) no vuelven a parsear los
+XML que no cambiaron.
+
+Con --historial los costos de cada pedimento correcto se registran en el
+historial por item_number (ver historial.py), el mismo que llena el API.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from cache import ResultCache, clave_por_hash
+from manifest import Manifest
+from snapshot import cargar_para, directorio_usuario
+from vectorized import MOTORES
+
+NOMBRE_CONSOLIDADO = "Costo consolidado.xlsx"
+NOMBRE_MANIFEST = ".manifest.json"
+DIR_RESULTADOS = ".resultados"
+
+
+# ============================================================
+#  ENTRADA
+# ============================================================
+def listar_xmls(entrada):
+    """Acepta un directorio (todos sus .xml) o un patrón glob."""
+    path = Path(entrada)
+    if path.is_dir():
+        return sorted(path.glob("*.xml"))
+    return sorted(Path(p) for p in glob.glob(entrada) if p.lower().endswith(".xml"))
+
+
+# ============================================================
+#  TRABAJO POR ARCHIVO (se ejecuta en el proceso hijo)
+# ============================================================
+def costear_archivo(xml_path, salida_dir, motor="dicts", parquet_dir=None, snapshot_dir=None):
+    """Costea un pedimento y escribe su Excel individual (y su partición
+       Parquet si se pide). Con snapshot_dir el pedimento construido se
+       toma de (o se guarda en) su snapshot. Nunca lanza: los errores se
+       regresan para no detener el lote."""
+    xml_path = Path(xml_path)
+    t0 = time.perf_counter()
+    try:
+        if parquet_dir:
+            # el dataset sale del pedimento en columnas: se costea con el
+            # motor columnar (mismo resultado que los demás)
+            from analitica import exportar_parquet
+            resultado = exportar_parquet(str(xml_path), parquet_dir, snapshot_dir=snapshot_dir)
+        elif snapshot_dir:
+            processor = MOTORES[motor]()
+            pedimento = cargar_para(processor, xml_path, snapshot_dir)
+            if pedimento is None:
+                raise Exception("Error al cargar el pedimento")
+            resultado = processor.costear(pedimento)
+        else:
+            resultado = MOTORES[motor]().procesar_pedimento(str(xml_path))
+
+        salida = Path(salida_dir) / f"Costo {xml_path.stem}.xlsx"
+        pd.DataFrame(resultado["items"]).to_excel(salida, index=False)
+
+        return {
+            "archivo": xml_path.name,
+            "ok": True,
+            "resultado": resultado,
+            "salida": str(salida),
+            "segundos": time.perf_counter() - t0,
+        }
+    except Exception as e:
+        return {
+            "archivo": xml_path.name,
+            "ok": False,
+            "error": f"{type(e).__name__}: {e}",
+            "segundos": time.perf_counter() - t0,
+        }
+
+
+# ============================================================
+#  LOTE
+# ============================================================
+def procesar_lote(xml_paths, salida_dir, workers=None, motor="dicts", parquet_dir=None, snapshot_dir=None):
+    """Reparte los archivos en un ProcessPoolExecutor y regresa los
+       resultados en el mismo orden de entrada."""
+    os.makedirs(salida_dir, exist_ok=True)
+    resultados = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            pool.submit(costear_archivo, str(p), salida_dir, motor, parquet_dir, snapshot_dir): i
+            for i, p in enumerate(xml_paths)
+        }
+        for fut in as_completed(futuros):
+            r = fut.result()
+            resultados[futuros[fut]] = r
+            if r["ok"]:
+                logging.info(f"{r['archivo']}: {len(r['resultado']['items'])} items ({r['segundos']:.2f}s)")
+            else:
+                logging.error(f"{r['archivo']}: {r['error']}")
+
+    return [resultados[i] for i in range(len(xml_paths))]
+
+
+def procesar_incremental(xml_paths, salida_dir, workers=None, motor="dicts", parquet_dir=None, snapshot_dir=None):
+    """Como procesar_lote, pero solo costea los XML nuevos o modificados
+       según el manifest de salida_dir. Los archivos que desaparecieron se
+       quitan del manifest junto con su Excel individual."""
+    os.makedirs(salida_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(salida_dir, NOMBRE_MANIFEST))
+    # solo disco y sin expiración: el manifest decide qué sigue vigente
+    guardados = ResultCache(max_items=0, ttl=0, disk_dir=os.path.join(salida_dir, DIR_RESULTADOS))
+
+    pendientes, vigentes, eliminados = manifest.planear(xml_paths)
+
+    for clave in eliminados:
+        entrada = manifest.eliminar(clave)
+        try:
+            os.unlink(entrada["salida"])
+        except FileNotFoundError:
+            pass
+        logging.info(f"{Path(clave).name}: ya no existe, se borra {entrada['salida']}")
+
+    resultados = {}
+    for xml_path, entrada in vigentes:
+        resultado = guardados.get(clave_por_hash(entrada["hash"]))
+        if resultado is None or (parquet_dir and entrada.get("parquet") != parquet_dir):
+            pendientes.append((xml_path, entrada["hash"]))
+            continue
+        resultados[str(xml_path)] = {
+            "archivo": Path(xml_path).name,
+            "ok": True,
+            "reutilizado": True,
+            "resultado": resultado,
+            "salida": entrada["salida"],
+            "segundos": 0.0,
+        }
+
+    logging.info(f"{len(pendientes)} por costear, {len(resultados)} sin cambios, {len(eliminados)} eliminados")
+    nuevos = procesar_lote([p for p, _ in pendientes], salida_dir, workers, motor, parquet_dir, snapshot_dir)
+
+    for (xml_path, contenido), r in zip(pendientes, nuevos):
+        if r["ok"]:
+            guardados.put(clave_por_hash(contenido), r["resultado"])
+            manifest.registrar(xml_path, contenido, r["salida"], parquet_dir)
+        else:
+            manifest.eliminar(Manifest.clave(xml_path))
+        resultados[str(xml_path)] = r
+
+    manifest.guardar()
+    return [resultados[str(p)] for p in xml_paths]
+
+
+def escribir_consolidado(resultados, output_path):
+    """Un solo Excel con los items de todos los pedimentos correctos,
+       el resumen por pedimento y la lista de errores."""
+    items, pedimentos, errores = [], [], []
+
+    for r in resultados:
+        if not r["ok"]:
+            errores.append({"archivo": r["archivo"], "error": r["error"]})
+            continue
+
+        info = r["resultado"]["pedimento"]
+        for item in r["resultado"]["items"]:
+            items.append({"archivo": r["archivo"], "numero_completo": info["numero_completo"], **item})
+
+        fila = {k: v for k, v in info.items() if k != "contribuciones_generales"}
+        fila.update(info["contribuciones_generales"])
+        pedimentos.append({"archivo": r["archivo"], **fila, "segundos": r["segundos"]})
+
+    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
+        pd.DataFrame(items).to_excel(writer, index=False, sheet_name="Items")
+        pd.DataFrame(pedimentos).to_excel(writer, index=False, sheet_name="Pedimentos")
+        pd.DataFrame(errores, columns=["archivo", "error"]).to_excel(writer, index=False, sheet_name="Errores")
+
+
+# ============================================================
+#  PROGRAMA PRINCIPAL
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="directorio o patrón glob de pedimentos XML")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="procesos en paralelo")
+    parser.add_argument("--salida", default="Files Pedimentos", help="directorio de salida")
+    parser.add_argument("--motor", choices=sorted(MOTORES), default="dicts", help="motor de costeo")
+    parser.add_argument("--parquet", metavar="DIR", help="escribir también el dataset Parquet en DIR")
+    parser.add_argument("--incremental", action="store_true", help="costear solo XML nuevos o modificados")
+    parser.add_argument("--snapshots", metavar="DIR", nargs="?", const=str(directorio_usuario()), help="guardar/leer los pedimentos construidos en DIR (sin DIR, el caché del usuario); privado: se leen con pickle (ver snapshot.py)")
+    parser.add_argument("--historial", metavar="DB", help="registrar los costos en el historial SQLite DB (ver historial.py)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    xml_paths = listar_xmls(args.entrada)
+    if not xml_paths:
+        print(f"❌ No se encontraron XML en: {args.entrada}")
+        raise SystemExit(1)
+
+    print(f"📄 Procesando {len(xml_paths)} pedimentos con {args.workers} workers")
+    t0 = time.perf_counter()
+    if args.incremental:
+        resultados = procesar_incremental(xml_paths, args.salida, args.workers, args.motor, args.parquet, args.snapshots)
+    else:
+        resultados = procesar_lote(xml_paths, args.salida, args.workers, args.motor, args.parquet, args.snapshots)
+
+    consolidado = Path(args.salida) / NOMBRE_CONSOLIDADO
+    escribir_consolidado(resultados, consolidado)
+
+    if args.historial:
+        from historial import HistorialCostos
+        # un solo escritor (este proceso) y una transacción para todo el lote
+        HistorialCostos(args.historial).registrar_lote([r["resultado"] for r in resultados if r["ok"]])
+
+    fallidos = sum(1 for r in resultados if not r["ok"])
+    print("=================================")
+    reutilizados = sum(1 for r in resultados if r.get("reutilizado"))
+    print(f"Correctos: {len(resultados) - fallidos}  Con error: {fallidos}  Sin cambios: {reutilizados}")
+    print(f"Tiempo total: {time.perf_counter() - t0:.2f}s")
+    print("EXPORTADO:", consolidado)
+    if args.parquet:
+        print("DATASET:", args.parquet)
+    if args.historial:
+        print("HISTORIAL:", args.historial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,871 @@
+# bench.py
+"""
+Benchmarks sobre pedimentos sintéticos.
+
+Uso:
+    python3 bench.py streaming --fracciones 2000 --items 5
+    python3 bench.py campos --items 10000
+    python3 bench.py concurrencia --pedimentos 8 --hilos 16
+    python3 bench.py vectorizado --fracciones 5000 --items 6
+    python3 bench.py memoria --items 100000
+    python3 bench.py columnar --items 100000
+    python3 bench.py excel --filas 50000
+    python3 bench.py formato --fracciones 5000 --items 5
+    python3 bench.py consolidado --pedimentos 40 --fracciones 200
+    python3 bench.py parquet --pedimentos 40 --fracciones 200
+    python3 bench.py prorrateo --fracciones 10000 --gastos 200
+    python3 bench.py serializar --fracciones 5000 --items 5
+    python3 bench.py snapshot --fracciones 5000 --items 5
+    python3 bench.py store --pedimentos 200 --fracciones 50
+    python3 bench.py historial --pedimentos 2000 --codigos 500
+    python3 bench.py ndjson --fracciones 5000 --items 5
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from builder import PedimentoBuilder, PedimentoStreamBuilder, CAMPOS_ITEM, fill, get
+from domain import Item
+from tests.sinteticos import app_temporal, generar_xml, mismo_objeto, mismo_resultado
+
+
+# ===================================================================
+#  UTILIDADES
+# ===================================================================
+def build_fluido(xml_source):
+    return (
+        PedimentoBuilder(xml_source)
+        .build_header()
+        .build_cliente()
+        .build_facturas()
+        .build_fracciones()
+        .build_identificadores()
+        .build_incrementables()
+        .build_contribuciones_generales()
+        .build()
+    )
+
+
+def construir_streaming(xml_source):
+    return PedimentoStreamBuilder(xml_source).build()
+
+
+def medir(fn, *args):
+    """Devuelve (resultado, segundos, bytes pico de tracemalloc)."""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    res = fn(*args)
+    dt = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return res, dt, pico
+
+
+# ===================================================================
+#  BENCHMARKS
+# ===================================================================
+def bench_streaming(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in (args.fracciones // 4, args.fracciones // 2, args.fracciones):
+            path = generar_xml(os.path.join(tmp, f"p{n}.xml"), n, args.items)
+
+            fluido, t_f, m_f = medir(build_fluido, path)
+            stream, t_s, m_s = medir(construir_streaming, path)
+
+            assert mismo_objeto(fluido, stream), "el builder de streaming difiere del fluido"
+            print(
+                f"{n:>7} fracciones | fluido {t_f:6.2f}s {m_f / 2**20:8.1f} MiB"
+                f" | streaming {t_s:6.2f}s {m_s / 2**20:8.1f} MiB"
+            )
+
+
+def bench_campos(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        # una sola fracción con todos los items, como un pedimento consolidado
+        path = generar_xml(os.path.join(tmp, "items.xml"), 1, args.items)
+        nodos = ET.parse(path).getroot().findall("Fracciones/Fraccion/Items/Item")
+
+        def con_get():
+            items = []
+            for inode in nodos:
+                it = Item()
+                for attr, tag in CAMPOS_ITEM:
+                    setattr(it, attr, get(inode, tag))
+                items.append(it)
+            return items
+
+        def con_indice():
+            return [fill(Item(), inode, CAMPOS_ITEM) for inode in nodos]
+
+        assert mismo_objeto(con_get(), con_indice()), "el índice difiere de get()"
+
+        tiempos = {}
+        for nombre, fn in (("get()", con_get), ("indice", con_indice)):
+            tiempos[nombre] = min(_cronometrar(fn) for _ in range(args.repeticiones))
+            print(f"{nombre:>8}: {tiempos[nombre] * 1000:8.1f} ms para {len(nodos)} items")
+        print(f"aceleración: {tiempos['get()'] / tiempos['indice']:.2f}x")
+
+
+def bench_concurrencia(args):
+    """Prueba de estrés: N pedimentos distintos enviados en paralelo al
+       endpoint; cada respuesta debe ser igual a su resultado secuencial.
+       (La misma prueba, en chico, está en tests/test_concurrencia.py.)"""
+    from processor import PedimentoProcessor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = app_temporal(tmp)
+        xmls = []
+        for n in range(args.pedimentos):
+            path = generar_xml(os.path.join(tmp, f"p{n}.xml"), args.fracciones + n * 7, 5, seed=n)
+            with open(path, "rb") as f:
+                xmls.append(f.read())
+
+        # resultado esperado, uno por uno y fuera de Flask
+        esperados = [
+            json.loads(json.dumps(PedimentoProcessor().procesar_pedimento(x)))
+            for x in xmls
+        ]
+
+        def subir(i):
+            cliente = app.test_client()
+            r = cliente.post(
+                "/api/pedimento/procesar",
+                data={"file": (io.BytesIO(xmls[i]), f"p{i}.xml")},
+            )
+            return i, r.status_code, r.get_json()
+
+        peticiones = [i % len(xmls) for i in range(args.rondas * len(xmls))]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+            respuestas = list(pool.map(subir, peticiones))
+        dt = time.perf_counter() - t0
+
+        errores = [
+            i for i, status, body in respuestas
+            if status != 200 or body["data"] != esperados[i]
+        ]
+        print(f"{len(respuestas)} peticiones con {args.hilos} hilos en {dt:.2f}s")
+        assert not errores, f"{len(errores)} respuestas difieren de su resultado secuencial"
+        print("todas las respuestas coinciden con su resultado secuencial")
+
+
+def bench_vectorizado(args):
+    from processor import PedimentoProcessor
+    from vectorized import VectorizedProcessor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generar_xml(os.path.join(tmp, "v.xml"), args.fracciones, args.items)
+        pedimento = construir_streaming(path)
+
+        dicts = PedimentoProcessor().costear(pedimento)
+        vector = VectorizedProcessor().costear(pedimento)
+        assert mismo_resultado(dicts, vector), "el motor vectorizado difiere del de dicts"
+        print(f"paridad exacta en {len(dicts['items'])} códigos agrupados")
+
+        n_items = sum(len(f.items) for f in pedimento.fracciones)
+        tiempos = {}
+        for nombre, proc in (("dicts", PedimentoProcessor()), ("vectorizado", VectorizedProcessor())):
+            tiempos[nombre] = min(_cronometrar(lambda: proc.costear(pedimento)) for _ in range(args.repeticiones))
+            print(f"{nombre:>12}: {tiempos[nombre] * 1000:8.1f} ms para {n_items} items")
+        print(f"aceleración: {tiempos['dicts'] / tiempos['vectorizado']:.2f}x")
+
+
+def _clase_con_dict(cls):
+    """Copia de una clase del dominio sin __slots__ (el modelo anterior)."""
+    return type(cls.__name__, (), {"__init__": cls.__init__})
+
+
+def bench_memoria(args):
+    import builder
+    import domain
+
+    clases = ("Item", "DescripcionEspecifica", "Fraccion", "Contribucion", "Permiso")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generar_xml(os.path.join(tmp, "m.xml"), args.items // args.por_fraccion, args.por_fraccion)
+
+        def retenida():
+            gc.collect()
+            tracemalloc.start()
+            pedimento = construir_streaming(path)
+            gc.collect()
+            actual, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return pedimento, actual
+
+        originales = {c: getattr(builder, c) for c in clases}
+        try:
+            for c in clases:
+                setattr(builder, c, _clase_con_dict(getattr(domain, c)))
+            pedimento, antes = retenida()
+        finally:
+            for c, cls in originales.items():
+                setattr(builder, c, cls)
+        del pedimento
+
+        pedimento, despues = retenida()
+        n_items = sum(len(f.items) for f in pedimento.fracciones)
+
+        print(f"{n_items} items retenidos en memoria (incluye strings y listas)")
+        print(f"  con __dict__ : {antes / n_items:8.0f} bytes/item  ({antes / 2**20:.1f} MiB)")
+        print(f"  con __slots__: {despues / n_items:8.0f} bytes/item  ({despues / 2**20:.1f} MiB)")
+        print(f"reducción: {100 * (1 - despues / antes):.1f}%")
+
+
+def _retenida(fn, *args):
+    """(resultado, bytes que siguen vivos tras construirlo)."""
+    gc.collect()
+    tracemalloc.start()
+    res = fn(*args)
+    gc.collect()
+    actual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return res, actual
+
+
+def bench_columnar(args):
+    from processor import PedimentoProcessor
+    from vectorized import ColumnarProcessor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generar_xml(os.path.join(tmp, "c.xml"), args.items // args.por_fraccion, args.por_fraccion)
+
+        objetos, mem_objetos = _retenida(PedimentoProcessor().load_pedimento, path)
+        columnar, mem_columnar = _retenida(ColumnarProcessor().load_pedimento, path)
+        n_items = len(columnar.items["item_number"])
+
+        dicts = PedimentoProcessor().costear(objetos)
+        col = ColumnarProcessor().costear(columnar)
+        assert mismo_resultado(dicts, col), "el costeo columnar difiere del de dicts"
+        print(f"paridad exacta en {len(dicts['items'])} códigos agrupados")
+        del objetos, columnar
+
+        print(f"{n_items} items retenidos en memoria")
+        print(f"  objetos : {mem_objetos / n_items:8.0f} bytes/item  ({mem_objetos / 2**20:.1f} MiB)")
+        print(f"  columnas: {mem_columnar / n_items:8.0f} bytes/item  ({mem_columnar / 2**20:.1f} MiB)")
+
+        for nombre, proc in (("dicts", PedimentoProcessor()), ("columnar", ColumnarProcessor())):
+            dt = min(_cronometrar(lambda: proc.procesar_pedimento(path)) for _ in range(args.repeticiones))
+            print(f"{nombre:>9}: {dt * 1000:8.1f} ms carga + costeo")
+
+
+def _excel_celda_por_celda(df, output_path):
+    """La hoja "Costos por Item" como se escribía antes: ws.cell() y un
+       Border por celda, y autoajuste recorriendo todas las celdas."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Border, Side
+
+    wb = Workbook()
+    ws = wb.active
+    thin = Side(style="thin")
+    for col_num, col_name in enumerate(df.columns, 1):
+        ws.cell(row=1, column=col_num, value=col_name).border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    for row_num, row in enumerate(df.itertuples(index=False), 2):
+        for col_num, value in enumerate(row, 1):
+            ws.cell(row=row_num, column=col_num, value=value).border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    for col in ws.columns:
+        ws.column_dimensions[col[0].column_letter].width = max(len(str(c.value)) for c in col) + 2
+    wb.save(output_path)
+
+
+def bench_excel(args):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    from domain import Pedimento
+    from exporter import exportar_excel_pedimento_premium
+
+    rnd = random.Random(7)
+    df_costos = pd.DataFrame({
+        "item_number": [f"ITM-{i:05d}" for i in range(args.filas)],
+        "cantidad": [float(rnd.randint(1, 50)) for _ in range(args.filas)],
+        "valor_aduana": [rnd.uniform(1, 1e5) for _ in range(args.filas)],
+        "contribuciones_validas": [rnd.uniform(0, 1e4) for _ in range(args.filas)],
+        "dta_prorrateado": [rnd.uniform(0, 500) for _ in range(args.filas)],
+        "costo_total_item": [rnd.uniform(1, 2e5) for _ in range(args.filas)],
+        "costo_unitario": [rnd.uniform(1, 5e3) for _ in range(args.filas)],
+        "proveedor": [f"PROVEEDOR {i % 7}" for i in range(args.filas)],
+    })
+    df_contrib = pd.DataFrame(columns=["item_number", "concepto_impuesto", "importe_contribucion"])
+    pedimento = Pedimento()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        antes = os.path.join(tmp, "antes.xlsx")
+        despues = os.path.join(tmp, "despues.xlsx")
+
+        t_antes = _cronometrar(lambda: _excel_celda_por_celda(df_costos, antes))
+        t_despues = _cronometrar(lambda: exportar_excel_pedimento_premium(pedimento, df_costos, df_contrib, despues))
+
+        viejo = load_workbook(antes, read_only=True).active
+        nuevo = load_workbook(despues, read_only=True)["Costos por Item"]
+        filas_nuevas = nuevo.iter_rows(values_only=True)
+        assert all(a == b for a, b in zip(viejo.iter_rows(values_only=True), filas_nuevas)), "las celdas difieren"
+        print(f"mismas celdas en {args.filas} filas de \"Costos por Item\"")
+
+        print(f"  celda por celda: {t_antes:7.2f}s")
+        print(f"  write-only     : {t_despues:7.2f}s")
+        print(f"aceleración: {t_antes / t_despues:.1f}x")
+
+
+def _formato_segunda_pasada(hojas, output_xlsx):
+    """Camino anterior de xml_a_excel: pd.ExcelWriter y después reabrir el
+       libro completo para poner bordes, rellenos y alineación."""
+    import pandas as pd
+    from openpyxl import load_workbook
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    with pd.ExcelWriter(output_xlsx, engine="openpyxl") as writer:
+        for nombre, df in hojas:
+            df.to_excel(writer, index=False, sheet_name=nombre)
+
+    wb = load_workbook(output_xlsx)
+    border = Border(left=Side(style="thin"), right=Side(style="thin"),
+                    top=Side(style="thin"), bottom=Side(style="thin"))
+    for ws in wb.worksheets:
+        ws.freeze_panes = "A2"
+        for col in ws.columns:
+            ws.column_dimensions[col[0].column_letter].width = 22
+        for cell in ws[1]:
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill("solid", fgColor="D9E1F2")
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+            cell.border = border
+        for row in ws.iter_rows(min_row=2):
+            for cell in row:
+                cell.border = border
+                cell.alignment = Alignment(wrap_text=True, vertical="top")
+    wb.save(output_xlsx)
+
+
+def _aspecto(path):
+    """Valores, formato visible, anchos y paneles de cada hoja de un libro."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    libro = {}
+    for ws in wb.worksheets:
+        celdas = [
+            (c.coordinate, c.value, c.font.b, c.fill.fgColor.rgb, c.alignment.horizontal,
+             c.alignment.vertical, c.alignment.wrap_text, c.border.left.style, c.border.bottom.style)
+            for row in ws.iter_rows() for c in row
+        ]
+        anchos = {k: d.width for k, d in ws.column_dimensions.items() if d.customWidth}
+        libro[ws.title] = (celdas, anchos, ws.freeze_panes)
+    return libro
+
+
+def bench_formato(args):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import pandas as pd
+    import xml_a_excel as xe
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generar_xml(os.path.join(tmp, "x.xml"), args.fracciones, args.items)
+        root = ET.parse(path).getroot()
+        df_fracs, df_items = xe.extraer_fracciones(root)
+        df_regs = xe.extraer_impuestos_gastos(root)
+        hojas = [
+            ("Resumen", pd.DataFrame([xe.extraer_resumen(root)])),
+            ("Facturas", xe.extraer_facturas(root)),
+            ("Fracciones", xe.prorrateo(df_fracs, df_regs)),
+            ("ItemsDetallados", df_items),
+            ("ImpuestosGastos", df_regs),
+        ]
+        celdas = sum(df.size for _, df in hojas)
+
+        antes = os.path.join(tmp, "antes.xlsx")
+        despues = os.path.join(tmp, "despues.xlsx")
+        _, t_antes, pico_antes = medir(_formato_segunda_pasada, hojas, antes)
+        _, t_despues, pico_despues = medir(xe.exportar_excel, despues, hojas)
+
+        assert _aspecto(antes) == _aspecto(despues), "los libros se ven distintos"
+        print(f"mismo contenido y formato en {celdas} celdas de datos")
+        print(f"  escribir + reformatear: {t_antes:7.2f}s  pico {pico_antes / 2**20:7.1f} MiB")
+        print(f"  una sola pasada       : {t_despues:7.2f}s  pico {pico_despues / 2**20:7.1f} MiB")
+        print(f"aceleración: {t_antes / t_despues:.1f}x")
+
+
+def bench_consolidado(args):
+    from consolidado import exportar_consolidado
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            generar_xml(os.path.join(tmp, f"p{i}.xml"), args.fracciones, args.items, seed=i)
+            for i in range(args.pedimentos)
+        ]
+        for n in (args.pedimentos // 4, args.pedimentos // 2, args.pedimentos):
+            libro, dt, pico = medir(exportar_consolidado, paths[:n], os.path.join(tmp, f"c{n}.xlsx"))
+            print(f"{n:>5} pedimentos | {libro.filas_items:>8} items | {dt:6.2f}s | pico {pico / 2**20:6.1f} MiB")
+
+
+def bench_parquet(args):
+    import pandas as pd
+
+    from batch import procesar_lote
+    from analitica import leer_dataset
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            generar_xml(os.path.join(tmp, f"p{i}.xml"), args.fracciones, args.items, seed=i)
+            for i in range(args.pedimentos)
+        ]
+        salida = os.path.join(tmp, "salida")
+        dataset = os.path.join(tmp, "dataset")
+        resultados = procesar_lote(paths, salida, None, parquet_dir=dataset)
+        assert all(r["ok"] for r in resultados)
+
+        excels = [r["salida"] for r in resultados]
+        t_excel = _cronometrar(lambda: pd.concat(pd.read_excel(x) for x in excels))
+        t_parquet = _cronometrar(lambda: leer_dataset(dataset, "items", mes="2025-11"))
+        filas = len(leer_dataset(dataset, "items", mes="2025-11"))
+
+        print(f"un mes: {len(excels)} Excel vs dataset Parquet ({filas} items en Parquet)")
+        print(f"  Excel  : {t_excel:7.2f}s")
+        print(f"  Parquet: {t_parquet:7.2f}s")
+        print(f"aceleración: {t_excel / t_parquet:.0f}x")
+
+
+def _prorrateo_por_gasto(df_fracs, df_regs):
+    """xml_a_excel.prorrateo anterior: una pasada sobre las fracciones por gasto."""
+    df = df_fracs.copy()
+    total_val_aduana = df["ValorAduana"].sum() or 1
+    df["GastoAsignado"] = 0.0
+
+    for _, reg in df_regs[df_regs["Tipo"] == "GASTO"].iterrows():
+        monto = reg["Importe"]
+        df["GastoAsignado"] += (df["ValorAduana"] / total_val_aduana) * monto
+
+    df["CostoTotal"] = df["ValorAduana"] + df["GastoAsignado"]
+    df["CostoUnitario"] = df["CostoTotal"] / df["CantidadFactura"].replace(0, 1)
+    return df
+
+
+def bench_prorrateo(args):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import numpy as np
+    import pandas as pd
+    import xml_a_excel as xe
+
+    rnd = random.Random(7)
+    df_fracs = pd.DataFrame({
+        "NumeroFraccion": [f"{rnd.randint(10000000, 99999999)}" for _ in range(args.fracciones)],
+        "CantidadFactura": [rnd.uniform(1, 500) for _ in range(args.fracciones)],
+        "CantidadTarifa": [rnd.uniform(1, 2000) for _ in range(args.fracciones)],
+        "ValorAduana": [rnd.uniform(1e3, 1e6) for _ in range(args.fracciones)],
+        "ValorDolares": [rnd.uniform(50, 5e4) for _ in range(args.fracciones)],
+    })
+    conceptos = ("FLETES", "SEGUROS", "EMBALAJES", "OTROS")
+    df_regs = pd.DataFrame({
+        "NumeroFraccion": [""] * args.gastos,
+        "Tipo": ["GASTO"] * args.gastos,
+        "Clave": ["GASTO"] * args.gastos,
+        "Concepto": [conceptos[i % len(conceptos)] for i in range(args.gastos)],
+        "Importe": [rnd.uniform(1e2, 1e5) for _ in range(args.gastos)],
+    })
+
+    antes, t_antes = _con_tiempo(_prorrateo_por_gasto, df_fracs, df_regs)
+    despues, t_despues = _con_tiempo(xe.prorrateo, df_fracs, df_regs)
+    assert np.allclose(antes["GastoAsignado"], despues["GastoAsignado"], rtol=1e-12), "asignaciones distintas"
+    assert np.isclose(despues["GastoAsignado"].sum(), df_regs["Importe"].sum(), rtol=1e-12)
+
+    bases = {"FLETES": "peso", "SEGUROS": "valor_dolares", "EMBALAJES": "cantidad"}
+    mixto, t_mixto = _con_tiempo(xe.prorrateo, df_fracs, df_regs, bases)
+    assert np.isclose(mixto["GastoAsignado"].sum(), df_regs["Importe"].sum(), rtol=1e-12)
+
+    print(f"{args.fracciones} fracciones x {args.gastos} gastos (mismas asignaciones)")
+    print(f"  una pasada por gasto : {t_antes * 1000:8.1f} ms")
+    print(f"  motor de prorrateo   : {t_despues * 1000:8.1f} ms")
+    print(f"  4 conceptos, 4 bases : {t_mixto * 1000:8.1f} ms")
+    print(f"aceleración: {t_antes / t_despues:.0f}x")
+
+
+def _object_to_dict_reflexivo(obj, _visited=None):
+    """utils.object_to_dict anterior (isinstance, __slots__/vars por objeto),
+       con los primitivos fuera de _visited para que el resultado sea comparable."""
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    if _visited is None:
+        _visited = set()
+    if id(obj) in _visited:
+        return None
+    _visited.add(id(obj))
+    if isinstance(obj, (list, tuple)):
+        return [_object_to_dict_reflexivo(item, _visited) for item in obj]
+    if isinstance(obj, dict):
+        return {k: _object_to_dict_reflexivo(v, _visited) for k, v in obj.items()}
+    if hasattr(type(obj), "__slots__"):
+        return {key: _object_to_dict_reflexivo(getattr(obj, key), _visited) for key in type(obj).__slots__}
+    if hasattr(obj, "__dict__"):
+        return {key: _object_to_dict_reflexivo(value, _visited) for key, value in vars(obj).items()}
+    return str(obj)
+
+
+def bench_serializar(args):
+    import utils
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generar_xml(os.path.join(tmp, "x.xml"), args.fracciones, args.items)
+        pedimento = PedimentoStreamBuilder(path, numerico=True).build()
+
+        antes, t_dict_antes = _mejor(args.repeticiones, _object_to_dict_reflexivo, pedimento)
+        despues, t_dict = _mejor(args.repeticiones, utils.object_to_dict, pedimento)
+        assert antes == despues, "dicts distintos"
+
+        _, t_json_antes = _mejor(
+            args.repeticiones,
+            lambda: json.dumps(_object_to_dict_reflexivo(pedimento), indent=2, ensure_ascii=False),
+        )
+        compacto, t_compacto = _mejor(args.repeticiones, utils.object_to_json, pedimento, None)
+
+        salida = os.path.join(tmp, "x.json")
+        _, t_stream = _mejor(args.repeticiones, utils.save_json, pedimento, salida, None)
+        _, _, pico_stream = medir(utils.save_json, pedimento, salida, None)
+        _, _, pico_json = medir(utils.object_to_json, pedimento, None)
+        with open(salida, encoding="utf-8") as f:
+            assert json.load(f) == despues, "el JSON en streaming no coincide"
+
+        encoder = "orjson" if utils.orjson is not None else "json"
+        print(f"{args.fracciones * args.items} items, mismo dict ({len(compacto) / 2**20:.1f} MiB de JSON compacto)")
+        print(f"  a dict  reflexivo : {t_dict_antes * 1000:8.1f} ms")
+        print(f"  a dict  esquema   : {t_dict * 1000:8.1f} ms  ({t_dict_antes / t_dict:.1f}x)")
+        print(f"  JSON indent=2     : {t_json_antes * 1000:8.1f} ms")
+        print(f"  JSON compacto     : {t_compacto * 1000:8.1f} ms  ({encoder}, {t_json_antes / t_compacto:.1f}x)")
+        print(f"  streaming a disco : {t_stream * 1000:8.1f} ms  pico {pico_stream / 2**20:6.1f} MiB (vs {pico_json / 2**20:.1f} MiB)")
+
+
+def bench_snapshot(args):
+    import snapshot
+    from vectorized import ColumnarProcessor
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = generar_xml(os.path.join(tmp, "x.xml"), args.fracciones, args.items)
+        cache_dir = os.path.join(tmp, "snapshots")
+
+        construido, t_parseo = _mejor(args.repeticiones, lambda: PedimentoStreamBuilder(path, numerico=True).build())
+        _, t_primera = _con_tiempo(snapshot.cargar_pedimento, path, True, cache_dir)
+        cargado, t_snapshot = _mejor(args.repeticiones, snapshot.cargar_pedimento, path, True, cache_dir)
+        assert mismo_objeto(construido, cargado), "el snapshot no coincide con el XML"
+
+        processor = ColumnarProcessor()
+        _, t_parseo_col = _mejor(args.repeticiones, processor.load_pedimento, path)
+        snapshot.cargar_para(processor, path, cache_dir)
+        _, t_snapshot_col = _mejor(args.repeticiones, snapshot.cargar_para, processor, path, cache_dir)
+
+        # cambiar el XML cambia la clave: se reconstruye y el viejo queda aparte
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n")
+        antes = len(os.listdir(cache_dir))
+        snapshot.cargar_pedimento(path, True, cache_dir)
+        assert len(os.listdir(cache_dir)) == antes + 1, "el XML modificado no invalidó el snapshot"
+
+        items = args.fracciones * args.items
+        print(f"{items} items, mismo Pedimento desde el snapshot")
+        print(f"  parseo XML            : {t_parseo * 1000:8.1f} ms")
+        print(f"  parseo + guardar      : {t_primera * 1000:8.1f} ms  (primera vez)")
+        print(f"  snapshot (incluye sha): {t_snapshot * 1000:8.1f} ms  ({t_parseo / t_snapshot:.1f}x)")
+        print(f"  columnar parseo       : {t_parseo_col * 1000:8.1f} ms")
+        print(f"  columnar snapshot     : {t_snapshot_col * 1000:8.1f} ms  ({t_parseo_col / t_snapshot_col:.1f}x)")
+
+
+def bench_store(args):
+    from store import PedimentoStore, cargar_directorio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            generar_xml(os.path.join(tmp, f"p{i}.xml"), args.fracciones, args.items, seed=i + 1)
+            for i in range(args.pedimentos)
+        ]
+        store = PedimentoStore(os.path.join(tmp, "pedimentos.sqlite3"))
+
+        (cargados, _, errores), t_carga = _con_tiempo(cargar_directorio, store, paths, args.lote)
+        assert cargados == args.pedimentos and not errores, errores
+        # segunda corrida: todo está cargado (por hash)
+        (cargados, omitidos, _), t_recarga = _con_tiempo(cargar_directorio, store, paths, args.lote)
+        assert cargados == 0 and omitidos == args.pedimentos
+
+        codigo = "ITM-00007"
+        filas, t_item = _mejor(args.repeticiones, store.items, codigo, "2025-01-01", "2025-12-31")
+
+        def escanear():
+            encontrados = 0
+            for path in paths:
+                ped = PedimentoStreamBuilder(path, numerico=True).build()
+                encontrados += sum(
+                    1 for fr in ped.fracciones for it in fr.items if it.item_number == codigo
+                )
+            return encontrados
+
+        encontrados, t_escaneo = _con_tiempo(escanear)
+        assert encontrados == len(filas), (encontrados, len(filas))
+
+        _, t_igi = _mejor(args.repeticiones, store.impuestos_por_fraccion, "6")
+        _, t_rfc = _mejor(args.repeticiones, store.pedimentos, "CDE010101AAA")
+
+        resumen = store.resumen()
+        print(f"{args.pedimentos} pedimentos, {resumen['items']} items en SQLite")
+        print(f"  carga (parseo + insert): {t_carga:8.2f} s")
+        print(f"  recarga (ya cargados)  : {t_recarga:8.2f} s")
+        print(f"  item_number re-parseo  : {t_escaneo * 1000:8.1f} ms  ({encontrados} items)")
+        print(f"  item_number en SQLite  : {t_item * 1000:8.1f} ms  ({t_escaneo / t_item:.0f}x)")
+        print(f"  IGI por fracción       : {t_igi * 1000:8.1f} ms")
+        print(f"  pedimentos de un RFC   : {t_rfc * 1000:8.1f} ms")
+
+
+def bench_historial(args):
+    import sqlite3
+    from historial import HistorialCostos
+
+    rnd = random.Random(7)
+    codigos = [f"ITM-{i:05d}" for i in range(args.codigos)]
+
+    def resultado(n):
+        items = []
+        for codigo in rnd.sample(codigos, min(args.items, len(codigos))):
+            cantidad = rnd.randint(1, 100)
+            costo_total = cantidad * rnd.uniform(10, 500)
+            items.append({"codigo": codigo, "cantidad": cantidad, "costo_total": costo_total,
+                          "costo_final": costo_total / cantidad, "tipo_de_cambio": 18.3})
+        fecha = f"2025-{n % 12 + 1:02d}-{n % 28 + 1:02d}"
+        return {"pedimento": {"numero_completo": f"25 47 3999 {n:07d}", "fecha_pago": fecha}, "items": items}
+
+    resultados = [resultado(n) for n in range(args.pedimentos)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "historial.sqlite3")
+        historial = HistorialCostos(db)
+
+        t_registro = _cronometrar(lambda: [historial.registrar(r) for r in resultados])
+        # volver a registrar reemplaza: los acumulados no cambian
+        antes = historial.costos(codigos[0])
+        historial.registrar(resultados[0])
+        despues = historial.costos(codigos[0])
+        assert antes["pedimentos"] == despues["pedimentos"]
+        assert abs(antes["costo_total"] - despues["costo_total"]) < 1e-6 * abs(antes["costo_total"])
+
+        # referencia: recalcular los acumulados sobre la serie en cada consulta
+        def recalcular(codigo):
+            con = sqlite3.connect(db)
+            try:
+                return con.execute(
+                    """
+                    SELECT COUNT(*), SUM(cantidad), SUM(costo_total),
+                           (SELECT costo_final FROM costos WHERE item_number = ?
+                            ORDER BY fecha DESC, registrado DESC LIMIT 1)
+                    FROM costos WHERE item_number = ?
+                    """,
+                    (codigo, codigo),
+                ).fetchone()
+            finally:
+                con.close()
+
+        n, cantidad, costo_total, _ = recalcular(codigos[0])
+        assert n == despues["pedimentos"] and abs(costo_total / cantidad - despues["promedio_ponderado"]) < 1e-6
+
+        consulta = codigos[:args.consultas]
+        _, t_resumen = _mejor(args.repeticiones, lambda: [historial.costos(c, limite=0) for c in consulta])
+        _, t_recalculo = _mejor(args.repeticiones, lambda: [recalcular(c) for c in consulta])
+        _, t_serie = _mejor(args.repeticiones, lambda: [historial.costos(c) for c in consulta])
+
+        filas = args.pedimentos * min(args.items, len(codigos))
+        print(f"{args.pedimentos} pedimentos, {filas} filas de costo, {args.codigos} códigos")
+        print(f"  registrar              : {t_registro / args.pedimentos * 1000:8.2f} ms por pedimento")
+        print(f"  acumulados (tabla)     : {t_resumen / len(consulta) * 1000:8.2f} ms por código")
+        print(f"  acumulados recalculados: {t_recalculo / len(consulta) * 1000:8.2f} ms por código")
+        print(f"  con serie completa     : {t_serie / len(consulta) * 1000:8.2f} ms por código")
+
+
+def bench_ndjson(args):
+    """/api/pedimento/procesar: JSON completo vs NDJSON en streaming
+       (primer byte, tiempo total y memoria pico de la petición)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        app = app_temporal(tmp)
+        path = generar_xml(os.path.join(tmp, "x.xml"), args.fracciones, args.items)
+        with open(path, "rb") as f:
+            xml = f.read()
+        cliente = app.test_client()
+
+        def pedir(query, medir_memoria=False):
+            """(primer bloque, total, memoria pico, cuerpo) consumiendo la
+               respuesta por bloques, como un cliente. Al medir memoria no
+               se guardan los bloques y la memoria es (pico, retenida al
+               primer bloque)."""
+            if medir_memoria:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            r = cliente.post(f"/api/pedimento/procesar{query}", data=xml,
+                             content_type="application/xml", buffered=False)
+            primero = None
+            partes = []
+            for bloque in r.response:
+                if primero is None:
+                    primero = time.perf_counter() - t0
+                    if medir_memoria:
+                        retenida, _ = tracemalloc.get_traced_memory()
+                if not medir_memoria:
+                    partes.append(bloque)
+            total = time.perf_counter() - t0
+            pico = None
+            if medir_memoria:
+                pico = (tracemalloc.get_traced_memory()[1], retenida)
+                tracemalloc.stop()
+            r.close()
+            return primero, total, pico, b"".join(partes)
+
+        # tiempos sin tracemalloc (lo hace varias veces más lento)
+        p_json, t_json, _, cuerpo = pedir("")
+        p_nd, t_nd, _, lineas = pedir("?formato=ndjson")
+        gc.collect()
+        m_json = pedir("", True)[2]
+        gc.collect()
+        m_nd = pedir("?formato=ndjson", True)[2]
+
+        completo = json.loads(cuerpo)["data"]
+        lineas = [json.loads(l) for l in lineas.splitlines()]
+        assert lineas[0]["data"] == completo["pedimento"]
+        assert [l["data"] for l in lineas[1:-1]] == completo["items"], "el stream no coincide con el JSON"
+        assert lineas[-1] == {"tipo": "fin", "items": len(completo["items"])}
+
+        print(f"{len(completo['items'])} items agrupados ({len(xml) / 1e6:.1f} MB de XML)")
+        # el pico lo marca el parseo del XML, igual en los dos modos; al
+        # primer bloque JSON retiene el cuerpo completo y NDJSON el agrupado
+        for nombre, p, t, (m_pico, m_retenida) in (
+            ("JSON  ", p_json, t_json, m_json), ("NDJSON", p_nd, t_nd, m_nd),
+        ):
+            print(f"  {nombre} primer byte {p * 1000:7.1f} ms  total {t * 1000:7.1f} ms"
+                  f"  pico {m_pico / 1e6:6.1f} MB  al primer byte {m_retenida / 1e6:6.1f} MB")
+
+
+def _mejor(repeticiones, fn, *args):
+    """(resultado, mejor tiempo) de varias corridas."""
+    tiempos = []
+    for _ in range(repeticiones):
+        r, dt = _con_tiempo(fn, *args)
+        tiempos.append(dt)
+    return r, min(tiempos)
+
+
+def _con_tiempo(fn, *args):
+    t0 = time.perf_counter()
+    r = fn(*args)
+    return r, time.perf_counter() - t0
+
+
+def _cronometrar(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("streaming", help="builder fluido vs iterparse (tiempo y memoria pico)")
+    p.add_argument("--fracciones", type=int, default=2000)
+    p.add_argument("--items", type=int, default=5)
+    p.set_defaults(func=bench_streaming)
+
+    p = sub.add_parser("campos", help="get() por campo vs índice de hijos por tag")
+    p.add_argument("--items", type=int, default=10000)
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(func=bench_campos)
+
+    p = sub.add_parser("concurrencia", help="estrés del endpoint con peticiones paralelas")
+    p.add_argument("--pedimentos", type=int, default=8)
+    p.add_argument("--fracciones", type=int, default=50)
+    p.add_argument("--hilos", type=int, default=16)
+    p.add_argument("--rondas", type=int, default=4)
+    p.set_defaults(func=bench_concurrencia)
+
+    p = sub.add_parser("vectorizado", help="costeo con dicts vs motor vectorizado (paridad y tiempo)")
+    p.add_argument("--fracciones", type=int, default=5000)
+    p.add_argument("--items", type=int, default=6)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_vectorizado)
+
+    p = sub.add_parser("memoria", help="bytes por item con __dict__ vs __slots__")
+    p.add_argument("--items", type=int, default=100000)
+    p.add_argument("--por-fraccion", type=int, default=10)
+    p.set_defaults(func=bench_memoria)
+
+    p = sub.add_parser("columnar", help="objetos vs tablas columnares (memoria, paridad y tiempo)")
+    p.add_argument("--items", type=int, default=100000)
+    p.add_argument("--por-fraccion", type=int, default=10)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_columnar)
+
+    p = sub.add_parser("excel", help="Excel premium celda por celda vs write-only")
+    p.add_argument("--filas", type=int, default=50000)
+    p.set_defaults(func=bench_excel)
+
+    p = sub.add_parser("formato", help="xml_a_excel: reformatear el libro vs escribirlo ya formateado")
+    p.add_argument("--fracciones", type=int, default=5000)
+    p.add_argument("--items", type=int, default=5)
+    p.set_defaults(func=bench_formato)
+
+    p = sub.add_parser("consolidado", help="memoria pico del libro consolidado vs número de pedimentos")
+    p.add_argument("--pedimentos", type=int, default=40)
+    p.add_argument("--fracciones", type=int, default=200)
+    p.add_argument("--items", type=int, default=5)
+    p.set_defaults(func=bench_consolidado)
+
+    p = sub.add_parser("parquet", help="leer un mes: Excel por pedimento vs dataset Parquet")
+    p.add_argument("--pedimentos", type=int, default=40)
+    p.add_argument("--fracciones", type=int, default=200)
+    p.add_argument("--items", type=int, default=5)
+    p.set_defaults(func=bench_parquet)
+
+    p = sub.add_parser("prorrateo", help="xml_a_excel: un reparto por gasto vs motor de prorrateo")
+    p.add_argument("--fracciones", type=int, default=10000)
+    p.add_argument("--gastos", type=int, default=200)
+    p.set_defaults(func=bench_prorrateo)
+
+    p = sub.add_parser("serializar", help="utils: object_to_dict reflexivo vs por esquema, JSON compacto y streaming")
+    p.add_argument("--fracciones", type=int, default=5000)
+    p.add_argument("--items", type=int, default=5)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_serializar)
+
+    p = sub.add_parser("snapshot", help="construir desde el XML vs cargar el snapshot binario")
+    p.add_argument("--fracciones", type=int, default=5000)
+    p.add_argument("--items", type=int, default=5)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_snapshot)
+
+    p = sub.add_parser("store", help="re-parsear todos los XML vs consultar el almacén SQLite")
+    p.add_argument("--pedimentos", type=int, default=200)
+    p.add_argument("--fracciones", type=int, default=50)
+    p.add_argument("--items", type=int, default=5)
+    p.add_argument("--lote", type=int, default=50)
+    p.add_argument("--repeticiones", type=int, default=5)
+    p.set_defaults(func=bench_store)
+
+    p = sub.add_parser("historial", help="historial de costos: acumulados incrementales vs recalcular")
+    p.add_argument("--pedimentos", type=int, default=2000)
+    p.add_argument("--codigos", type=int, default=500)
+    p.add_argument("--items", type=int, default=100)
+    p.add_argument("--consultas", type=int, default=100)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_historial)
+
+    p = sub.add_parser("ndjson", help="/api/pedimento/procesar: JSON completo vs NDJSON en streaming")
+    p.add_argument("--fracciones", type=int, default=5000)
+    p.add_argument("--items", type=int, default=5)
+    p.set_defaults(func=bench_ndjson)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
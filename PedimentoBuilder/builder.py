@@ -1,32 +1,80 @@
 # builder.py
 
+import io
 import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
 
 from domain import (
     Pedimento, Cliente, ProveedorComprador, Factura,
     Contribucion, Permiso, DescripcionEspecifica,
-    Item, Fraccion, Identificador, Incrementable
+    Item, Fraccion, Identificador, Incrementable, PedimentoColumnar
 )
 
 # -------------------------------------------------------------------
 # MÉTODOS UTILITARIOS
 # -------------------------------------------------------------------
-def get(el, field):
-    """Devuelve texto limpio del nodo.
-       Soporta nodos vacíos, nodos con hijos, nodos con espacios."""
-    node = el.find(field)
-    if node is None:
-        return ""
+def xml_source(source):
+    """Normaliza la entrada del builder: ruta, bytes o stream binario.
+       Los bytes se envuelven en memoria; nunca se escriben a disco."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
 
+
+def node_text(node):
+    """Texto limpio de un nodo ya localizado (ver get)."""
     # texto directo
     if node.text and node.text.strip():
-        if node.text == '59.34':
-            pass
         return node.text.strip()
 
     # texto de hijos
-    txt = "".join((c.text or "") for c in node.iter()).strip()
-    return txt
+    return "".join((c.text or "") for c in node.iter()).strip()
+
+
+def get(el, field):
+    """Devuelve texto limpio del nodo.
+       Soporta nodos vacíos, nodos con hijos, nodos con espacios."""
+    node = el.find(field)
+    if node is None:
+        return ""
+    return node_text(node)
+
+
+def index_children(el):
+    """Indexa los hijos directos por tag en una sola pasada.
+       Conserva el primero de cada tag, igual que el.find(tag)."""
+    return {child.tag: child for child in reversed(el)}
+
+
+def to_number(texto):
+    """Convierte un campo numérico igual que float(x or 0) en el costeo.
+       Si el texto no es numérico se conserva tal cual."""
+    try:
+        return float(texto or 0)
+    except ValueError:
+        return texto
+
+
+def fill(obj, el, campos, numericos=()):
+    """Asigna a obj cada (atributo, tag) del mapa de campos leyendo
+       los hijos de el desde su índice, sin un find() por campo.
+       Los atributos en numericos se guardan ya convertidos a float."""
+    idx = index_children(el)
+    for attr, tag in campos:
+        node = idx.get(tag)
+        if node is None:
+            valor = ""
+        else:
+            # camino rápido: texto directo (lo común en hojas)
+            valor = node.text.strip() if node.text else ""
+            if not valor:
+                valor = node_text(node)
+        if attr in numericos:
+            valor = to_number(valor)
+        setattr(obj, attr, valor)
+    return obj
 
 
 def is_empty_node(node):
@@ -50,54 +98,307 @@ def is_empty_node(node):
     return True
 
 
+# -------------------------------------------------------------------
+# MAPAS DE CAMPOS (atributo del dominio, tag XML)
+# -------------------------------------------------------------------
+CAMPOS_HEADER = (
+    ("id_pedimento", "IdPedimento"),
+    ("numero_pedimento", "NumerodePedimento"),
+    ("numero_completo", "NumerodePedimentoCompleto"),
+    ("fecha_pago", "FechaDePagoDelPedimento"),
+    ("tipo_de_cambio", "TipoDeCambio"),
+    ("valor_aduana", "ValorAduana"),
+    ("precio_pagado_valor_comecrial", "ValorComercialPrecioPagado"),
+)
+
+CAMPOS_CLIENTE = (
+    ("razon_social", "RazonSocial"),
+    ("curp", "CURP"),
+    ("rfc", "RFC"),
+    ("direccion", "Direccion"),
+    ("numero_externo", "NumeroExterno"),
+    ("numero_interno", "NumeroInterno"),
+    ("colonia", "Colonia"),
+    ("ciudad", "Ciudad"),
+    ("cp", "CP"),
+    ("entidad", "Entidad"),
+    ("nombre_entidad", "NombreEntidad"),
+    ("pais", "Pais"),
+    ("nombre_pais", "NombrePais"),
+    ("telefono1", "Telefono1"),
+    ("telefono2", "Telefono2"),
+)
+
+CAMPOS_PROVEEDOR_COMPRADOR = (
+    ("cp", "CP"),
+    ("pais", "Pais"),
+    ("razon_social", "RazonSocial"),
+    ("rfc_tax_id", "RfcTaxId"),
+    ("direccion", "Direccion"),
+    ("numero_interno", "NumeroInterno"),
+    ("numero_externo", "NumeroExterno"),
+    ("municipio_ciudad", "MunicipioCiudad"),
+    ("colonia", "Colonia"),
+    ("telefono1", "Telefono1"),
+    ("telefono2", "Telefono2"),
+    ("entidad", "Entidad"),
+    ("nombre_entidad", "NombreEntidad"),
+)
+
+CAMPOS_FACTURA = (
+    ("orden", "Orden"),
+    ("folio", "Folio"),
+    ("factor_monetario", "FactorMonetario"),
+    ("fecha", "Fecha"),
+    ("incoterm", "Incoterm"),
+    ("moneda_factura", "MonedaFactura"),
+    ("observaciones", "Obervaciones"),
+    ("pais_factura", "PaisFactura"),
+    ("pais_factor_monetario", "PaisFactorMonetario"),
+    ("pedido", "Pedido"),
+    ("valor_dolares", "ValorDolares"),
+    ("valor_moneda_extranjera", "ValorMonExtranjera"),
+    ("vinculacion", "Vinculacion"),
+    ("valor_total", "ValorTotal"),
+    ("subdivision", "Subdivision"),
+    ("es_certificado_origen", "EsCertificadoOrigen"),
+    ("numero_exportador_confiable", "NumeroExportadorConfiable"),
+    ("edocument", "Edocument"),
+)
+
+CAMPOS_CONTRIBUCION = (
+    ("forma_pago", "FormaDePago"),
+    ("clave_impuesto", "ClaveImpuesto"),
+    ("concepto_impuesto", "ConceptoImpuesto"),
+    ("importe", "Importe"),
+    ("tasa", "Tasa"),
+    ("tipo_de_tasa", "TipoDeTasa"),
+)
+
+CAMPOS_PERMISO = (
+    ("permiso", "Permiso"),
+    ("numero_permiso", "NumeroPermiso"),
+    ("firma", "Firma"),
+    ("complemento_uno", "ComplementoUno"),
+    ("complemento_dos", "ComplementoDos"),
+    ("complemento_tres", "ComplementoTres"),
+    ("valor_dolares", "ValorDolares"),
+    ("cantidad_umt", "CantidadUMT"),
+    ("tipo_de_permiso", "TipoDePermiso"),
+)
+
+CAMPOS_DESCRIPCION = (
+    ("id", "Id"),
+    ("id_item", "IdItem"),
+    ("marca", "Marca"),
+    ("modelo", "Modelo"),
+    ("serie", "Serie"),
+    ("dato_identificacion", "DatoIdentificacion"),
+)
+
+CAMPOS_ITEM = (
+    ("orden", "Orden"),
+    ("origen", "Origen"),
+    ("factura", "Factura"),
+    ("item_number", "ItemNumber"),
+    ("unidad_factura", "UnidadFactura"),
+    ("unidad_tarifa", "UnidadTarifa"),
+    ("unidad_vu", "UnidadVU"),
+    ("cantidad", "Cantidad"),
+    ("cantidad_tarifa", "CantidadTarifa"),
+    ("cantidad_vu", "CantidadVU"),
+    ("precio_unitario", "PrecioUnitario"),
+    ("total", "Total"),
+    ("fraccion", "Fraccion"),
+    ("nico", "Nico"),
+)
+
+CAMPOS_FRACCION = (
+    ("orden", "Orden"),
+    ("numero_fraccion", "NumeroFraccion"),
+    ("nico", "Nico"),
+    ("subdivision", "Subdivision"),
+    ("cantidad_factura", "CantidadFactura"),
+    ("cantidad_tarifa", "CantidadTarifa"),
+    ("descripcion", "Descripcion"),
+    ("dta", "DTA"),
+    ("metodo_valoracion", "MetodoValoracion"),
+    ("pais_vendedor_comprador", "PaisVendedorComprador"),
+    ("pais_origen_destino", "PaisOrigenDestino"),
+    ("precio_unitario", "PrecioUnitario"),
+    ("unidad_factura", "UnidadFactura"),
+    ("unidad_tarifa", "UnidadTarifa"),
+    ("valor_agregado", "ValorAgregado"),
+    ("valor_aduana", "ValorAduana"),
+    ("valor_dolares", "ValorDolares"),
+    ("valor_moneda_facturacion", "ValorMonedaFacturacion"),
+    ("importe_precio_pagado", "ImportePrecioPagado"),
+    ("vinculacion", "Vinculacion"),
+    ("observaciones", "Observaciones"),
+)
+
+CAMPOS_IDENTIFICADOR = (
+    ("identificador", "Identificador"),
+    ("complemento_uno", "ComplementoUno"),
+    ("complemento_dos", "ComplementoDos"),
+    ("complemento_tres", "ComplementoTres"),
+)
+
+CAMPOS_INCREMENTABLE = (
+    ("id", "Id"),
+    ("concepto", "Concepto"),
+    ("importe_me", "ImporteME"),
+    ("importe_mn", "ImporteMN"),
+    ("pais", "Pais"),
+)
+
+
+# -------------------------------------------------------------------
+# CAMPOS NUMÉRICOS (modo numerico=True del builder)
+# -------------------------------------------------------------------
+NUMERICOS_HEADER = frozenset({
+    "tipo_de_cambio", "valor_aduana", "precio_pagado_valor_comecrial",
+})
+
+NUMERICOS_FACTURA = frozenset({
+    "factor_monetario", "valor_dolares", "valor_moneda_extranjera", "valor_total",
+})
+
+NUMERICOS_CONTRIBUCION = frozenset({"importe", "tasa"})
+
+NUMERICOS_PERMISO = frozenset({"valor_dolares", "cantidad_umt"})
+
+NUMERICOS_ITEM = frozenset({
+    "cantidad", "cantidad_tarifa", "cantidad_vu", "precio_unitario", "total",
+})
+
+NUMERICOS_FRACCION = frozenset({
+    "cantidad_factura", "cantidad_tarifa", "dta", "precio_unitario",
+    "valor_agregado", "valor_aduana", "valor_dolares",
+    "valor_moneda_facturacion", "importe_precio_pagado",
+})
+
+NUMERICOS_INCREMENTABLE = frozenset({"importe_me", "importe_mn"})
+
+
+def _numericos(conjunto, numerico):
+    return conjunto if numerico else ()
+
+
+# -------------------------------------------------------------------
+# CONSTRUCTORES POR NODO
+# (compartidos por el builder fluido y el de streaming)
+# -------------------------------------------------------------------
+def _build_header(pedimento, r, numerico=False):
+    fill(pedimento, r, CAMPOS_HEADER, _numericos(NUMERICOS_HEADER, numerico))
+
+    # factores del pedimento: se calculan una vez y no por item
+    if numerico:
+        va = pedimento.valor_aduana
+        precio_pagado = pedimento.precio_pagado_valor_comecrial
+        if isinstance(va, float) and isinstance(precio_pagado, float) and precio_pagado:
+            pedimento.factor_valor_aduana = va / precio_pagado
+
+
+def _build_cliente(pedimento, r):
+    cli = r.find("Cliente")
+    if cli is None or is_empty_node(cli):
+        return
+    fill(pedimento.cliente, cli, CAMPOS_CLIENTE)
+
+
+def _build_factura(fac, numerico=False):
+    f = fill(Factura(), fac, CAMPOS_FACTURA, _numericos(NUMERICOS_FACTURA, numerico))
+
+    # --------- proveedor/comprador ---------
+    pc_node = fac.find("ProveedorComprador")
+    if pc_node is not None and len(pc_node) and not is_empty_node(pc_node):
+        fill(f.proveedor_comprador, pc_node, CAMPOS_PROVEEDOR_COMPRADOR)
+
+    return f
+
+
+def _build_contribucion(cnode, numerico=False):
+    return fill(Contribucion(), cnode, CAMPOS_CONTRIBUCION, _numericos(NUMERICOS_CONTRIBUCION, numerico))
+
+
+def _build_permiso(pnode, numerico=False):
+    return fill(Permiso(), pnode, CAMPOS_PERMISO, _numericos(NUMERICOS_PERMISO, numerico))
+
+
+def _build_descripcion(dnode):
+    return fill(DescripcionEspecifica(), dnode, CAMPOS_DESCRIPCION)
+
+
+def _build_item(inode, numerico=False):
+    it = fill(Item(), inode, CAMPOS_ITEM, _numericos(NUMERICOS_ITEM, numerico))
+
+    # -------- descripciones --------
+    for dnode in inode.findall("DescripcionesEspecificas/DescripcionEspecifica"):
+        if is_empty_node(dnode):
+            continue
+        it.descripciones.append(_build_descripcion(dnode))
+
+    return it
+
+
+def _build_fraccion(fr, numerico=False):
+    f = fill(Fraccion(), fr, CAMPOS_FRACCION, _numericos(NUMERICOS_FRACCION, numerico))
+
+    # ----------- CONTRIBUCIONES -----------
+    for cnode in fr.findall("Impuestos/Contribucion"):
+        if is_empty_node(cnode):
+            continue
+        f.contribuciones.append(_build_contribucion(cnode, numerico))
+
+    # ----------- PERMISOS -----------
+    for pnode in fr.findall("Permisos/PermisoFraccion"):
+        if is_empty_node(pnode):
+            continue
+        f.permisos.append(_build_permiso(pnode, numerico))
+
+    # ----------- ITEMS -----------
+    for inode in fr.findall("Items/Item"):
+        if is_empty_node(inode):
+            continue
+        f.items.append(_build_item(inode, numerico))
+
+    return f
+
+
+def _build_identificador(ide, numerico=False):
+    return fill(Identificador(), ide, CAMPOS_IDENTIFICADOR)
+
+
+def _build_incrementable(op, numerico=False):
+    return fill(Incrementable(), op, CAMPOS_INCREMENTABLE, _numericos(NUMERICOS_INCREMENTABLE, numerico))
+
+
 # ===================================================================
 #                  P E D I M E N T O   B U I L D E R
 # ===================================================================
 class PedimentoBuilder:
 
-    def __init__(self, xml_path):
-        self.tree = ET.parse(xml_path)
+    def __init__(self, xml_path, numerico=False):
+        """xml_path puede ser ruta, bytes o un objeto tipo archivo.
+           Con numerico=True importes y cantidades se guardan como float."""
+        self.tree = ET.parse(xml_source(xml_path))
         self.root = self.tree.getroot()
+        self.numerico = numerico
         self.pedimento = Pedimento()
 
     # ============================================================
     #  PEDIMENTO HEADER
     # ============================================================
     def build_header(self):
-        r = self.root
-        self.pedimento.id_pedimento = get(r, "IdPedimento")
-        self.pedimento.numero_pedimento = get(r, "NumerodePedimento")
-        self.pedimento.numero_completo = get(r, "NumerodePedimentoCompleto")
-        self.pedimento.tipo_de_cambio = get(r, "TipoDeCambio")
-        self.pedimento.valor_aduana = get(r, "ValorAduana")
-        self.pedimento.precio_pagado_valor_comecrial = get(r, "ValorComercialPrecioPagado")
+        _build_header(self.pedimento, self.root, self.numerico)
         return self
 
     # ============================================================
     #  CLIENTE
     # ============================================================
     def build_cliente(self):
-        cli = self.root.find("Cliente")
-        if cli is None or is_empty_node(cli):
-            return self
-
-        c = self.pedimento.cliente
-        c.razon_social = get(cli, "RazonSocial")
-        c.curp = get(cli, "CURP")
-        c.rfc = get(cli, "RFC")
-        c.direccion = get(cli, "Direccion")
-        c.numero_externo = get(cli, "NumeroExterno")
-        c.numero_interno = get(cli, "NumeroInterno")
-        c.colonia = get(cli, "Colonia")
-        c.ciudad = get(cli, "Ciudad")
-        c.cp = get(cli, "CP")
-        c.entidad = get(cli, "Entidad")
-        c.nombre_entidad = get(cli, "NombreEntidad")
-        c.pais = get(cli, "Pais")
-        c.nombre_pais = get(cli, "NombrePais")
-        c.telefono1 = get(cli, "Telefono1")
-        c.telefono2 = get(cli, "Telefono2")
-
+        _build_cliente(self.pedimento, self.root)
         return self
 
     # ============================================================
@@ -105,50 +406,9 @@ class PedimentoBuilder:
     # ============================================================
     def build_facturas(self):
         for fac in self.root.findall("Facturas/Factura"):
-
             if is_empty_node(fac):
                 continue
-
-            f = Factura()
-            f.orden = get(fac, "Orden")
-            f.folio = get(fac, "Folio")
-            f.factor_monetario = get(fac, "FactorMonetario")
-            f.fecha = get(fac, "Fecha")
-            f.incoterm = get(fac, "Incoterm")
-            f.moneda_factura = get(fac, "MonedaFactura")
-            f.observaciones = get(fac, "Obervaciones")
-            f.pais_factura = get(fac, "PaisFactura")
-            f.pais_factor_monetario = get(fac, "PaisFactorMonetario")
-            f.pedido = get(fac, "Pedido")
-
-            # --------- proveedor/comprador ---------
-            pc_node = fac.find("ProveedorComprador")
-            if pc_node and not is_empty_node(pc_node):
-                pc = f.proveedor_comprador
-                pc.cp = get(pc_node, "CP")
-                pc.pais = get(pc_node, "Pais")
-                pc.razon_social = get(pc_node, "RazonSocial")
-                pc.rfc_tax_id = get(pc_node, "RfcTaxId")
-                pc.direccion = get(pc_node, "Direccion")
-                pc.numero_interno = get(pc_node, "NumeroInterno")
-                pc.numero_externo = get(pc_node, "NumeroExterno")
-                pc.municipio_ciudad = get(pc_node, "MunicipioCiudad")
-                pc.colonia = get(pc_node, "Colonia")
-                pc.telefono1 = get(pc_node, "Telefono1")
-                pc.telefono2 = get(pc_node, "Telefono2")
-                pc.entidad = get(pc_node, "Entidad")
-                pc.nombre_entidad = get(pc_node, "NombreEntidad")
-
-            f.valor_dolares = get(fac, "ValorDolares")
-            f.valor_moneda_extranjera = get(fac, "ValorMonExtranjera")
-            f.vinculacion = get(fac, "Vinculacion")
-            f.valor_total = get(fac, "ValorTotal")
-            f.subdivision = get(fac, "Subdivision")
-            f.es_certificado_origen = get(fac, "EsCertificadoOrigen")
-            f.numero_exportador_confiable = get(fac, "NumeroExportadorConfiable")
-            f.edocument = get(fac, "Edocument")
-
-            self.pedimento.facturas.append(f)
+            self.pedimento.facturas.append(_build_factura(fac, self.numerico))
 
         return self
 
@@ -157,102 +417,9 @@ class PedimentoBuilder:
     # ============================================================
     def build_fracciones(self):
         for fr in self.root.findall("Fracciones/Fraccion"):
-
             if is_empty_node(fr):
                 continue
-
-            f = Fraccion()
-            f.orden = get(fr, "Orden")
-            f.numero_fraccion = get(fr, "NumeroFraccion")
-            f.nico = get(fr, "Nico")
-            f.subdivision = get(fr, "Subdivision")
-            f.cantidad_factura = get(fr, "CantidadFactura")
-            f.cantidad_tarifa = get(fr, "CantidadTarifa")
-            f.descripcion = get(fr, "Descripcion")
-            f.dta = get(fr, "DTA")
-            if f.dta == "59.34":
-                pass
-            f.metodo_valoracion = get(fr, "MetodoValoracion")
-            f.pais_vendedor_comprador = get(fr, "PaisVendedorComprador")
-            f.pais_origen_destino = get(fr, "PaisOrigenDestino")
-            f.precio_unitario = get(fr, "PrecioUnitario")
-            f.unidad_factura = get(fr, "UnidadFactura")
-            f.unidad_tarifa = get(fr, "UnidadTarifa")
-            f.valor_agregado = get(fr, "ValorAgregado")
-            f.valor_aduana = get(fr, "ValorAduana")
-            f.valor_dolares = get(fr, "ValorDolares")
-            f.valor_moneda_facturacion = get(fr, "ValorMonedaFacturacion")
-            f.importe_precio_pagado = get(fr, "ImportePrecioPagado")
-            f.vinculacion = get(fr, "Vinculacion")
-            f.observaciones = get(fr, "Observaciones")
-
-            # ----------- CONTRIBUCIONES -----------
-            for cnode in fr.findall("Impuestos/Contribucion"):
-                if is_empty_node(cnode):
-                    continue
-                c = Contribucion()
-                c.forma_pago = get(cnode, "FormaDePago")
-                c.clave_impuesto = get(cnode, "ClaveImpuesto")
-                c.concepto_impuesto = get(cnode, "ConceptoImpuesto")
-                c.importe = get(cnode, "Importe")
-                c.tasa = get(cnode, "Tasa")
-                c.tipo_de_tasa = get(cnode, "TipoDeTasa")
-                f.contribuciones.append(c)
-
-            # ----------- PERMISOS -----------
-            for pnode in fr.findall("Permisos/PermisoFraccion"):
-                if is_empty_node(pnode):
-                    continue
-                p = Permiso()
-                p.permiso = get(pnode, "Permiso")
-                p.numero_permiso = get(pnode, "NumeroPermiso")
-                p.firma = get(pnode, "Firma")
-                p.complemento_uno = get(pnode, "ComplementoUno")
-                p.complemento_dos = get(pnode, "ComplementoDos")
-                p.complemento_tres = get(pnode, "ComplementoTres")
-                p.valor_dolares = get(pnode, "ValorDolares")
-                p.cantidad_umt = get(pnode, "CantidadUMT")
-                p.tipo_de_permiso = get(pnode, "TipoDePermiso")
-                f.permisos.append(p)
-
-            # ----------- ITEMS -----------
-            for inode in fr.findall("Items/Item"):
-
-                if is_empty_node(inode):
-                    continue
-
-                it = Item()
-                it.orden = get(inode, "Orden")
-                it.origen = get(inode, "Origen")
-                it.factura = get(inode, "Factura")
-                it.item_number = get(inode, "ItemNumber")
-                it.unidad_factura = get(inode, "UnidadFactura")
-                it.unidad_tarifa = get(inode, "UnidadTarifa")
-                it.unidad_vu = get(inode, "UnidadVU")
-                it.cantidad = get(inode, "Cantidad")
-                it.cantidad_tarifa = get(inode, "CantidadTarifa")
-                it.cantidad_vu = get(inode, "CantidadVU")
-                it.precio_unitario = get(inode, "PrecioUnitario")
-                it.total = get(inode, "Total")
-                it.fraccion = get(inode, "Fraccion")
-                it.nico = get(inode, "Nico")
-
-                # -------- descripciones --------
-                for dnode in inode.findall("DescripcionesEspecificas/DescripcionEspecifica"):
-                    if is_empty_node(dnode):
-                        continue
-                    de = DescripcionEspecifica()
-                    de.id = get(dnode, "Id")
-                    de.id_item = get(dnode, "IdItem")
-                    de.marca = get(dnode, "Marca")
-                    de.modelo = get(dnode, "Modelo")
-                    de.serie = get(dnode, "Serie")
-                    de.dato_identificacion = get(dnode, "DatoIdentificacion")
-                    it.descripciones.append(de)
-
-                f.items.append(it)
-
-            self.pedimento.fracciones.append(f)
+            self.pedimento.fracciones.append(_build_fraccion(fr, self.numerico))
 
         return self
 
@@ -263,14 +430,7 @@ class PedimentoBuilder:
         for ide in self.root.findall("Identificadores/IdentificadorPedimento"):
             if is_empty_node(ide):
                 continue
-
-            i = Identificador()
-            i.identificador = get(ide, "Identificador")
-            i.complemento_uno = get(ide, "ComplementoUno")
-            i.complemento_dos = get(ide, "ComplementoDos")
-            i.complemento_tres = get(ide, "ComplementoTres")
-
-            self.pedimento.identificadores.append(i)
+            self.pedimento.identificadores.append(_build_identificador(ide, self.numerico))
 
         return self
 
@@ -281,15 +441,7 @@ class PedimentoBuilder:
         for op in self.root.findall("Incrementables/OtrosPagos"):
             if is_empty_node(op):
                 continue
-
-            inc = Incrementable()
-            inc.id = get(op, "Id")
-            inc.concepto = get(op, "Concepto")
-            inc.importe_me = get(op, "ImporteME")
-            inc.importe_mn = get(op, "ImporteMN")
-            inc.pais = get(op, "Pais")
-
-            self.pedimento.incrementables.append(inc)
+            self.pedimento.incrementables.append(_build_incrementable(op, self.numerico))
 
         return self
 
@@ -300,16 +452,7 @@ class PedimentoBuilder:
         for cnode in self.root.findall("Impuestos/Contribucion"):
             if is_empty_node(cnode):
                 continue
-
-            c = Contribucion()
-            c.forma_pago = get(cnode, "FormaDePago")
-            c.clave_impuesto = get(cnode, "ClaveImpuesto")
-            c.concepto_impuesto = get(cnode, "ConceptoImpuesto")
-            c.importe = get(cnode, "Importe")
-            c.tasa = get(cnode, "Tasa")
-            c.tipo_de_tasa = get(cnode, "TipoDeTasa")
-
-            self.pedimento.contribuciones_generales.append(c)
+            self.pedimento.contribuciones_generales.append(_build_contribucion(cnode, self.numerico))
 
         return self
 
@@ -318,3 +461,222 @@ class PedimentoBuilder:
     # ============================================================
     def build(self):
         return self.pedimento
+
+
+# ===================================================================
+#          P E D I M E N T O   S T R E A M   B U I L D E R
+# ===================================================================
+class PedimentoStreamBuilder:
+    """Construye el Pedimento en una sola pasada usando iterparse.
+
+       Cada Factura, Fraccion, Identificador, OtrosPagos y Contribucion
+       general se convierte en cuanto se cierra su nodo y después se
+       libera del árbol, así que la memoria pico no crece con el número
+       de fracciones. El resultado es idéntico al del builder fluido."""
+
+    # (contenedor, nodo) bajo la raíz -> (lista del pedimento, constructor)
+    SECCIONES = {
+        ("Facturas", "Factura"): ("facturas", _build_factura),
+        ("Fracciones", "Fraccion"): ("fracciones", _build_fraccion),
+        ("Identificadores", "IdentificadorPedimento"): ("identificadores", _build_identificador),
+        ("Incrementables", "OtrosPagos"): ("incrementables", _build_incrementable),
+        ("Impuestos", "Contribucion"): ("contribuciones_generales", _build_contribucion),
+    }
+
+    def __init__(self, source, numerico=False):
+        """source puede ser ruta, bytes o un objeto tipo archivo.
+           Con numerico=True importes y cantidades se guardan como float."""
+        self.source = xml_source(source)
+        self.numerico = numerico
+        self.pedimento = Pedimento()
+
+    def build(self):
+        pila = []
+        for evento, el in ET.iterparse(self.source, events=("start", "end")):
+            if evento == "start":
+                pila.append(el)
+                continue
+
+            pila.pop()
+
+            # ------ raíz cerrada: encabezado y cliente ------
+            if not pila:
+                _build_header(self.pedimento, el, self.numerico)
+                _build_cliente(self.pedimento, el)
+                el.clear()
+                break
+
+            if len(pila) != 2:
+                continue
+
+            seccion = self.SECCIONES.get((pila[1].tag, el.tag))
+            if seccion is None:
+                continue
+
+            atributo, constructor = seccion
+            if not is_empty_node(el):
+                getattr(self.pedimento, atributo).append(constructor(el, self.numerico))
+
+            # liberar el nodo ya consumido
+            pila[1].remove(el)
+            el.clear()
+
+        return self.pedimento
+
+
+# ===================================================================
+#        P E D I M E N T O   C O L U M N A R   B U I L D E R
+# ===================================================================
+class Columnas:
+    """Acumula las filas de una tabla columnar mientras se lee el XML.
+
+       - Campos numéricos: array('d') (float64 contiguo, NaN si el texto
+         no es numérico; vacío = 0 como en el costeo).
+       - Campos de texto: lista de strings internados por columna, así
+         unidades, países, fracciones, etc. repetidos comparten objeto.
+       - Llaves foráneas: array('q') de enteros."""
+
+    def __init__(self, campos, numericos=(), llaves=()):
+        self.campos = campos
+        self.numericos = numericos
+        self.llaves = llaves
+        self.filas = 0
+
+        self._columnas = {}
+        self._internados = {}
+        for attr, _ in campos:
+            if attr in numericos:
+                self._columnas[attr] = array("d")
+            else:
+                self._columnas[attr] = []
+                self._internados[attr] = {}
+        for llave in llaves:
+            self._columnas[llave] = array("q")
+
+    def agregar(self, el, **llaves):
+        """Agrega la fila del nodo el y regresa su índice."""
+        idx = index_children(el)
+        for attr, tag in self.campos:
+            node = idx.get(tag)
+            if node is None:
+                valor = ""
+            else:
+                valor = node.text.strip() if node.text else ""
+                if not valor:
+                    valor = node_text(node)
+
+            if attr in self.numericos:
+                valor = to_number(valor)
+                self._columnas[attr].append(valor if isinstance(valor, float) else np.nan)
+            else:
+                self._columnas[attr].append(self._internados[attr].setdefault(valor, valor))
+
+        for llave in self.llaves:
+            self._columnas[llave].append(llaves[llave])
+
+        self.filas += 1
+        return self.filas - 1
+
+    def tabla(self):
+        """{columna: ndarray}. Los arreglos numéricos envuelven el buffer
+           acumulado sin copiarlo."""
+        tabla = {}
+        for nombre, col in self._columnas.items():
+            if isinstance(col, array):
+                tabla[nombre] = np.frombuffer(col, dtype=np.float64 if col.typecode == "d" else np.int64)
+            else:
+                arr = np.empty(len(col), dtype=object)
+                arr[:] = col
+                tabla[nombre] = arr
+        return tabla
+
+
+class PedimentoColumnarBuilder:
+    """Construye un PedimentoColumnar en una sola pasada (iterparse).
+
+       Igual que PedimentoStreamBuilder, pero fracciones, contribuciones,
+       permisos, items y descripciones se escriben directo en columnas en
+       lugar de crear un objeto por nodo. Los importes se leen siempre en
+       modo numérico.
+
+       pedimento_id se copia a fracciones e items para poder concatenar
+       las tablas de varios pedimentos."""
+
+    # secciones que se conservan como objetos
+    SECCIONES = {
+        clave: seccion
+        for clave, seccion in PedimentoStreamBuilder.SECCIONES.items()
+        if clave != ("Fracciones", "Fraccion")
+    }
+
+    def __init__(self, source, pedimento_id=0):
+        self.source = xml_source(source)
+        self.pedimento_id = pedimento_id
+        self.columnar = PedimentoColumnar()
+
+        self.fracciones = Columnas(CAMPOS_FRACCION, NUMERICOS_FRACCION, ("pedimento_id",))
+        self.contribuciones = Columnas(CAMPOS_CONTRIBUCION, NUMERICOS_CONTRIBUCION, ("fraccion_id",))
+        self.permisos = Columnas(CAMPOS_PERMISO, NUMERICOS_PERMISO, ("fraccion_id",))
+        self.items = Columnas(CAMPOS_ITEM, NUMERICOS_ITEM, ("fraccion_id", "pedimento_id"))
+        self.descripciones = Columnas(CAMPOS_DESCRIPCION, (), ("item_id",))
+
+    def _agregar_fraccion(self, fr):
+        fraccion_id = self.fracciones.agregar(fr, pedimento_id=self.pedimento_id)
+
+        for cnode in fr.findall("Impuestos/Contribucion"):
+            if not is_empty_node(cnode):
+                self.contribuciones.agregar(cnode, fraccion_id=fraccion_id)
+
+        for pnode in fr.findall("Permisos/PermisoFraccion"):
+            if not is_empty_node(pnode):
+                self.permisos.agregar(pnode, fraccion_id=fraccion_id)
+
+        for inode in fr.findall("Items/Item"):
+            if is_empty_node(inode):
+                continue
+            item_id = self.items.agregar(inode, fraccion_id=fraccion_id, pedimento_id=self.pedimento_id)
+            for dnode in inode.findall("DescripcionesEspecificas/DescripcionEspecifica"):
+                if not is_empty_node(dnode):
+                    self.descripciones.agregar(dnode, item_id=item_id)
+
+    def build(self):
+        pedimento = self.columnar.pedimento
+        pila = []
+        for evento, el in ET.iterparse(self.source, events=("start", "end")):
+            if evento == "start":
+                pila.append(el)
+                continue
+
+            pila.pop()
+
+            # ------ raíz cerrada: encabezado y cliente ------
+            if not pila:
+                _build_header(pedimento, el, True)
+                _build_cliente(pedimento, el)
+                el.clear()
+                break
+
+            if len(pila) != 2:
+                continue
+
+            clave = (pila[1].tag, el.tag)
+            if clave == ("Fracciones", "Fraccion"):
+                if not is_empty_node(el):
+                    self._agregar_fraccion(el)
+            elif clave in self.SECCIONES:
+                atributo, constructor = self.SECCIONES[clave]
+                if not is_empty_node(el):
+                    getattr(pedimento, atributo).append(constructor(el, True))
+            else:
+                continue
+
+            # liberar el nodo ya consumido
+            pila[1].remove(el)
+            el.clear()
+
+        self.columnar.fracciones = self.fracciones.tabla()
+        self.columnar.contribuciones = self.contribuciones.tabla()
+        self.columnar.permisos = self.permisos.tabla()
+        self.columnar.items = self.items.tabla()
+        self.columnar.descripciones = self.descripciones.tabla()
+        return self.columnar
@@ -0,0 +1,175 @@
+# cache.py
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+
+from processor import (
+    MAP_CLAVE_IMPUESTO, MAP_CLAVE_IMPUESTO_GENERAL,
+    BASES_PRORRATEO_GENERAL, BASE_PRORRATEO_DEFAULT,
+)
+
+
+@contextmanager
+def escritura_atomica(path, modo="w"):
+    """Archivo temporal único junto a path (mkstemp: distinto por proceso
+       y por hilo) que reemplaza a path al cerrar sin error; si falla, el
+       temporal se borra y path queda como estaba."""
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, modo, encoding=None if "b" in modo else "utf-8") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+# sube cuando cambian los campos del resultado (2: fecha_pago)
+FORMATO_RESULTADO = 2
+
+
+def version_reglas():
+    """Huella de las reglas de costeo; si cambia un mapeo de impuestos,
+       una base de prorrateo o el formato del resultado, cambian todas las
+       claves y los resultados viejos dejan de usarse."""
+    reglas = {
+        "FORMATO_RESULTADO": FORMATO_RESULTADO,
+        "MAP_CLAVE_IMPUESTO": MAP_CLAVE_IMPUESTO,
+        "MAP_CLAVE_IMPUESTO_GENERAL": MAP_CLAVE_IMPUESTO_GENERAL,
+        "BASES_PRORRATEO_GENERAL": BASES_PRORRATEO_GENERAL,
+        "BASE_PRORRATEO_DEFAULT": BASE_PRORRATEO_DEFAULT,
+    }
+    payload = json.dumps(reglas, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def clave_resultado(xml_bytes):
+    """Clave de caché: hash del XML subido + versión de las reglas."""
+    return clave_por_hash(hashlib.sha256(xml_bytes).hexdigest())
+
+
+def clave_por_hash(sha256_hex):
+    """Clave de caché de un XML del que ya se tiene el sha256."""
+    return f"{sha256_hex}-{version_reglas()}"
+
+
+class ResultCache:
+    """Caché de resultados de costeo en dos niveles.
+
+       - Memoria: LRU con límite de entradas y TTL en segundos.
+       - Disco (opcional): un JSON por clave en disk_dir, sobrevive a
+         reinicios del contenedor y se promueve a memoria al leerse.
+
+       ttl=0 desactiva la expiración."""
+
+    def __init__(self, max_items=256, ttl=3600, disk_dir=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._items = OrderedDict()   # clave -> (creado, resultado)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _vigente(self, creado):
+        return not self.ttl or (time.time() - creado) < self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    # ------------------------------------------------------------
+    #  LECTURA
+    # ------------------------------------------------------------
+    def get(self, key):
+        with self._lock:
+            entrada = self._items.get(key)
+            if entrada is not None:
+                if self._vigente(entrada[0]):
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return entrada[1]
+                del self._items[key]
+
+        entrada = self._leer_disco(key)
+        with self._lock:
+            if entrada is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._guardar_memoria(key, entrada)
+            return entrada[1]
+
+    def _leer_disco(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Entrada de caché ilegible {key}: {e}")
+            return None
+
+        if not self._vigente(data["creado"]):
+            try:
+                os.unlink(self._disk_path(key))
+            except OSError:
+                pass
+            return None
+        return data["creado"], data["resultado"]
+
+    # ------------------------------------------------------------
+    #  ESCRITURA
+    # ------------------------------------------------------------
+    def put(self, key, resultado):
+        entrada = (time.time(), resultado)
+        with self._lock:
+            self._guardar_memoria(key, entrada)
+
+        if self.disk_dir:
+            try:
+                with escritura_atomica(self._disk_path(key)) as f:
+                    json.dump({"creado": entrada[0], "resultado": resultado}, f, ensure_ascii=False)
+            except OSError as e:
+                logging.warning(f"No se pudo escribir la caché en disco {key}: {e}")
+
+    def _guardar_memoria(self, key, entrada):
+        self._items[key] = entrada
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    # ------------------------------------------------------------
+    #  MÉTRICAS
+    # ------------------------------------------------------------
+    def stats(self):
+        """Contadores de este proceso: con varios workers de gunicorn cada
+           uno tiene su propia memoria y sus propios contadores (el disco sí
+           es compartido), así que cada llamada ve solo el worker pid."""
+        with self._lock:
+            return {
+                "alcance": "worker",
+                "pid": os.getpid(),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "items_memoria": len(self._items),
+                "max_items": self.max_items,
+                "ttl": self.ttl,
+                "disco": bool(self.disk_dir),
+                "version_reglas": version_reglas(),
+            }
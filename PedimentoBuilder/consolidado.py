@@ -0,0 +1,280 @@
+# consolidado.py
+"""
+Un solo Excel con todos los pedimentos XML de un directorio o patrón glob
+(por ejemplo, el mes completo), con una fila por item de todos ellos.
+
+Los pedimentos se construyen de uno en uno con el builder de streaming y
+sus filas se agregan a hojas write-only; ningún pedimento se conserva
+después de escribirlo, así que la memoria no crece con el número de XML.
+
+Uso:
+    python3 consolidado.py Pedimentos/ --salida "Consolidado noviembre.xlsx"
+    python3 consolidado.py "Pedimentos/2511*.xml"
+
+Hojas (todas con NumeroPedimento como primera columna):
+    Resumen, Facturas, Fracciones, Items, Impuestos y Errores
+
+Una hoja que llega al límite de filas de Excel (1,048,576) continúa en
+otra con el mismo encabezado: "Items (2)", "Items (3)"...
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from batch import listar_xmls
+from builder import (
+    PedimentoStreamBuilder,
+    CAMPOS_CONTRIBUCION, CAMPOS_FACTURA, CAMPOS_FRACCION, CAMPOS_ITEM,
+    CAMPOS_PROVEEDOR_COMPRADOR,
+)
+
+ANCHO_COLUMNA = 18
+MAX_FILAS_EXCEL = 1_048_576   # encabezado incluido
+MAX_CARACTERES_CELDA = 32_767
+SEPARADOR_DESCRIPCIONES = " | "
+
+
+# ============================================================
+#  COLUMNAS POR HOJA
+#  (los campos del dominio se nombran con su tag del XML)
+# ============================================================
+COLUMNAS_RESUMEN = (
+    "NumeroPedimento", "Archivo", "FechaPago", "TipoCambio", "ValorAduana",
+    "ValorComercialPrecioPagado", "Cliente", "RFCCliente",
+    "Facturas", "Fracciones", "Items",
+)
+
+COLUMNAS_FACTURAS = (
+    ("NumeroPedimento",)
+    + tuple(tag for _, tag in CAMPOS_FACTURA)
+    + tuple(f"Proveedor{tag}" for _, tag in CAMPOS_PROVEEDOR_COMPRADOR)
+)
+
+COLUMNAS_FRACCIONES = ("NumeroPedimento",) + tuple(tag for _, tag in CAMPOS_FRACCION)
+
+COLUMNAS_ITEMS = (
+    ("NumeroPedimento", "NumeroFraccion")
+    + tuple(tag for _, tag in CAMPOS_ITEM)
+    + ("Marca", "Modelo", "Serie")
+)
+
+COLUMNAS_IMPUESTOS = (
+    ("NumeroPedimento", "Nivel", "NumeroFraccion")
+    + tuple(tag for _, tag in CAMPOS_CONTRIBUCION)
+)
+
+COLUMNAS_ERRORES = ("Archivo", "Error")
+
+
+def _valores(obj, campos):
+    return [getattr(obj, attr) for attr, _ in campos]
+
+
+# ============================================================
+#  FILAS DE UN PEDIMENTO
+# ============================================================
+def fila_resumen(pedimento, archivo):
+    return [
+        pedimento.numero_completo,
+        archivo,
+        pedimento.fecha_pago,
+        pedimento.tipo_de_cambio,
+        pedimento.valor_aduana,
+        pedimento.precio_pagado_valor_comecrial,
+        pedimento.cliente.razon_social,
+        pedimento.cliente.rfc,
+        len(pedimento.facturas),
+        len(pedimento.fracciones),
+        sum(len(fr.items) for fr in pedimento.fracciones),
+    ]
+
+
+def filas_facturas(pedimento):
+    for factura in pedimento.facturas:
+        fila = [pedimento.numero_completo] + _valores(factura, CAMPOS_FACTURA)
+        fila += _valores(factura.proveedor_comprador, CAMPOS_PROVEEDOR_COMPRADOR)
+        yield fila
+
+
+def filas_fracciones(pedimento):
+    for fraccion in pedimento.fracciones:
+        yield [pedimento.numero_completo] + _valores(fraccion, CAMPOS_FRACCION)
+
+
+def _unir(valores):
+    """Valores distintos y no vacíos en orden, en una sola celda (un item
+       con varias DescripcionEspecifica, p. ej. un número de serie por
+       unidad, no se multiplica en varias filas)."""
+    texto = SEPARADOR_DESCRIPCIONES.join(dict.fromkeys(v for v in valores if v))
+    return texto[:MAX_CARACTERES_CELDA]
+
+
+def filas_items(pedimento):
+    for fraccion in pedimento.fracciones:
+        for item in fraccion.items:
+            descs = item.descripciones
+            yield (
+                [pedimento.numero_completo, fraccion.numero_fraccion]
+                + _valores(item, CAMPOS_ITEM)
+                + [
+                    _unir(d.marca for d in descs),
+                    _unir(d.modelo for d in descs),
+                    _unir(d.serie for d in descs),
+                ]
+            )
+
+
+def filas_impuestos(pedimento):
+    for c in pedimento.contribuciones_generales:
+        yield [pedimento.numero_completo, "PEDIMENTO", ""] + _valores(c, CAMPOS_CONTRIBUCION)
+
+    for fraccion in pedimento.fracciones:
+        for c in fraccion.contribuciones:
+            yield [pedimento.numero_completo, "FRACCION", fraccion.numero_fraccion] + _valores(c, CAMPOS_CONTRIBUCION)
+
+
+# ============================================================
+#  LIBRO CONSOLIDADO
+# ============================================================
+class HojaConsolidada:
+    """Hoja write-only que continúa en una hoja nueva (mismo encabezado)
+       al llegar a MAX_FILAS_EXCEL."""
+
+    def __init__(self, libro, nombre, columnas, max_filas=MAX_FILAS_EXCEL):
+        self.libro = libro
+        self.nombre = nombre
+        self.columnas = columnas
+        self.max_filas = max_filas
+        self.hojas = 0
+        self._nueva()
+
+    def _nueva(self):
+        self.hojas += 1
+        nombre = self.nombre if self.hojas == 1 else f"{self.nombre} ({self.hojas})"
+        self.ws = self.libro._hoja(nombre, self.columnas)
+        self.filas = 1
+
+    def append(self, fila):
+        if self.filas >= self.max_filas:
+            self._nueva()
+        self.ws.append(fila)
+        self.filas += 1
+
+
+class LibroConsolidado:
+    """Libro write-only con una hoja por sección; cada pedimento agregado
+       se escribe de inmediato a los archivos temporales de openpyxl."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.wb = Workbook(write_only=True)
+        self.wb.add_named_style(NamedStyle(
+            "encabezado",
+            font=Font(bold=True),
+            fill=PatternFill("solid", fgColor="D9D9D9"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+            border=Border(left=Side(style="thin"), right=Side(style="thin"),
+                          top=Side(style="thin"), bottom=Side(style="thin")),
+        ))
+
+        self.resumen = HojaConsolidada(self, "Resumen", COLUMNAS_RESUMEN)
+        self.facturas = HojaConsolidada(self, "Facturas", COLUMNAS_FACTURAS)
+        self.fracciones = HojaConsolidada(self, "Fracciones", COLUMNAS_FRACCIONES)
+        self.items = HojaConsolidada(self, "Items", COLUMNAS_ITEMS)
+        self.impuestos = HojaConsolidada(self, "Impuestos", COLUMNAS_IMPUESTOS)
+        self.errores = HojaConsolidada(self, "Errores", COLUMNAS_ERRORES)
+
+        self.pedimentos = 0
+        self.filas_items = 0
+
+    def _hoja(self, nombre, columnas):
+        ws = self.wb.create_sheet(nombre)
+        ws.freeze_panes = "A2"
+        for col in range(1, len(columnas) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = ANCHO_COLUMNA
+
+        encabezado = []
+        for columna in columnas:
+            cell = WriteOnlyCell(ws, value=columna)
+            cell.style = "encabezado"
+            encabezado.append(cell)
+        ws.append(encabezado)
+        return ws
+
+    def agregar(self, pedimento, archivo):
+        self.resumen.append(fila_resumen(pedimento, archivo))
+        for fila in filas_facturas(pedimento):
+            self.facturas.append(fila)
+        for fila in filas_fracciones(pedimento):
+            self.fracciones.append(fila)
+        for fila in filas_items(pedimento):
+            self.items.append(fila)
+            self.filas_items += 1
+        for fila in filas_impuestos(pedimento):
+            self.impuestos.append(fila)
+        self.pedimentos += 1
+
+    def agregar_error(self, archivo, error):
+        self.errores.append([archivo, error])
+
+    def guardar(self):
+        self.wb.save(self.output_path)
+
+
+def exportar_consolidado(xml_paths, output_path):
+    """Construye y escribe los pedimentos de uno en uno.
+       Un XML con error se anota en la hoja Errores y no detiene el resto.
+       Regresa el LibroConsolidado ya guardado (con sus contadores)."""
+    libro = LibroConsolidado(output_path)
+
+    for xml_path in xml_paths:
+        xml_path = Path(xml_path)
+        try:
+            pedimento = PedimentoStreamBuilder(str(xml_path), numerico=True).build()
+        except Exception as e:
+            logging.error(f"{xml_path.name}: {e}")
+            libro.agregar_error(xml_path.name, f"{type(e).__name__}: {e}")
+            continue
+
+        libro.agregar(pedimento, xml_path.name)
+        logging.info(f"{xml_path.name}: {pedimento.numero_completo}")
+
+    libro.guardar()
+    return libro
+
+
+# ============================================================
+#  PROGRAMA PRINCIPAL
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="directorio o patrón glob de pedimentos XML")
+    parser.add_argument("--salida", default="Consolidado pedimentos.xlsx", help="Excel de salida")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    xml_paths = listar_xmls(args.entrada)
+    if not xml_paths:
+        print(f"❌ No se encontraron XML en: {args.entrada}")
+        raise SystemExit(1)
+
+    print(f"📄 Consolidando {len(xml_paths)} pedimentos")
+    t0 = time.perf_counter()
+    libro = exportar_consolidado(xml_paths, args.salida)
+
+    print("=================================")
+    print(f"Pedimentos: {libro.pedimentos}  Items: {libro.filas_items}  Con error: {len(xml_paths) - libro.pedimentos}")
+    print(f"Tiempo total: {time.perf_counter() - t0:.2f}s")
+    print("EXPORTADO:", args.salida)
+
+
+if __name__ == "__main__":
+    main()
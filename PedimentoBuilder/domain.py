@@ -1,6 +1,15 @@
 # domain.py
+#
+# Todas las clases declaran __slots__: sin __dict__ por instancia, lo que
+# reduce mucho la memoria con cientos de miles de Item/DescripcionEspecifica.
 
 class Cliente:
+    __slots__ = (
+        "razon_social", "curp", "rfc", "direccion", "numero_externo",
+        "numero_interno", "colonia", "ciudad", "cp", "entidad",
+        "nombre_entidad", "pais", "nombre_pais", "telefono1", "telefono2",
+    )
+
     def __init__(self):
         self.razon_social = ""
         self.curp = ""
@@ -20,6 +29,12 @@ class Cliente:
 
 
 class ProveedorComprador:
+    __slots__ = (
+        "cp", "pais", "razon_social", "rfc_tax_id", "direccion",
+        "numero_interno", "numero_externo", "municipio_ciudad", "colonia",
+        "telefono1", "telefono2", "entidad", "nombre_entidad",
+    )
+
     def __init__(self):
         self.cp = ""
         self.pais = ""
@@ -37,6 +52,15 @@ class ProveedorComprador:
 
 
 class Factura:
+    __slots__ = (
+        "orden", "folio", "factor_monetario", "fecha", "incoterm",
+        "moneda_factura", "observaciones", "pais_factura",
+        "pais_factor_monetario", "pedido", "proveedor_comprador",
+        "valor_dolares", "valor_moneda_extranjera", "vinculacion",
+        "valor_total", "subdivision", "es_certificado_origen",
+        "numero_exportador_confiable", "edocument",
+    )
+
     def __init__(self):
         self.orden = ""
         self.folio = ""
@@ -60,6 +84,11 @@ class Factura:
 
 
 class Contribucion:
+    __slots__ = (
+        "forma_pago", "clave_impuesto", "concepto_impuesto", "importe", "tasa",
+        "tipo_de_tasa",
+    )
+
     def __init__(self):
         self.forma_pago = ""
         self.clave_impuesto = ""
@@ -70,6 +99,12 @@ class Contribucion:
 
 
 class Permiso:
+    __slots__ = (
+        "permiso", "numero_permiso", "firma", "complemento_uno",
+        "complemento_dos", "complemento_tres", "valor_dolares", "cantidad_umt",
+        "tipo_de_permiso",
+    )
+
     def __init__(self):
         self.permiso = ""
         self.numero_permiso = ""
@@ -83,6 +118,10 @@ class Permiso:
 
 
 class DescripcionEspecifica:
+    __slots__ = (
+        "id", "id_item", "marca", "modelo", "serie", "dato_identificacion",
+    )
+
     def __init__(self):
         self.id = ""
         self.id_item = ""
@@ -93,6 +132,13 @@ class DescripcionEspecifica:
 
 
 class Item:
+    __slots__ = (
+        "orden", "origen", "factura", "item_number", "unidad_factura",
+        "unidad_tarifa", "unidad_vu", "cantidad", "cantidad_tarifa",
+        "cantidad_vu", "precio_unitario", "total", "fraccion", "nico",
+        "descripciones",
+    )
+
     def __init__(self):
         self.orden = ""
         self.origen = ""
@@ -112,6 +158,15 @@ class Item:
 
 
 class Fraccion:
+    __slots__ = (
+        "orden", "numero_fraccion", "nico", "subdivision", "cantidad_factura",
+        "cantidad_tarifa", "descripcion", "dta", "metodo_valoracion",
+        "pais_vendedor_comprador", "pais_origen_destino", "precio_unitario",
+        "unidad_factura", "unidad_tarifa", "valor_agregado", "valor_aduana",
+        "valor_dolares", "valor_moneda_facturacion", "importe_precio_pagado",
+        "vinculacion", "observaciones", "contribuciones", "permisos", "items",
+    )
+
     def __init__(self):
         self.orden = ""
         self.numero_fraccion = ""
@@ -141,6 +196,11 @@ class Fraccion:
 
 
 class Identificador:
+    __slots__ = (
+        "identificador", "complemento_uno", "complemento_dos",
+        "complemento_tres",
+    )
+
     def __init__(self):
         self.identificador = ""
         self.complemento_uno = ""
@@ -149,6 +209,10 @@ class Identificador:
 
 
 class Incrementable:
+    __slots__ = (
+        "id", "concepto", "importe_me", "importe_mn", "pais",
+    )
+
     def __init__(self):
         self.id = ""
         self.concepto = ""
@@ -158,14 +222,25 @@ class Incrementable:
 
 
 class Pedimento:
+    __slots__ = (
+        "id_pedimento", "numero_pedimento", "numero_completo", "fecha_pago",
+        "tipo_de_cambio", "valor_aduana", "precio_pagado_valor_comecrial",
+        "factor_valor_aduana", "cliente", "facturas", "fracciones",
+        "identificadores", "incrementables", "contribuciones_generales",
+    )
+
     def __init__(self):
         self.id_pedimento = ""
         self.numero_pedimento = ""
         self.numero_completo = ""
+        self.fecha_pago = ""
         self.tipo_de_cambio = ""
         self.valor_aduana = ""
         self.precio_pagado_valor_comecrial = ""
 
+        # ValorAduana / ValorComercialPrecioPagado, precalculado en modo numérico
+        self.factor_valor_aduana = None
+
         self.cliente = Cliente()
 
         self.facturas = []
@@ -173,3 +248,32 @@ class Pedimento:
         self.identificadores = []
         self.incrementables = []
         self.contribuciones_generales = []
+
+
+class PedimentoColumnar:
+    """Pedimento en forma columnar (una columna por campo).
+
+       pedimento conserva encabezado, cliente, facturas, identificadores,
+       incrementables y contribuciones generales como objetos (son pocos);
+       fracciones, contribuciones, permisos, items y descripciones son
+       tablas {columna: numpy.ndarray} ligadas por índices enteros:
+
+           items.fraccion_id         -> fila en fracciones
+           contribuciones.fraccion_id -> fila en fracciones
+           permisos.fraccion_id      -> fila en fracciones
+           descripciones.item_id     -> fila en items
+           fracciones/items.pedimento_id (para concatenar varios pedimentos)
+    """
+    __slots__ = (
+        "pedimento", "fracciones", "contribuciones", "permisos", "items",
+        "descripciones",
+    )
+
+    def __init__(self):
+        self.pedimento = Pedimento()
+
+        self.fracciones = {}
+        self.contribuciones = {}
+        self.permisos = {}
+        self.items = {}
+        self.descripciones = {}
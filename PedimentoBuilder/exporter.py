@@ -1,6 +1,7 @@
 import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Border, Side, Alignment, PatternFill, NamedStyle
 from openpyxl.utils import get_column_letter
 from datetime import datetime
 
@@ -123,114 +124,117 @@ def df_contribuciones_detalle(pedimento):
 # ===========================================================
 # 3) EXPORTAR EXCEL PREMIUM (SIN FORMATO MONEDA)
 # ===========================================================
+def _estilos_premium(wb):
+    """Estilos con nombre: se registran una vez en el libro y cada celda
+       solo guarda la referencia, en lugar de un Border/Font por celda."""
+    thin = Side(style='thin')
+    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    estilos = {
+        "titulo": NamedStyle("titulo", font=Font(bold=True, size=18), alignment=Alignment(horizontal="center")),
+        "etiqueta": NamedStyle("etiqueta", font=Font(bold=True, size=14)),
+        "encabezado": NamedStyle(
+            "encabezado",
+            font=Font(bold=True, size=12),
+            border=thin_border,
+            fill=PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid"),
+            alignment=Alignment(horizontal="center"),
+        ),
+        "dato": NamedStyle("dato", border=thin_border),
+        "total": NamedStyle("total", font=Font(bold=True)),
+        "total_borde": NamedStyle("total_borde", font=Font(bold=True), border=thin_border),
+    }
+    for estilo in estilos.values():
+        wb.add_named_style(estilo)
+    return estilos
+
+
+def _celda(ws, valor, estilo):
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.style = estilo
+    return cell
+
+
+def _anchos(df):
+    """Ancho de cada columna (texto más largo + 2, encabezado incluido),
+       calculado sobre el DataFrame antes de escribir: en modo write-only
+       las columnas se declaran antes de la primera fila."""
+    anchos = []
+    for col in df.columns:
+        largo = len(str(col))
+        if len(df):
+            largo = max(largo, int(df[col].astype(str).str.len().max()))
+        anchos.append(largo + 2)
+    return anchos
+
+
+def _escribir_tabla(ws, df):
+    """Encabezado + filas del DataFrame en una sola pasada."""
+    for col_num, ancho in enumerate(_anchos(df), 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = ancho
+
+    ws.append([_celda(ws, col_name, "encabezado") for col_name in df.columns])
+
+    # el writer serializa cada celda en cuanto se agrega la fila, así que
+    # basta una celda con estilo por columna, reutilizada en todas las filas
+    # (tests/test_exporter.py reabre el libro y revisa fila por fila)
+    celdas = [_celda(ws, None, "dato") for _ in df.columns]
+    for row in df.itertuples(index=False):
+        for cell, value in zip(celdas, row):
+            cell.value = value
+        ws.append(celdas)
+        # NOTA: SIN FORMATO DE MONEDA
+
+
 def exportar_excel_pedimento_premium(
         pedimento, df_costos, df_contrib, output_path, logo_path=None
     ):
 
-    wb = Workbook()
-
-    # ------------------------------------
-    # ESTILOS
-    # ------------------------------------
-    header_font = Font(bold=True, size=12)
-    title_font = Font(bold=True, size=18)
-    label_font = Font(bold=True, size=14)
-
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-
-    gray_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+    # write-only: las filas se escriben al archivo conforme se agregan
+    wb = Workbook(write_only=True)
+    _estilos_premium(wb)
 
     # ===========================================================
     # HOJA 1 - PORTADA
     # ===========================================================
-    ws = wb.active
-    ws.title = "Portada"
-
-    ws.merge_cells("A1:D1")
-    ws["A1"] = "REPORTE DE COSTOS POR PEDIMENTO"
-    ws["A1"].font = title_font
-    ws["A1"].alignment = Alignment(horizontal="center")
-
-    ws["A3"] = "Número de Pedimento:"
-    ws["B3"] = pedimento.numero
-
-    ws["A4"] = "Fecha Pago:"
-    ws["B4"] = pedimento.fecha_pago
-
-    ws["A5"] = "Proveedor:"
-    ws["B5"] = pedimento.facturas[0].proveedor.razon_social
-
-    ws["A3"].font = ws["A4"].font = ws["A5"].font = label_font
+    ws = wb.create_sheet("Portada")
 
     for col in range(1, 5):
         ws.column_dimensions[get_column_letter(col)].width = 35
 
+    proveedor = pedimento.facturas[0].proveedor_comprador.razon_social if pedimento.facturas else ""
+
+    # en write-only el rango combinado se declara antes de escribir la fila
+    ws.merged_cells.add("A1:D1")
+    ws.append([_celda(ws, "REPORTE DE COSTOS POR PEDIMENTO", "titulo")])
+    ws.append([])
+    ws.append([_celda(ws, "Número de Pedimento:", "etiqueta"), pedimento.numero_completo])
+    ws.append([_celda(ws, "Fecha Pago:", "etiqueta"), pedimento.fecha_pago])
+    ws.append([_celda(ws, "Proveedor:", "etiqueta"), proveedor])
+
     # ===========================================================
     # HOJA 2 - COSTOS POR ITEM
     # ===========================================================
     ws2 = wb.create_sheet("Costos por Item")
-
-    # Encabezados
-    for col_num, col_name in enumerate(df_costos.columns, 1):
-        cell = ws2.cell(row=1, column=col_num, value=col_name)
-        cell.font = header_font
-        cell.border = thin_border
-        cell.fill = gray_fill
-        cell.alignment = Alignment(horizontal="center")
-
-    # Datos
-    for row_num, row in enumerate(df_costos.itertuples(index=False), 2):
-        for col_num, value in enumerate(row, 1):
-            cell = ws2.cell(row=row_num, column=col_num, value=value)
-            cell.border = thin_border
-            # NOTA: SIN FORMATO DE MONEDA
-
-    # Autoajuste columnas
-    for col in ws2.columns:
-        ws2.column_dimensions[col[0].column_letter].width = max(len(str(c.value)) for c in col) + 2
+    _escribir_tabla(ws2, df_costos)
 
     # -----------------------------
     # TOTAL GENERAL
     # -----------------------------
     last_row = len(df_costos) + 2
 
-    ws2[f"A{last_row}"] = "TOTAL GENERAL:"
-    ws2[f"A{last_row}"].font = Font(bold=True)
-
     # Columna 'costo_total_item' = E
-    ws2[f"E{last_row}"] = f"=SUM(E2:E{last_row-1})"
-    ws2[f"E{last_row}"].font = Font(bold=True)
-    ws2[f"E{last_row}"].border = thin_border
+    ws2.append([
+        _celda(ws2, "TOTAL GENERAL:", "total"), None, None, None,
+        _celda(ws2, f"=SUM(E2:E{last_row-1})", "total_borde"),
+    ])
     # (SIN FORMATO DE MONEDA)
 
     # ===========================================================
     # HOJA 3 - CONTRIBUCIONES DETALLE
     # ===========================================================
     ws3 = wb.create_sheet("Contribuciones")
-
-    # Encabezados
-    for col_num, col_name in enumerate(df_contrib.columns, 1):
-        cell = ws3.cell(row=1, column=col_num, value=col_name)
-        cell.font = header_font
-        cell.border = thin_border
-        cell.fill = gray_fill
-        cell.alignment = Alignment(horizontal="center")
-
-    # Datos
-    for row_num, row in enumerate(df_contrib.itertuples(index=False), 2):
-        for col_num, value in enumerate(row, 1):
-            cell = ws3.cell(row=row_num, column=col_num, value=value)
-            cell.border = thin_border
-            # SIN FORMATO DE MONEDA
-
-    # Autoajuste columnas
-    for col in ws3.columns:
-        ws3.column_dimensions[col[0].column_letter].width = max(len(str(c.value)) for c in col) + 2
+    _escribir_tabla(ws3, df_contrib)
 
     # ===========================================================
     # GUARDAR ARCHIVO
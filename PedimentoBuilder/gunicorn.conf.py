@@ -0,0 +1,78 @@
+# gunicorn.conf.py
+"""
+Configuración de producción del API de pedimentos.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app:app
+
+Todos los valores se pueden ajustar con variables de entorno GUNICORN_*.
+"""
+
+import multiprocessing
+import os
+
+# Precargar las dependencias pesadas una sola vez en el master, antes del fork
+import pandas  # noqa: F401
+import openpyxl  # noqa: F401
+
+
+def _env_int(nombre, default):
+    return int(os.environ.get(nombre, default))
+
+
+# ------------------------------------------------------------
+#  RED
+# ------------------------------------------------------------
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+backlog = _env_int("GUNICORN_BACKLOG", 2048)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# ------------------------------------------------------------
+#  WORKERS: pre-fork con hilos por worker
+# ------------------------------------------------------------
+worker_class = "gthread"
+workers = _env_int("GUNICORN_WORKERS", multiprocessing.cpu_count())
+threads = _env_int("GUNICORN_THREADS", 4)
+
+# La app y sus imports se cargan en el master y se comparten por copy-on-write
+preload_app = True
+
+# ------------------------------------------------------------
+#  RECICLAJE: reinicia cada worker tras N peticiones para acotar
+#  la memoria que dejan los árboles XML grandes
+# ------------------------------------------------------------
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 500)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 50)
+
+# ------------------------------------------------------------
+#  TIEMPOS Y APAGADO ORDENADO
+# ------------------------------------------------------------
+timeout = _env_int("GUNICORN_TIMEOUT", 120)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+
+# ------------------------------------------------------------
+#  HOOKS
+# ------------------------------------------------------------
+def worker_exit(server, worker):
+    """Un worker que sale (reciclado por max_requests, recarga o apagado)
+       termina primero los trabajos asíncronos de su pool, hasta
+       graceful_timeout segundos, avisando al arbiter que sigue vivo.
+       Solo los que no alcanzan a terminar se marcan como error, para que
+       el polling no espere al chequeo de inactividad."""
+    from app import job_runner
+    job_runner.shutdown(espera=server.cfg.graceful_timeout, latido=worker.notify)
+
+
+def child_exit(server, worker):
+    """En el master: cubre al worker que murió sin pasar por worker_exit
+       (SIGKILL del arbiter tras timeout o graceful_timeout)."""
+    from app import job_runner
+    job_runner.store.marcar_interrumpidos(worker.pid)
+
+
+# ------------------------------------------------------------
+#  LOGS
+# ------------------------------------------------------------
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = os.environ.get("GUNICORN_ERRORLOG", "-")
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
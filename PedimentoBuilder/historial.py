@@ -0,0 +1,262 @@
+# historial.py
+"""
+Historial de costos por item_number entre pedimentos.
+
+Cada vez que se costea un pedimento (API, trabajos, lote o watcher) sus
+items agrupados se registran aquí: una fila por pedimento y código en
+`costos` (la serie de tiempo) y los acumulados por código en `costos_item`
+(pedimentos, cantidad, costo total y último costo), que se actualizan
+incrementalmente en la misma transacción. Consultar un código no
+recalcula nada sobre la serie.
+
+Registrar otra vez un pedimento (mismo número completo) reemplaza sus
+filas: lo anterior se resta de los acumulados antes de sumar lo nuevo.
+
+Promedio ponderado = costo total / cantidad (ponderado por cantidad),
+el mismo criterio de costo_final por pedimento.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from utils import parse_fecha
+
+# campos de cada item costeado que usa registrar()
+CAMPOS_ITEM = ("codigo", "cantidad", "costo_total", "costo_final", "tipo_de_cambio")
+
+
+class HistorialCostos:
+    """Ledger de costos en SQLite local (WAL, una conexión por operación,
+       como JobStore y PedimentoStore)."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+        carpeta = os.path.dirname(db_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS costos (
+                    id INTEGER PRIMARY KEY,
+                    numero_completo TEXT NOT NULL,
+                    fecha TEXT,
+                    item_number TEXT NOT NULL,
+                    cantidad REAL NOT NULL,
+                    costo_total REAL NOT NULL,
+                    costo_final REAL NOT NULL,
+                    tipo_de_cambio REAL,
+                    registrado REAL NOT NULL
+                )
+                """
+            )
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS costos_item (
+                    item_number TEXT PRIMARY KEY,
+                    pedimentos INTEGER NOT NULL,
+                    cantidad REAL NOT NULL,
+                    costo_total REAL NOT NULL,
+                    ultima_fecha TEXT,
+                    ultimo_costo REAL,
+                    ultimo_pedimento TEXT,
+                    actualizado REAL NOT NULL
+                )
+                """
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS ix_costos_item_fecha ON costos(item_number, fecha)")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_costos_pedimento ON costos(numero_completo)")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.row_factory = sqlite3.Row
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # --------------------------------------------------------
+    #  REGISTRO
+    # --------------------------------------------------------
+    def registrar(self, resultado):
+        """Registra un resultado de costear() / procesar_pedimento()."""
+        return self.registrar_lote([resultado])
+
+    def registrar_lote(self, resultados):
+        """Registra varios resultados en una sola transacción. Regresa el
+           número de filas (pedimento, código) escritas."""
+        ahora = time.time()
+        escritas = 0
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            for resultado in resultados:
+                escritas += self._registrar(con, resultado, ahora)
+        return escritas
+
+    def _registrar(self, con, resultado, ahora):
+        info = resultado["pedimento"]
+        numero = info["numero_completo"]
+        if not numero:
+            return 0
+        fecha = parse_fecha(info.get("fecha_pago"))
+        fecha = fecha.isoformat() if fecha else None
+
+        # reemplazo: restar de los acumulados lo registrado antes
+        anteriores = con.execute(
+            "SELECT item_number, fecha, cantidad, costo_total FROM costos WHERE numero_completo = ?",
+            (numero,),
+        ).fetchall()
+        if anteriores:
+            con.executemany(
+                """
+                UPDATE costos_item
+                SET pedimentos = pedimentos - 1,
+                    cantidad = cantidad - ?,
+                    costo_total = costo_total - ?
+                WHERE item_number = ?
+                """,
+                [(r["cantidad"], r["costo_total"], r["item_number"]) for r in anteriores],
+            )
+            con.execute("DELETE FROM costos WHERE numero_completo = ?", (numero,))
+
+        filas = [
+            (
+                numero, fecha, str(item["codigo"]),
+                float(item.get("cantidad") or 0),
+                float(item.get("costo_total") or 0),
+                float(item.get("costo_final") or 0),
+                item.get("tipo_de_cambio"),
+                ahora,
+            )
+            for item in resultado["items"]
+            if item.get("codigo") not in (None, "")
+        ]
+        con.executemany(
+            """
+            INSERT INTO costos (numero_completo, fecha, item_number, cantidad,
+                                costo_total, costo_final, tipo_de_cambio, registrado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            filas,
+        )
+
+        # el último costo solo cambia si este pedimento no es más antiguo
+        # (sin fecha cuenta como el más antiguo)
+        con.executemany(
+            """
+            INSERT INTO costos_item (item_number, pedimentos, cantidad, costo_total,
+                                     ultima_fecha, ultimo_costo, ultimo_pedimento, actualizado)
+            VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(item_number) DO UPDATE SET
+                pedimentos = pedimentos + 1,
+                cantidad = cantidad + excluded.cantidad,
+                costo_total = costo_total + excluded.costo_total,
+                ultimo_costo = CASE WHEN COALESCE(excluded.ultima_fecha, '') >= COALESCE(ultima_fecha, '')
+                                    THEN excluded.ultimo_costo ELSE ultimo_costo END,
+                ultimo_pedimento = CASE WHEN COALESCE(excluded.ultima_fecha, '') >= COALESCE(ultima_fecha, '')
+                                        THEN excluded.ultimo_pedimento ELSE ultimo_pedimento END,
+                ultima_fecha = MAX(COALESCE(excluded.ultima_fecha, ''), COALESCE(ultima_fecha, '')),
+                actualizado = excluded.actualizado
+            """,
+            [(f[2], f[3], f[4], fecha, f[5], numero, ahora) for f in filas],
+        )
+
+        # códigos que ya no vienen en el pedimento reemplazado, o todos si
+        # le cambió la fecha: su último costo puede ser de otro pedimento
+        revisar = {r["item_number"] for r in anteriores}
+        if all(r["fecha"] == fecha for r in anteriores):
+            revisar -= {f[2] for f in filas}
+        for item_number in revisar:
+            self._recalcular_ultimo(con, item_number, numero)
+        return len(filas)
+
+    def _recalcular_ultimo(self, con, item_number, numero):
+        row = con.execute(
+            "SELECT pedimentos, ultimo_pedimento FROM costos_item WHERE item_number = ?",
+            (item_number,),
+        ).fetchone()
+        if row["pedimentos"] <= 0:
+            con.execute("DELETE FROM costos_item WHERE item_number = ?", (item_number,))
+            return
+        if row["ultimo_pedimento"] != numero:
+            return
+        # el último era el pedimento reemplazado: se toma el más reciente que queda
+        ultimo = con.execute(
+            """
+            SELECT fecha, costo_final, numero_completo FROM costos
+            WHERE item_number = ?
+            ORDER BY COALESCE(fecha, '') DESC, registrado DESC
+            LIMIT 1
+            """,
+            (item_number,),
+        ).fetchone()
+        con.execute(
+            """
+            UPDATE costos_item SET ultima_fecha = ?, ultimo_costo = ?, ultimo_pedimento = ?
+            WHERE item_number = ?
+            """,
+            (ultimo["fecha"], ultimo["costo_final"], ultimo["numero_completo"], item_number),
+        )
+
+    # --------------------------------------------------------
+    #  CONSULTA
+    # --------------------------------------------------------
+    def costos(self, item_number, desde=None, hasta=None, limite=1000):
+        """Serie de tiempo, promedio ponderado y último costo de un código
+           (None si nunca se ha costeado). desde / hasta (aaaa-mm-dd) solo
+           recortan la serie; los acumulados son de todo el historial. La
+           serie va de la más antigua a la más reciente y limite conserva
+           las `limite` filas más recientes."""
+        with self._connect() as con:
+            resumen = con.execute(
+                "SELECT * FROM costos_item WHERE item_number = ?", (item_number,)
+            ).fetchone()
+            if resumen is None:
+                return None
+
+            condiciones, params = ["item_number = ?"], [item_number]
+            if desde:
+                condiciones.append("fecha >= ?")
+                params.append(desde)
+            if hasta:
+                condiciones.append("fecha <= ?")
+                params.append(hasta)
+            # las más recientes primero para que LIMIT corte las antiguas
+            # (sin fecha cuenta como la más antigua); se voltea al final
+            serie = [
+                dict(row)
+                for row in con.execute(
+                    f"""
+                    SELECT fecha, numero_completo, cantidad, costo_total, costo_final, tipo_de_cambio
+                    FROM costos
+                    WHERE {' AND '.join(condiciones)}
+                    ORDER BY fecha DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (*params, limite),
+                )
+            ]
+            serie.reverse()
+
+        cantidad = resumen["cantidad"]
+        return {
+            "item_number": item_number,
+            "pedimentos": resumen["pedimentos"],
+            "cantidad_total": cantidad,
+            "costo_total": resumen["costo_total"],
+            "promedio_ponderado": resumen["costo_total"] / cantidad if cantidad else 0,
+            "ultimo_costo": {
+                "costo_final": resumen["ultimo_costo"],
+                "fecha": resumen["ultima_fecha"] or None,
+                "numero_completo": resumen["ultimo_pedimento"],
+            },
+            "serie": serie,
+        }
@@ -0,0 +1,302 @@
+# jobs.py
+
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+TERMINADO = "terminado"
+ERROR = "error"
+
+# etapas de un trabajo en PROCESANDO
+CARGANDO = "cargando"     # parseo del XML (progreso en bytes leídos)
+COSTEANDO = "costeando"   # costeo (progreso en fracciones)
+
+# columnas agregadas después de la primera versión de la tabla
+COLUMNAS_NUEVAS = {
+    "pid": "INTEGER",
+    "etapa": "TEXT",
+    "leidos": "INTEGER NOT NULL DEFAULT 0",
+    "total_bytes": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class JobStore:
+    """Trabajos de costeo en SQLite local.
+
+       Se usa un archivo (no memoria del proceso) para que cualquier worker
+       de gunicorn pueda responder el polling de un trabajo lanzado en otro.
+       Un trabajo terminado (o con error) se borra ttl segundos después de
+       su última actualización; uno pendiente o en proceso no expira, por
+       mucho que espere en la cola.
+
+       Cada trabajo guarda el pid del worker que lo ejecuta: al salir el
+       worker (reciclado por max_requests, recarga o apagado) se esperan
+       sus trabajos hasta graceful_timeout y los que no terminan se marcan
+       como error de inmediato (ver JobRunner.shutdown,
+       marcar_interrumpidos y worker_exit en gunicorn.conf.py)."""
+
+    def __init__(self, db_path, ttl=3600, stale_after=900):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.stale_after = stale_after
+
+        carpeta = os.path.dirname(db_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    estado TEXT NOT NULL,
+                    procesadas INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    resultado TEXT,
+                    error TEXT,
+                    creado REAL NOT NULL,
+                    actualizado REAL NOT NULL
+                )
+                """
+            )
+            existentes = {row[1] for row in con.execute("PRAGMA table_info(jobs)")}
+            for columna, tipo in COLUMNAS_NUEVAS.items():
+                if columna not in existentes:
+                    con.execute(f"ALTER TABLE jobs ADD COLUMN {columna} {tipo}")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_creado ON jobs(creado)")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_estado ON jobs(estado, actualizado)")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_pid ON jobs(pid, estado)")
+
+    @contextmanager
+    def _connect(self):
+        # una conexión por operación: seguro entre hilos sin locks propios
+        con = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def crear(self):
+        job_id = uuid.uuid4().hex
+        ahora = time.time()
+        with self._connect() as con:
+            # solo expiran los terminados; un PROCESANDO sin actualizarse en
+            # stale_after ya se reporta como interrumpido y se borra después
+            con.execute(
+                """
+                DELETE FROM jobs
+                WHERE (estado IN (?, ?) AND actualizado < ?)
+                   OR (estado = ? AND actualizado < ?)
+                """,
+                (TERMINADO, ERROR, ahora - self.ttl, PROCESANDO, ahora - self.ttl - self.stale_after),
+            )
+            # el trabajo corre en el pool de este mismo proceso
+            con.execute(
+                "INSERT INTO jobs (id, estado, pid, creado, actualizado) VALUES (?, ?, ?, ?, ?)",
+                (job_id, PENDIENTE, os.getpid(), ahora, ahora),
+            )
+        return job_id
+
+    def marcar_interrumpidos(self, pid):
+        """Marca como error los trabajos pendientes o en proceso del worker
+           pid (que está saliendo). Regresa cuántos se marcaron."""
+        with self._connect() as con:
+            cursor = con.execute(
+                "UPDATE jobs SET estado = ?, error = ?, actualizado = ? WHERE pid = ? AND estado IN (?, ?)",
+                (ERROR, "Trabajo interrumpido: el worker se reinició", time.time(), pid, PENDIENTE, PROCESANDO),
+            )
+            return cursor.rowcount
+
+    def actualizar(self, job_id, **campos):
+        if "resultado" in campos:
+            campos["resultado"] = json.dumps(campos["resultado"], ensure_ascii=False)
+        campos["actualizado"] = time.time()
+        asignaciones = ", ".join(f"{k} = ?" for k in campos)
+        with self._connect() as con:
+            con.execute(f"UPDATE jobs SET {asignaciones} WHERE id = ?", (*campos.values(), job_id))
+
+    def obtener(self, job_id):
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            row = con.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        # misma regla que la purga de crear(): solo expiran los terminados
+        if row["estado"] in (TERMINADO, ERROR) and time.time() - row["actualizado"] > self.ttl:
+            return None
+
+        job = {
+            "job_id": row["id"],
+            "estado": row["estado"],
+            # etapa "cargando": bytes del XML leídos por el builder;
+            # etapa "costeando": fracciones costeadas (el motor columnar
+            # costea todo de una vez y solo reporta al terminar)
+            "progreso": {
+                "etapa": row["etapa"],
+                "bytes_leidos": row["leidos"],
+                "total_bytes": row["total_bytes"],
+                "fracciones_procesadas": row["procesadas"],
+                "total_fracciones": row["total"],
+            },
+        }
+
+        # respaldo de marcar_interrumpidos (worker muerto con SIGKILL):
+        # solo PROCESANDO, que se actualiza al menos cada pocos segundos;
+        # un PENDIENTE puede esperar mucho en la cola sin estar perdido
+        if row["estado"] == PROCESANDO and time.time() - row["actualizado"] > self.stale_after:
+            job["estado"] = ERROR
+            job["error"] = "Trabajo interrumpido"
+        if row["estado"] == TERMINADO:
+            job["resultado"] = json.loads(row["resultado"])
+        if row["estado"] == ERROR:
+            job["error"] = row["error"]
+        return job
+
+
+class LecturaConProgreso(io.BytesIO):
+    """Stream de bytes que reporta avance(leidos, total) en cada lectura:
+       da progreso (y latido) durante el parseo, que es lo más tardado."""
+
+    def __init__(self, data, avance):
+        super().__init__(data)
+        self.total = len(data)
+        self.avance = avance
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.avance(self.tell(), self.total)
+        return chunk
+
+
+class JobRunner:
+    """Ejecuta trabajos de costeo en un pool de hilos en segundo plano.
+
+       El pool se crea en el primer submit, ya dentro del worker (con
+       preload_app de gunicorn no conviene crear hilos antes del fork)."""
+
+    # mínimo de segundos entre escrituras de progreso a SQLite
+    INTERVALO_PROGRESO = 0.5
+
+    def __init__(self, store, processor, cache=None, workers=2, historial=None):
+        self.store = store
+        self.processor = processor
+        self.cache = cache
+        self.historial = historial
+        self.workers = workers
+        self._pool = None
+        self._futuros = set()
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pedimento-job")
+            return self._pool
+
+    def submit(self, xml_bytes, cache_key=None):
+        job_id = self.store.crear()
+
+        if self.cache is not None and cache_key is not None:
+            resultado = self.cache.get(cache_key)
+            if resultado is not None:
+                total = resultado["pedimento"]["total_fracciones"]
+                self.store.actualizar(job_id, estado=TERMINADO, procesadas=total, total=total, resultado=resultado)
+                return job_id
+
+        futuro = self._executor().submit(self._run, job_id, xml_bytes, cache_key)
+        with self._lock:
+            self._futuros.add(futuro)
+        futuro.add_done_callback(self._terminado)
+        return job_id
+
+    def _terminado(self, futuro):
+        with self._lock:
+            self._futuros.discard(futuro)
+
+    def shutdown(self, espera=0, latido=None):
+        """Al salir el worker: deja de aceptar trabajos y espera hasta
+           espera segundos a que terminen los que ya tiene (en proceso y en
+           cola), llamando latido() mientras tanto. Lo que no alcanzó a
+           terminar se cancela y se marca como error (los hilos del pool
+           mueren con el proceso)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        pool.shutdown(wait=False)
+
+        limite = time.monotonic() + espera
+        while True:
+            with self._lock:
+                pendientes = set(self._futuros)
+            restante = limite - time.monotonic()
+            if not pendientes or restante <= 0:
+                break
+            wait(pendientes, timeout=min(1.0, restante), return_when=FIRST_COMPLETED)
+            if latido is not None:
+                latido()
+
+        pool.shutdown(wait=False, cancel_futures=True)
+        if not pendientes:
+            return
+        interrumpidos = self.store.marcar_interrumpidos(os.getpid())
+        if interrumpidos:
+            logging.warning(f"{interrumpidos} trabajos interrumpidos al salir el worker {os.getpid()}")
+
+    def _limitar(self, job_id):
+        """actualizar(job_id, ...) a lo más cada INTERVALO_PROGRESO segundos
+           (siempre al llegar al total)"""
+        ultimo = [0.0]
+
+        def reportar(hecho, de, **campos):
+            ahora = time.monotonic()
+            if hecho == de or ahora - ultimo[0] >= self.INTERVALO_PROGRESO:
+                ultimo[0] = ahora
+                self.store.actualizar(job_id, **campos)
+
+        return reportar
+
+    def _run(self, job_id, xml_bytes, cache_key):
+        try:
+            self.store.actualizar(job_id, estado=PROCESANDO, etapa=CARGANDO, total_bytes=len(xml_bytes))
+            reportar = self._limitar(job_id)
+            lectura = LecturaConProgreso(
+                xml_bytes, lambda leidos, total: reportar(leidos, total, leidos=leidos)
+            )
+            pedimento = self.processor.load_pedimento(lectura)
+            if pedimento is None:
+                raise Exception("Error al cargar el pedimento")
+
+            reportar = self._limitar(job_id)
+
+            def progreso(procesadas, total):
+                reportar(procesadas, total, procesadas=procesadas, total=total)
+
+            self.store.actualizar(
+                job_id, etapa=COSTEANDO, leidos=len(xml_bytes),
+                total=self.processor.total_fracciones(pedimento),
+            )
+            resultado = self.processor.costear(pedimento, progreso)
+
+            if self.cache is not None and cache_key is not None:
+                self.cache.put(cache_key, resultado)
+            if self.historial is not None:
+                try:
+                    self.historial.registrar(resultado)
+                except Exception as e:   # el costeo ya terminó; no se pierde por el historial
+                    logging.warning(f"No se registró el historial de costos del trabajo {job_id}: {e}")
+            self.store.actualizar(job_id, estado=TERMINADO, resultado=resultado)
+        except Exception as e:
+            logging.error(f"Error en trabajo {job_id}: {e}")
+            self.store.actualizar(job_id, estado=ERROR, error=str(e))
@@ -1,22 +1,14 @@
-from builder import PedimentoBuilder
+from snapshot import cargar_pedimento
 import pandas as pd
 from copy import deepcopy
 
 file_name = '5004476'
 xml_file = f"Pedimentos/{file_name}.xml"
 
-builder = (
-    PedimentoBuilder(xml_file)
-    .build_header()
-    .build_cliente()
-    .build_facturas()
-    .build_fracciones()
-    .build_identificadores()
-    .build_incrementables()
-    .build_contribuciones_generales()
-)
-
-pedimento = builder.build()
+# mismo Pedimento que el builder fluido; desde la segunda corrida sale del
+# snapshot en ~/.cache/pedimentos/snapshots/ (se invalida si cambia el XML o
+# el builder; otro directorio con cache_dir=... o PEDIMENTO_SNAPSHOT_DIR)
+pedimento = cargar_pedimento(xml_file, numerico=True)
 
 MAP_CLAVE_IMPUESTO = {
     "6": "IGI/IGE",
@@ -61,6 +53,12 @@ for c in pedimento.contribuciones_generales:
 items_raw = []
 cantidad_total_pedimento = 0
 
+# factores del pedimento: precalculados por el builder numérico
+tipo_de_cambio = float(pedimento.tipo_de_cambio or 0)
+factor = pedimento.factor_valor_aduana
+if factor is None:
+    factor = float(pedimento.valor_aduana) / float(pedimento.precio_pagado_valor_comecrial)
+
 for fraccion in pedimento.fracciones:
 
     dta = float(fraccion.dta or 0)
@@ -89,16 +87,14 @@ for fraccion in pedimento.fracciones:
         cantidad = float(item.cantidad or 0)
         cantidad_total_pedimento += cantidad
 
-        factor = float(pedimento.valor_aduana) / float(pedimento.precio_pagado_valor_comecrial)
-
         vals = {
             "codigo": item.item_number,
-            "valor_aduana": (float(item.total or 0) * float(pedimento.tipo_de_cambio or 0)) * factor,
+            "valor_aduana": (float(item.total or 0) * tipo_de_cambio) * factor,
             "precio_unitario": float(item.precio_unitario or 0),
             "cantidad": cantidad,
             "dta": dta,
             "contribuciones_fraccion": contrib_frac_total,
-            "tipo_de_cambio": float(pedimento.tipo_de_cambio or 0),
+            "tipo_de_cambio": tipo_de_cambio,
         }
 
         vals.update(contrib_frac_keys)
@@ -0,0 +1,165 @@
+# manifest.py
+
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+from cache import escritura_atomica, version_reglas
+
+try:
+    import fcntl   # POSIX: lock entre procesos al guardar
+except ImportError:
+    fcntl = None
+
+VERSION_MANIFEST = 1
+
+
+def hash_archivo(path, bloque=1024 * 1024):
+    """sha256 del contenido, leído por bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bloque), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Manifest:
+    """Registro de los XML ya costeados de un directorio (modo incremental).
+
+       Por archivo guarda tamaño, mtime, hash del contenido, versión de las
+       reglas de costeo y el Excel generado. Un archivo se vuelve a costear
+       solo si es nuevo, si cambió su contenido o si cambiaron las reglas
+       (MAP_CLAVE_IMPUESTO*, BASES_PRORRATEO_*); si solo cambió el mtime se compara el hash.
+
+       Se guarda como JSON (escritura atómica) junto a las salidas. Varios
+       procesos pueden usar el mismo manifest (watcher.py y batch.py
+       --incremental sobre la misma carpeta): guardar() toma un lock de
+       archivo, relee lo que hay en disco y aplica encima solo las entradas
+       que cambió esta instancia."""
+
+    def __init__(self, path):
+        self.path = path
+        self.archivos = self._leer()
+        # clave -> entrada nueva (None = eliminada) desde el último guardar()
+        self._cambios = {}
+
+    def _leer(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == VERSION_MANIFEST:
+                return data["archivos"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Manifest ilegible {self.path}, se reconstruye: {e}")
+        return {}
+
+    def revisar(self, xml_path, reglas=None):
+        """Estado de un solo XML: (entrada, None) si su resultado sigue
+           vigente, (None, hash) si hay que costearlo. Solo hace stat del
+           archivo (y hash si cambió su tamaño o mtime)."""
+        reglas = reglas or version_reglas()
+        clave = self.clave(xml_path)
+        stat = os.stat(xml_path)
+        entrada = self.archivos.get(clave)
+
+        vigente = (
+            entrada is not None
+            and entrada["version_reglas"] == reglas
+            and os.path.exists(entrada["salida"])
+        )
+        if vigente and entrada["size"] == stat.st_size and entrada["mtime_ns"] == stat.st_mtime_ns:
+            return entrada, None
+
+        contenido = hash_archivo(xml_path)
+        if vigente and entrada["hash"] == contenido:
+            # mismo contenido con otro mtime (copiado o tocado)
+            entrada["size"] = stat.st_size
+            entrada["mtime_ns"] = stat.st_mtime_ns
+            self._cambios[clave] = entrada
+            return entrada, None
+
+        return None, contenido
+
+    def planear(self, xml_paths):
+        """Separa los XML en (pendientes, vigentes, eliminados).
+
+           pendientes: [(path, hash)] a costear
+           vigentes:   [(path, entrada)] cuyo resultado se reutiliza
+           eliminados: paths del manifest cuyo archivo ya no existe
+           (un glob que no los incluye no cuenta como eliminación)"""
+        reglas = version_reglas()
+        pendientes, vigentes = [], []
+
+        for xml_path in xml_paths:
+            entrada, contenido = self.revisar(xml_path, reglas)
+            if entrada is not None:
+                vigentes.append((xml_path, entrada))
+            else:
+                pendientes.append((xml_path, contenido))
+
+        return pendientes, vigentes, self.eliminados()
+
+    def eliminados(self, directorio=None):
+        """Claves del manifest cuyo archivo ya no existe (solo las de
+           directorio, si se da)."""
+        if directorio is not None:
+            directorio = os.path.abspath(directorio)
+        return [
+            clave for clave in self.archivos
+            if (directorio is None or os.path.dirname(clave) == directorio)
+            and not os.path.exists(clave)
+        ]
+
+    @staticmethod
+    def clave(xml_path):
+        """Ruta absoluta: el manifest no depende del directorio de trabajo."""
+        return os.path.abspath(xml_path)
+
+    def registrar(self, xml_path, contenido, salida, parquet=None):
+        stat = os.stat(xml_path)
+        clave = self.clave(xml_path)
+        self.archivos[clave] = self._cambios[clave] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": contenido,
+            "version_reglas": version_reglas(),
+            "salida": str(salida),
+            "parquet": parquet,
+        }
+
+    def eliminar(self, clave):
+        """Quita el archivo del manifest y regresa su entrada (o None)."""
+        self._cambios[clave] = None
+        return self.archivos.pop(clave, None)
+
+    @contextmanager
+    def _bloqueo(self):
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def guardar(self):
+        """Relee el manifest en disco bajo lock, le aplica los cambios de
+           esta instancia y lo escribe (lo que guardó otro proceso entre
+           tanto se conserva)."""
+        with self._bloqueo():
+            archivos = self._leer()
+            for clave, entrada in self._cambios.items():
+                if entrada is None:
+                    archivos.pop(clave, None)
+                else:
+                    archivos[clave] = entrada
+            with escritura_atomica(self.path) as f:
+                json.dump({"version": VERSION_MANIFEST, "archivos": archivos}, f, ensure_ascii=False)
+        self.archivos = archivos
+        self._cambios = {}
@@ -0,0 +1,274 @@
+# processor.py
+
+import logging
+
+from builder import PedimentoStreamBuilder
+from copy import deepcopy
+from prorrateo import prorratear
+
+# Mapeos de impuestos (los que ya tenías)
+MAP_CLAVE_IMPUESTO = {
+    "6": "IGI/IGE",
+    "3": "IVA",
+    "2": "CC"
+}
+
+MAP_CLAVE_IMPUESTO_GENERAL = {
+    "1": "DTA",
+    "15": "PRV",
+    "23": "IVA/PRV",
+}
+
+# Base de prorrateo de cada contribución general entre los items
+# ("cantidad" o "valor_aduana"); las que no aparecen van por cantidad
+BASES_PRORRATEO_GENERAL = {}
+BASE_PRORRATEO_DEFAULT = "cantidad"
+
+# Al agrupar por código estas claves conservan el valor del primer item
+# (codigo, cantidad y valor_aduana se tratan aparte)
+CLAVES_NO_ACUMULABLES = (
+    "codigo", "cantidad", "valor_aduana",
+    "precio_unitario", "precio_final",
+    "tipo_de_cambio", "dta", "contribuciones_fraccion",
+    'IVA', 'IGI/IGE', 'CC'
+)
+
+class PedimentoProcessor:
+    """Clase para procesar pedimentos - Manteniendo tu lógica original.
+
+    No guarda estado entre llamadas: el pedimento y los acumulados viven
+    en variables locales de cada petición, así que una sola instancia se
+    puede compartir entre hilos del servidor."""
+        
+    def load_pedimento(self, xml_source):
+        """Carga el pedimento desde ruta, bytes o stream XML (None si falla)"""
+        try:
+            # Una sola pasada con iterparse: la memoria no crece con el árbol
+            # modo numérico: importes y cantidades llegan ya como float
+            return PedimentoStreamBuilder(xml_source, numerico=True).build()
+        except Exception as e:
+            logging.error(f"Error cargando pedimento: {e}")
+            return None
+    
+    def total_fracciones(self, pedimento):
+        """Número de fracciones del pedimento cargado (para el progreso)"""
+        return len(pedimento.fracciones)
+
+    def _procesar_contribuciones_generales(self, pedimento):
+        """Procesa las contribuciones generales del pedimento.
+        Retorna (total, importes por clave)"""
+        contrib_gen_total = 0
+        contrib_gen_keys = {}
+        
+        for c in pedimento.contribuciones_generales:
+            tipo = (c.tipo_de_tasa or "").strip()
+            if tipo == "0":
+                continue
+
+            importe = float(c.importe or 0)
+            contrib_gen_total += importe
+
+            clave_raw = (c.clave_impuesto or "").strip()
+
+            if clave_raw in MAP_CLAVE_IMPUESTO_GENERAL:
+                clave = MAP_CLAVE_IMPUESTO_GENERAL[clave_raw]
+            else:
+                clave = f"GEN_{clave_raw}"
+
+            contrib_gen_keys[clave] = contrib_gen_keys.get(clave, 0) + importe
+            
+        return contrib_gen_total, contrib_gen_keys
+    
+    def _procesar_contribuciones_fraccion(self, fraccion):
+        """Procesa las contribuciones de una fracción.
+        Retorna (total, importes por clave)"""
+        contrib_frac_total = 0
+        contrib_frac_keys = {}
+
+        for contribucion in fraccion.contribuciones:
+            tipo = (contribucion.tipo_de_tasa or "").strip()
+            if tipo == "0":
+                continue
+
+            importe = float(contribucion.importe or 0)
+            contrib_frac_total += importe
+
+            clave_raw = (contribucion.clave_impuesto or "").strip()
+
+            if clave_raw in MAP_CLAVE_IMPUESTO:
+                clave = MAP_CLAVE_IMPUESTO[clave_raw]
+            else:
+                clave = f"CONTRIB_{clave_raw}"
+
+            contrib_frac_keys[clave] = contrib_frac_keys.get(clave, 0) + importe
+
+        return contrib_frac_total, contrib_frac_keys
+    
+    def _factor_valor_aduana(self, pedimento):
+        """ValorAduana / ValorComercialPrecioPagado del pedimento
+        (el precalculado por el builder numérico si existe)"""
+        if pedimento.factor_valor_aduana is not None:
+            return pedimento.factor_valor_aduana
+        return float(pedimento.valor_aduana) / float(pedimento.precio_pagado_valor_comecrial)
+    
+    def _procesar_items_raw(self, pedimento, progreso=None):
+        """Procesa los items del pedimento y retorna lista de items raw.
+        progreso(procesadas, total) se llama al terminar cada fracción."""
+        items_raw = []
+        cantidad_total_pedimento = 0
+        total_fracciones = len(pedimento.fracciones)
+
+        # factores del pedimento: una vez por pedimento, no por item
+        tipo_de_cambio = float(pedimento.tipo_de_cambio or 0)
+        if any(fraccion.items for fraccion in pedimento.fracciones):
+            factor = self._factor_valor_aduana(pedimento)
+
+        for n, fraccion in enumerate(pedimento.fracciones, 1):
+            dta = float(fraccion.dta or 0)
+            contrib_frac_total, contrib_frac_keys = self._procesar_contribuciones_fraccion(fraccion)
+
+            for item in fraccion.items:
+                cantidad = float(item.cantidad or 0)
+                cantidad_total_pedimento += cantidad
+
+                vals = {
+                    "codigo": item.item_number,
+                    "valor_aduana": (float(item.total or 0) * tipo_de_cambio) * factor,
+                    "precio_unitario": float(item.precio_unitario or 0),
+                    "cantidad": cantidad,
+                    "dta": dta,
+                    "contribuciones_fraccion": contrib_frac_total,
+                    "tipo_de_cambio": tipo_de_cambio,
+                }
+
+                vals.update(contrib_frac_keys)
+                items_raw.append(vals)
+
+            if progreso is not None:
+                progreso(n, total_fracciones)
+                
+        return items_raw, cantidad_total_pedimento
+    
+    def _aplicar_prorrateo(self, items_raw, contrib_gen_keys, contrib_gen_total):
+        """Aplica prorrateo de contribuciones generales a los items
+        (cada clave con su base, ver BASES_PRORRATEO_GENERAL)"""
+        asignado, desglose = prorratear(
+            {
+                "cantidad": [vals["cantidad"] for vals in items_raw],
+                "valor_aduana": [vals["valor_aduana"] for vals in items_raw],
+            },
+            list(contrib_gen_keys), list(contrib_gen_keys.values()),
+            reglas=BASES_PRORRATEO_GENERAL, base_default=BASE_PRORRATEO_DEFAULT,
+            por_concepto=True, total_importes=contrib_gen_total,
+        )
+        desglose = {k: v.tolist() for k, v in desglose.items()}
+        asignado = asignado.tolist()
+
+        for i, vals in enumerate(items_raw):
+            for k in contrib_gen_keys:
+                vals[k] = desglose[k][i]
+
+            vals["contrib_gen_prorrateado"] = asignado[i]
+            
+        return items_raw
+    
+    def _agrupar_items(self, items_raw):
+        """Agrupa items por código"""
+        agrupado = {}
+
+        for item in items_raw:
+            codigo = item["codigo"]
+
+            if codigo not in agrupado:
+                agrupado[codigo] = deepcopy(item)
+            else:
+                agrupado[codigo]["cantidad"] += item["cantidad"]
+                agrupado[codigo]["valor_aduana"] += item["valor_aduana"]
+
+                for key, value in item.items():
+                    if key not in CLAVES_NO_ACUMULABLES:
+                        if isinstance(value, (int, float)):
+                            agrupado[codigo][key] = agrupado[codigo].get(key, 0) + value
+                            
+        return agrupado
+    
+    def _costos_finales(self, items_agrupados):
+        """Genera cada item agrupado con su costo final, uno por uno.
+        Vacía items_agrupados y suelta cada item al entregarlo: en
+        streaming el generador no retiene los items ya enviados"""
+        pendientes = list(items_agrupados.values())
+        items_agrupados.clear()
+        pendientes.reverse()
+        while pendientes:
+            vals = pendientes.pop()
+            cantidad = vals.get("cantidad", 0)
+            va = vals.get("valor_aduana", 0)
+            dta = vals.get("dta", 0)
+            iva = vals.get("IVA", 0)
+            igi = vals.get("IGI/IGE", 0)
+            prv = vals.get("PRV", 0)
+            cc = vals.get("CC", 0)
+            iva_prv = vals.get("IVA/PRV", 0)
+
+            costo_total = va + iva + igi + prv + iva_prv + dta + cc
+            vals["costo_final"] = costo_total / cantidad if cantidad else 0
+            vals["costo_total"] = costo_total
+            
+            yield vals
+
+    def _calcular_costos_finales(self, items_agrupados):
+        """Calcula costos finales para items agrupados"""
+        return list(self._costos_finales(items_agrupados))
+    
+    def _info_pedimento(self, pedimento, total_fracciones, items_agrupados, contrib_gen_total, contrib_gen_keys):
+        """Encabezado del resultado (el mismo en todos los motores)"""
+        return {
+            "numero_completo": pedimento.numero_completo,
+            "fecha_pago": pedimento.fecha_pago,
+            "total_fracciones": total_fracciones,
+            "total_facturas": len(pedimento.facturas),
+            "items_agrupados": items_agrupados,
+            "contribuciones_generales": contrib_gen_keys,
+            "total_contribuciones_generales": contrib_gen_total
+        }
+
+    def costear_stream(self, pedimento, progreso=None):
+        """Costea un Pedimento ya construido y retorna (info del pedimento,
+        generador de items finales): el encabezado está listo antes del
+        primer item y cada item se entrega en cuanto tiene su costo"""
+        contrib_gen_total, contrib_gen_keys = self._procesar_contribuciones_generales(pedimento)
+        items_raw, _ = self._procesar_items_raw(pedimento, progreso)
+        items_con_prorrateo = self._aplicar_prorrateo(items_raw, contrib_gen_keys, contrib_gen_total)
+        items_agrupados = self._agrupar_items(items_con_prorrateo)
+        
+        info_pedimento = self._info_pedimento(
+            pedimento, len(pedimento.fracciones), len(items_agrupados),
+            contrib_gen_total, contrib_gen_keys,
+        )
+        return info_pedimento, self._costos_finales(items_agrupados)
+    
+    def costear(self, pedimento, progreso=None):
+        """Costea un Pedimento ya construido y retorna resultados"""
+        info_pedimento, items = self.costear_stream(pedimento, progreso)
+        
+        return {
+            "pedimento": info_pedimento,
+            "items": list(items)
+        }
+    
+    def procesar_pedimento(self, xml_source):
+        """Procesa completo el pedimento (ruta, bytes o stream) y retorna resultados"""
+        pedimento = self.load_pedimento(xml_source)
+        if pedimento is None:
+            raise Exception("Error al cargar el pedimento")
+        
+        return self.costear(pedimento)
+
+    def procesar_stream(self, xml_source):
+        """Como procesar_pedimento, pero regresa (info, generador de items)
+        (ver costear_stream)"""
+        pedimento = self.load_pedimento(xml_source)
+        if pedimento is None:
+            raise Exception("Error al cargar el pedimento")
+        
+        return self.costear_stream(pedimento)
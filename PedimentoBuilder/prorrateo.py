@@ -0,0 +1,97 @@
+# prorrateo.py
+"""
+Motor de prorrateo: reparte importes (gastos, incrementables,
+contribuciones generales) entre las filas de un pedimento (fracciones o
+items) en proporción a una base.
+
+Cada concepto elige su base con un dict de reglas {concepto: base}; los
+que no aparecen usan la base por omisión. Los importes se suman una vez
+por base y el reparto es una operación vectorizada por base, no una
+pasada sobre todas las filas por cada gasto:
+
+    asignado = sum(base_b / sum(base_b) * monto_b  para cada base b)
+
+Lo usan xml_a_excel.prorrateo (gastos por fracción) y PedimentoProcessor
+(contribuciones generales por item, en todos los motores).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Bases de prorrateo conocidas. Cada llamador pasa las que tiene como
+# {base: arreglo por fila}; una regla con una base que no pasó es error.
+BASES = ("valor_aduana", "cantidad", "peso", "valor_dolares")
+
+
+def factores(base):
+    """base / sum(base) por fila; ceros si la suma es 0.
+
+    La suma es secuencial (cumsum), igual que acumular con += en un ciclo,
+    para que el motor de dicts y los vectorizados den lo mismo."""
+    base = np.asarray(base, dtype=np.float64)
+    if len(base) == 0:
+        return base
+    total = float(np.cumsum(base)[-1])
+    if not total:
+        return np.zeros(len(base))
+    return base / total
+
+
+def prorratear(
+    bases, conceptos, importes, reglas=None, base_default="valor_aduana",
+    por_concepto=False, total_importes=None,
+):
+    """Reparte importes entre filas.
+
+    bases:     {base: arreglo con un valor por fila}
+    conceptos: concepto de cada importe (puede repetirse)
+    importes:  importe de cada concepto
+    reglas:    {concepto: base}; los demás usan base_default
+    total_importes: suma de los importes tal como la acumuló el llamador;
+               si todos los conceptos van a una sola base, lo asignado es
+               factores(base) * total_importes, el mismo float que el
+               costeo original (sumar los montos por concepto en otro
+               orden cambia el último bit). Con varias bases se ignora.
+
+    Regresa (total, desglose):
+        total:    arreglo con lo asignado a cada fila (todas las bases)
+        desglose: {concepto: arreglo por fila} si por_concepto, si no None
+                  (con muchos conceptos distintos es la parte cara)"""
+    reglas = reglas or {}
+    n = len(next(iter(bases.values()))) if bases else 0
+    total = np.zeros(n)
+
+    importes = np.asarray(importes, dtype=np.float64)
+    if len(importes) == 0:
+        return total, ({} if por_concepto else None)
+
+    # monto por concepto, en orden de primera aparición (bincount suma
+    # en el orden de los importes)
+    codigo, unicos = pd.factorize(np.asarray(conceptos, dtype=object), sort=False)
+    montos = np.bincount(codigo, weights=importes, minlength=len(unicos))
+
+    base_concepto = [reglas.get(concepto, base_default) for concepto in unicos]
+    faltantes = sorted(set(base_concepto) - set(bases))
+    if faltantes:
+        raise ValueError(
+            f"Base de prorrateo no disponible: {', '.join(faltantes)} "
+            f"(disponibles: {', '.join(bases)})"
+        )
+
+    # un reparto vectorizado por base, no por concepto
+    por_base = {}
+    for nombre, monto in zip(base_concepto, montos.tolist()):
+        por_base[nombre] = por_base.get(nombre, 0) + monto
+    if total_importes is not None and len(por_base) == 1:
+        por_base = {nombre: total_importes for nombre in por_base}
+    factores_base = {nombre: factores(bases[nombre]) for nombre in por_base}
+    for nombre, monto in por_base.items():
+        total += factores_base[nombre] * monto
+
+    desglose = None
+    if por_concepto:
+        desglose = {
+            concepto: factores_base[nombre] * monto
+            for concepto, nombre, monto in zip(unicos, base_concepto, montos.tolist())
+        }
+    return total, desglose
@@ -0,0 +1,166 @@
+# snapshot.py
+"""
+Snapshots binarios de pedimentos ya construidos.
+
+Construir un Pedimento desde el XML domina el tiempo de los scripts y del
+lote; un snapshot es el objeto ya construido (Pedimento o
+PedimentoColumnar) en pickle protocolo 5, y cargarlo toma una fracción
+del parseo.
+
+La clave de cada snapshot es el sha256 del XML + la versión del builder
+(hash de los módulos que dan forma al objeto, MODULOS_BUILDER) + el tipo
+de objeto, así que cambiar el XML o el código que lo construye invalida el
+snapshot automáticamente.
+
+Por omisión se guardan en el caché del usuario
+($XDG_CACHE_HOME/pedimentos/snapshots, o ~/.cache/pedimentos/snapshots);
+otro directorio se pasa explícitamente con cache_dir (--snapshots DIR) o
+PEDIMENTO_SNAPSHOT_DIR. Nunca se deriva de la ruta del XML.
+
+Seguridad: los snapshots se leen con pickle.load, que ejecuta código
+arbitrario si el archivo fue manipulado. El directorio se crea con modo
+0700 y solo se usa si es del usuario actual y ni el grupo ni otros pueden
+escribir en él; si no, se construye desde el XML sin snapshot.
+"""
+
+import gc
+import hashlib
+import logging
+import os
+import pickle
+import stat
+from pathlib import Path
+
+from builder import PedimentoStreamBuilder
+from cache import escritura_atomica
+from manifest import hash_archivo
+
+PROTOCOLO = 5
+
+
+# módulos cuyo código cambia el objeto guardado: los builders, las clases
+# del dominio y los load_pedimento de cada motor (processor.py para
+# Pedimento, vectorized.py para PedimentoColumnar)
+MODULOS_BUILDER = ("builder.py", "domain.py", "processor.py", "vectorized.py")
+
+
+def _version_builder():
+    h = hashlib.sha256()
+    for nombre in MODULOS_BUILDER:
+        h.update((Path(__file__).parent / nombre).read_bytes())
+    return h.hexdigest()[:12]
+
+
+# se calcula una vez por proceso
+VERSION_BUILDER = _version_builder()
+
+
+def directorio_usuario():
+    """Caché privado del usuario: $XDG_CACHE_HOME/pedimentos/snapshots."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "pedimentos" / "snapshots"
+
+
+def directorio_snapshots(cache_dir=None):
+    """cache_dir, PEDIMENTO_SNAPSHOT_DIR o el caché del usuario."""
+    cache_dir = cache_dir or os.environ.get("PEDIMENTO_SNAPSHOT_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    return directorio_usuario()
+
+
+def directorio_privado(directorio):
+    """Crea el directorio (0700) si no existe y dice si se puede confiar en
+       sus pickles: del usuario actual y sin escritura de grupo ni otros."""
+    try:
+        directorio.mkdir(mode=0o700, parents=True, exist_ok=True)
+        info = directorio.stat()
+    except OSError as e:
+        logging.warning(f"No se pudo usar el directorio de snapshots {directorio}: {e}")
+        return False
+
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        logging.warning(f"{directorio} es de otro usuario: no se usan snapshots")
+        return False
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        logging.warning(f"{directorio} admite escritura de grupo u otros: no se usan snapshots")
+        return False
+    return True
+
+
+def ruta_snapshot(xml_path, tipo, cache_dir=None):
+    """<dir>/<sha256 del XML>.<tipo>.<versión del builder>.pkl"""
+    contenido = hash_archivo(xml_path)
+    return directorio_snapshots(cache_dir) / f"{contenido}.{tipo}.{VERSION_BUILDER}.pkl"
+
+
+def _sin_gc(fn, *args):
+    # (de)serializar cientos de miles de objetos dispara el GC una y otra
+    # vez sin que haya ciclos que recolectar
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        return fn(*args)
+    finally:
+        if activo:
+            gc.enable()
+
+
+def _leer(path):
+    with open(path, "rb") as f:
+        return _sin_gc(pickle.load, f)
+
+
+def _escribir(path, objeto):
+    with escritura_atomica(path, "wb") as f:
+        _sin_gc(pickle.dump, objeto, f, PROTOCOLO)
+
+    # snapshots del mismo XML con otra versión del builder ya no sirven
+    contenido, tipo, _, _ = path.name.split(".")
+    for viejo in path.parent.glob(f"{contenido}.{tipo}.*.pkl"):
+        if viejo != path:
+            viejo.unlink(missing_ok=True)
+
+
+def cargar(xml_path, construir, tipo, cache_dir=None):
+    """Objeto construido de xml_path: del snapshot si está vigente; si no,
+       construir(xml_path) y se guarda el snapshot.
+
+       Un snapshot ilegible se reconstruye; si construir regresa None
+       (XML inválido) no se guarda nada. En un directorio que no es
+       privado (ver directorio_privado) ni se lee ni se escribe."""
+    path = ruta_snapshot(xml_path, tipo, cache_dir)
+    if not directorio_privado(path.parent):
+        return construir(str(xml_path))
+
+    if path.exists():
+        try:
+            return _leer(path)
+        except Exception as e:
+            logging.warning(f"Snapshot ilegible {path.name}, se reconstruye: {e}")
+
+    objeto = construir(str(xml_path))
+    if objeto is not None:
+        try:
+            _escribir(path, objeto)
+        except OSError as e:
+            logging.warning(f"No se pudo guardar el snapshot {path}: {e}")
+    return objeto
+
+
+def cargar_pedimento(xml_path, numerico=True, cache_dir=None):
+    """Pedimento (builder de streaming) de xml_path, con snapshot."""
+    return cargar(
+        xml_path,
+        lambda src: PedimentoStreamBuilder(src, numerico=numerico).build(),
+        "numerico" if numerico else "texto",
+        cache_dir,
+    )
+
+
+def cargar_para(processor, xml_path, cache_dir=None):
+    """processor.load_pedimento(xml_path) con snapshot. El tipo es la
+       clase que define load_pedimento: dicts y vectorizado comparten el
+       mismo Pedimento; el motor columnar guarda su PedimentoColumnar."""
+    tipo = type(processor).load_pedimento.__qualname__.split(".")[0]
+    return cargar(xml_path, processor.load_pedimento, tipo, cache_dir)
@@ -0,0 +1,527 @@
+# store.py
+"""
+Almacén local (SQLite en modo WAL) de los pedimentos construidos, para
+consultas entre pedimentos sin volver a parsear los XML:
+
+    - todos los items de un item_number en un rango de fechas
+    - impuesto total (IGI, IVA...) por fracción arancelaria
+    - pedimentos de un RFC
+
+Tablas normalizadas (una por sección del dominio, columnas de los CAMPOS_*
+del builder): pedimentos, facturas, fracciones, items, descripciones,
+contribuciones, permisos, identificadores e incrementables; con índices en
+item_number, numero_fraccion, RFC de cliente y proveedor, y fechas.
+
+Volver a cargar un pedimento (mismo número completo) reemplaza el anterior.
+
+Uso:
+    python3 store.py Pedimentos/ --db pedimentos.sqlite3
+    python3 store.py "Pedimentos/2511*.xml" --lote 100 --snapshots
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from builder import (
+    PedimentoStreamBuilder,
+    CAMPOS_HEADER, CAMPOS_CLIENTE, CAMPOS_PROVEEDOR_COMPRADOR, CAMPOS_FACTURA,
+    CAMPOS_FRACCION, CAMPOS_ITEM, CAMPOS_DESCRIPCION, CAMPOS_CONTRIBUCION,
+    CAMPOS_PERMISO, CAMPOS_IDENTIFICADOR, CAMPOS_INCREMENTABLE,
+    NUMERICOS_HEADER, NUMERICOS_FACTURA, NUMERICOS_FRACCION, NUMERICOS_ITEM,
+    NUMERICOS_CONTRIBUCION, NUMERICOS_PERMISO, NUMERICOS_INCREMENTABLE,
+)
+from manifest import hash_archivo
+from utils import parse_fecha
+
+NIVEL_PEDIMENTO = "pedimento"
+NIVEL_FRACCION = "fraccion"
+
+
+# ============================================================
+#  ESQUEMA
+# ============================================================
+def _columna(attr):
+    # "id" del XML (DescripcionEspecifica, OtrosPagos) no choca con la llave
+    return "id_xml" if attr == "id" else attr
+
+
+def _campos(campos, numericos=(), prefijo=""):
+    """[(columna, tipo, atributo)] de un mapa de campos del builder."""
+    return [
+        (prefijo + _columna(attr), "REAL" if attr in numericos else "TEXT", attr)
+        for attr, _ in campos
+    ]
+
+
+def _llave(tabla):
+    return f"INTEGER NOT NULL REFERENCES {tabla}(id) ON DELETE CASCADE"
+
+
+CAMPOS_PEDIMENTO = (
+    _campos(CAMPOS_HEADER, NUMERICOS_HEADER)
+    + _campos(CAMPOS_CLIENTE, prefijo="cliente_")
+)
+I_FECHA_PAGO = [columna for columna, _, _ in CAMPOS_PEDIMENTO].index("fecha_pago")
+CAMPOS_FACTURA_STORE = (
+    _campos(CAMPOS_FACTURA, NUMERICOS_FACTURA)
+    + _campos(CAMPOS_PROVEEDOR_COMPRADOR, prefijo="proveedor_")
+)
+
+# tabla -> (llaves [(columna, tipo)], campos [(columna, tipo, atributo)])
+ESQUEMA = {
+    "pedimentos": (
+        [("archivo", "TEXT"), ("hash", "TEXT"), ("cargado", "REAL")],
+        CAMPOS_PEDIMENTO,
+    ),
+    "facturas": ([("pedimento_id", _llave("pedimentos"))], CAMPOS_FACTURA_STORE),
+    "fracciones": (
+        [("pedimento_id", _llave("pedimentos"))],
+        _campos(CAMPOS_FRACCION, NUMERICOS_FRACCION),
+    ),
+    "items": (
+        [("pedimento_id", _llave("pedimentos")), ("fraccion_id", _llave("fracciones"))],
+        _campos(CAMPOS_ITEM, NUMERICOS_ITEM),
+    ),
+    "descripciones": (
+        [("pedimento_id", _llave("pedimentos")), ("item_id", _llave("items"))],
+        _campos(CAMPOS_DESCRIPCION),
+    ),
+    "contribuciones": (
+        # fraccion_id NULL = contribución general del pedimento
+        [
+            ("pedimento_id", _llave("pedimentos")),
+            ("fraccion_id", "INTEGER REFERENCES fracciones(id) ON DELETE CASCADE"),
+            ("nivel", "TEXT NOT NULL"),
+        ],
+        _campos(CAMPOS_CONTRIBUCION, NUMERICOS_CONTRIBUCION),
+    ),
+    "permisos": (
+        [("pedimento_id", _llave("pedimentos")), ("fraccion_id", _llave("fracciones"))],
+        _campos(CAMPOS_PERMISO, NUMERICOS_PERMISO),
+    ),
+    "identificadores": ([("pedimento_id", _llave("pedimentos"))], _campos(CAMPOS_IDENTIFICADOR)),
+    "incrementables": (
+        [("pedimento_id", _llave("pedimentos"))],
+        _campos(CAMPOS_INCREMENTABLE, NUMERICOS_INCREMENTABLE),
+    ),
+}
+
+INDICES = (
+    ("pedimentos", "numero_completo"),
+    ("pedimentos", "fecha_pago"),
+    ("pedimentos", "cliente_rfc"),
+    ("pedimentos", "hash"),
+    ("facturas", "pedimento_id"),
+    ("facturas", "proveedor_rfc_tax_id"),
+    ("facturas", "fecha"),
+    ("fracciones", "pedimento_id"),
+    ("fracciones", "numero_fraccion"),
+    ("items", "item_number"),
+    ("items", "fraccion_id"),
+    ("items", "pedimento_id"),
+    ("descripciones", "item_id"),
+    ("descripciones", "pedimento_id"),
+    ("contribuciones", "pedimento_id"),
+    ("contribuciones", "fraccion_id"),
+    ("contribuciones", "clave_impuesto, fraccion_id"),
+    ("permisos", "fraccion_id"),
+    ("permisos", "pedimento_id"),
+    ("identificadores", "pedimento_id"),
+    ("incrementables", "pedimento_id"),
+)
+
+
+def _crear_tabla(tabla):
+    llaves, campos = ESQUEMA[tabla]
+    columnas = ["id INTEGER PRIMARY KEY"]
+    columnas += [f"{nombre} {tipo}" for nombre, tipo in llaves]
+    columnas += [f"{nombre} {tipo}" for nombre, tipo, _ in campos]
+    return f"CREATE TABLE IF NOT EXISTS {tabla} (\n    " + ",\n    ".join(columnas) + "\n)"
+
+
+def _insertar(tabla):
+    llaves, campos = ESQUEMA[tabla]
+    nombres = ["id"] + [n for n, _ in llaves] + [n for n, _, _ in campos]
+    return f"INSERT INTO {tabla} ({', '.join(nombres)}) VALUES ({', '.join('?' * len(nombres))})"
+
+
+# ============================================================
+#  FILAS
+# ============================================================
+def _valores(obj, campos):
+    valores = []
+    for _, tipo, attr in campos:
+        valor = getattr(obj, attr)
+        # texto no numérico en una columna REAL queda como NULL
+        if tipo == "REAL" and not isinstance(valor, float):
+            try:
+                valor = float(valor or 0)
+            except ValueError:
+                valor = None
+        valores.append(valor)
+    return valores
+
+
+class _Ids:
+    """Siguiente id de cada tabla dentro de la transacción de carga."""
+
+    def __init__(self, con):
+        self.siguiente = {
+            tabla: con.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {tabla}").fetchone()[0]
+            for tabla in ESQUEMA
+        }
+
+    def nuevo(self, tabla):
+        valor = self.siguiente[tabla]
+        self.siguiente[tabla] = valor + 1
+        return valor
+
+
+def filas_pedimento(pedimento, ids, archivo=None, contenido=None):
+    """{tabla: [fila]} de un Pedimento, con ids ya asignados."""
+    filas = {tabla: [] for tabla in ESQUEMA}
+    _, campos_ped = ESQUEMA["pedimentos"]
+
+    ped_id = ids.nuevo("pedimentos")
+    n_header = len(CAMPOS_HEADER)
+    valores = (
+        _valores(pedimento, campos_ped[:n_header])
+        + _valores(pedimento.cliente, campos_ped[n_header:])
+    )
+    # fecha en ISO (aaaa-mm-dd) para poder filtrar por rango
+    fecha = parse_fecha(pedimento.fecha_pago)
+    valores[I_FECHA_PAGO] = fecha.isoformat() if fecha else None
+    filas["pedimentos"].append([ped_id, archivo, contenido, time.time()] + valores)
+
+    _, campos_fac = ESQUEMA["facturas"]
+    n_factura = len(CAMPOS_FACTURA)
+    for factura in pedimento.facturas:
+        filas["facturas"].append(
+            [ids.nuevo("facturas"), ped_id]
+            + _valores(factura, campos_fac[:n_factura])
+            + _valores(factura.proveedor_comprador, campos_fac[n_factura:])
+        )
+
+    for c in pedimento.contribuciones_generales:
+        filas["contribuciones"].append(
+            [ids.nuevo("contribuciones"), ped_id, None, NIVEL_PEDIMENTO]
+            + _valores(c, ESQUEMA["contribuciones"][1])
+        )
+
+    for tabla, lista in (("identificadores", pedimento.identificadores),
+                         ("incrementables", pedimento.incrementables)):
+        for obj in lista:
+            filas[tabla].append([ids.nuevo(tabla), ped_id] + _valores(obj, ESQUEMA[tabla][1]))
+
+    for fraccion in pedimento.fracciones:
+        fr_id = ids.nuevo("fracciones")
+        filas["fracciones"].append([fr_id, ped_id] + _valores(fraccion, ESQUEMA["fracciones"][1]))
+
+        for c in fraccion.contribuciones:
+            filas["contribuciones"].append(
+                [ids.nuevo("contribuciones"), ped_id, fr_id, NIVEL_FRACCION]
+                + _valores(c, ESQUEMA["contribuciones"][1])
+            )
+        for permiso in fraccion.permisos:
+            filas["permisos"].append(
+                [ids.nuevo("permisos"), ped_id, fr_id] + _valores(permiso, ESQUEMA["permisos"][1])
+            )
+        for item in fraccion.items:
+            item_id = ids.nuevo("items")
+            filas["items"].append([item_id, ped_id, fr_id] + _valores(item, ESQUEMA["items"][1]))
+            for desc in item.descripciones:
+                filas["descripciones"].append(
+                    [ids.nuevo("descripciones"), ped_id, item_id]
+                    + _valores(desc, ESQUEMA["descripciones"][1])
+                )
+
+    return filas
+
+
+# ============================================================
+#  ALMACÉN
+# ============================================================
+class PedimentoStore:
+    """Pedimentos construidos en SQLite local.
+
+       Como JobStore: una conexión por operación (seguro entre hilos y
+       workers de gunicorn) y WAL para que las consultas no esperen a
+       una carga en curso."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+        carpeta = os.path.dirname(db_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            for tabla in ESQUEMA:
+                con.execute(_crear_tabla(tabla))
+            for tabla, columnas in INDICES:
+                nombre = f"ix_{tabla}_{columnas.replace(', ', '_')}"
+                con.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla}({columnas})")
+
+    @contextmanager
+    def _connect(self):
+        con = sqlite3.connect(self.db_path, timeout=30)
+        con.execute("PRAGMA foreign_keys=ON")
+        # con WAL, NORMAL solo sincroniza en los checkpoints
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.row_factory = sqlite3.Row
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    # --------------------------------------------------------
+    #  CARGA
+    # --------------------------------------------------------
+    def cargar(self, pedimentos):
+        """Carga en una sola transacción una lista de (Pedimento, archivo,
+           hash del XML). Un pedimento con el mismo número completo que uno
+           ya cargado, o que otro anterior de la misma lista, lo reemplaza.
+           Regresa el id de cada elemento de la lista (los repetidos, el
+           del último)."""
+        # dentro del lote también gana el último de cada número
+        ultimo = {}
+        for i, (pedimento, _, _) in enumerate(pedimentos):
+            ultimo[pedimento.numero_completo or i] = i
+        unicos = sorted(ultimo.values())
+
+        with self._connect() as con:
+            # BEGIN IMMEDIATE: el lock de escritura se toma antes de leer
+            # los ids, así dos cargas en paralelo no chocan
+            con.execute("BEGIN IMMEDIATE")
+
+            for i in unicos:
+                numero = pedimentos[i][0].numero_completo
+                if numero:
+                    con.execute("DELETE FROM pedimentos WHERE numero_completo = ?", (numero,))
+
+            ids = _Ids(con)
+            filas = {tabla: [] for tabla in ESQUEMA}
+            id_por_indice = {}
+            for i in unicos:
+                pedimento, archivo, contenido = pedimentos[i]
+                por_tabla = filas_pedimento(pedimento, ids, archivo, contenido)
+                id_por_indice[i] = por_tabla["pedimentos"][0][0]
+                for tabla, lista in por_tabla.items():
+                    filas[tabla].extend(lista)
+
+            # padres antes que hijos (llaves foráneas)
+            for tabla in ESQUEMA:
+                if filas[tabla]:
+                    con.executemany(_insertar(tabla), filas[tabla])
+
+        return [
+            id_por_indice[ultimo[pedimento.numero_completo or i]]
+            for i, (pedimento, _, _) in enumerate(pedimentos)
+        ]
+
+    def cargar_xml(self, xml_source, archivo=None):
+        """Construye y carga un XML (ruta o bytes). Regresa el id."""
+        if isinstance(xml_source, bytes):
+            contenido = hashlib.sha256(xml_source).hexdigest()
+        else:
+            contenido = hash_archivo(xml_source)
+            archivo = archivo or Path(xml_source).name
+        pedimento = PedimentoStreamBuilder(xml_source, numerico=True).build()
+        return self.cargar([(pedimento, archivo, contenido)])[0]
+
+    def hashes_cargados(self):
+        with self._connect() as con:
+            return {row[0] for row in con.execute("SELECT hash FROM pedimentos WHERE hash IS NOT NULL")}
+
+    # --------------------------------------------------------
+    #  CONSULTAS
+    # --------------------------------------------------------
+    @staticmethod
+    def _rango(desde, hasta, columna="p.fecha_pago"):
+        """Condiciones y parámetros de un rango de fechas ISO (inclusivo)."""
+        condiciones, params = [], []
+        if desde:
+            condiciones.append(f"{columna} >= ?")
+            params.append(desde)
+        if hasta:
+            condiciones.append(f"{columna} <= ?")
+            params.append(hasta)
+        return condiciones, params
+
+    def _consultar(self, sql, params=()):
+        with self._connect() as con:
+            return [dict(row) for row in con.execute(sql, params)]
+
+    def items(self, item_number, desde=None, hasta=None, limite=1000):
+        """Items de un item_number en todos los pedimentos (más reciente primero)."""
+        condiciones, params = self._rango(desde, hasta)
+        condiciones.insert(0, "i.item_number = ?")
+        params.insert(0, item_number)
+        return self._consultar(
+            f"""
+            SELECT p.numero_completo, p.fecha_pago, p.cliente_rfc,
+                   f.numero_fraccion, i.factura, i.cantidad, i.unidad_factura,
+                   i.precio_unitario, i.total, i.origen
+            FROM items i
+            JOIN pedimentos p ON p.id = i.pedimento_id
+            JOIN fracciones f ON f.id = i.fraccion_id
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY p.fecha_pago DESC, i.id
+            LIMIT ?
+            """,
+            (*params, limite),
+        )
+
+    def fracciones(self, numero_fraccion, desde=None, hasta=None, limite=1000):
+        """Fracciones con un número arancelario en todos los pedimentos."""
+        condiciones, params = self._rango(desde, hasta)
+        condiciones.insert(0, "f.numero_fraccion = ?")
+        params.insert(0, numero_fraccion)
+        return self._consultar(
+            f"""
+            SELECT p.numero_completo, p.fecha_pago, f.nico, f.descripcion,
+                   f.cantidad_factura, f.unidad_factura, f.valor_aduana,
+                   f.valor_dolares, f.dta
+            FROM fracciones f
+            JOIN pedimentos p ON p.id = f.pedimento_id
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY p.fecha_pago DESC, f.id
+            LIMIT ?
+            """,
+            (*params, limite),
+        )
+
+    def impuestos_por_fraccion(self, clave_impuesto="6", desde=None, hasta=None):
+        """Importe total de un impuesto (ClaveImpuesto, 6 = IGI) por
+           fracción arancelaria, de mayor a menor."""
+        condiciones, params = self._rango(desde, hasta)
+        condiciones.insert(0, "c.clave_impuesto = ? AND c.fraccion_id IS NOT NULL")
+        params.insert(0, clave_impuesto)
+        return self._consultar(
+            f"""
+            SELECT f.numero_fraccion,
+                   SUM(c.importe) AS importe,
+                   COUNT(DISTINCT c.pedimento_id) AS pedimentos
+            FROM contribuciones c
+            JOIN fracciones f ON f.id = c.fraccion_id
+            JOIN pedimentos p ON p.id = c.pedimento_id
+            WHERE {' AND '.join(condiciones)}
+            GROUP BY f.numero_fraccion
+            ORDER BY importe DESC
+            """,
+            params,
+        )
+
+    def pedimentos(self, rfc=None, desde=None, hasta=None, limite=1000):
+        """Pedimentos cargados, opcionalmente de un RFC (cliente o proveedor)."""
+        condiciones, params = self._rango(desde, hasta)
+        if rfc:
+            condiciones.append(
+                "(p.cliente_rfc = ? OR p.id IN "
+                "(SELECT pedimento_id FROM facturas WHERE proveedor_rfc_tax_id = ?))"
+            )
+            params += [rfc, rfc]
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._consultar(
+            f"""
+            SELECT p.id, p.numero_completo, p.fecha_pago, p.archivo,
+                   p.cliente_rfc, p.cliente_razon_social, p.tipo_de_cambio,
+                   p.valor_aduana,
+                   (SELECT COUNT(*) FROM fracciones f WHERE f.pedimento_id = p.id) AS fracciones,
+                   (SELECT COUNT(*) FROM items i WHERE i.pedimento_id = p.id) AS items
+            FROM pedimentos p
+            {where}
+            ORDER BY p.fecha_pago DESC, p.id DESC
+            LIMIT ?
+            """,
+            (*params, limite),
+        )
+
+    def resumen(self):
+        with self._connect() as con:
+            return {
+                tabla: con.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+                for tabla in ESQUEMA
+            }
+
+
+# ============================================================
+#  PROGRAMA PRINCIPAL
+# ============================================================
+def cargar_directorio(store, xml_paths, lote=50, snapshot_dir=None):
+    """Carga los XML que aún no estén en el almacén (por hash), en
+       transacciones de `lote` pedimentos. Regresa (cargados, omitidos, errores)."""
+    from snapshot import cargar_pedimento
+
+    ya_cargados = store.hashes_cargados()
+    pendientes, cargados, omitidos, errores = [], 0, 0, []
+
+    def escribir():
+        nonlocal cargados
+        if pendientes:
+            store.cargar(pendientes)
+            cargados += len(pendientes)
+            pendientes.clear()
+
+    for xml_path in xml_paths:
+        xml_path = Path(xml_path)
+        contenido = hash_archivo(xml_path)
+        if contenido in ya_cargados:
+            omitidos += 1
+            continue
+        try:
+            if snapshot_dir:
+                pedimento = cargar_pedimento(xml_path, numerico=True, cache_dir=snapshot_dir)
+            else:
+                pedimento = PedimentoStreamBuilder(str(xml_path), numerico=True).build()
+        except Exception as e:
+            logging.error(f"{xml_path.name}: {e}")
+            errores.append((xml_path.name, f"{type(e).__name__}: {e}"))
+            continue
+
+        pendientes.append((pedimento, xml_path.name, contenido))
+        if len(pendientes) >= lote:
+            escribir()
+    escribir()
+    return cargados, omitidos, errores
+
+
+def main():
+    from batch import listar_xmls
+    from snapshot import directorio_usuario
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="directorio o patrón glob de pedimentos XML")
+    parser.add_argument("--db", default="pedimentos.sqlite3", help="base SQLite")
+    parser.add_argument("--lote", type=int, default=50, help="pedimentos por transacción")
+    parser.add_argument("--snapshots", metavar="DIR", nargs="?", const=str(directorio_usuario()), help="construir desde snapshots en DIR (sin DIR, el caché del usuario; privado, ver snapshot.py)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    xml_paths = listar_xmls(args.entrada)
+    if not xml_paths:
+        print(f"❌ No se encontraron XML en: {args.entrada}")
+        raise SystemExit(1)
+
+    store = PedimentoStore(args.db)
+    print(f"📄 Cargando {len(xml_paths)} pedimentos en {args.db}")
+    t0 = time.perf_counter()
+    cargados, omitidos, errores = cargar_directorio(store, xml_paths, args.lote, args.snapshots)
+
+    print("=================================")
+    print(f"Cargados: {cargados}  Ya estaban: {omitidos}  Con error: {len(errores)}")
+    print(f"Tiempo total: {time.perf_counter() - t0:.2f}s")
+    print("TOTALES:", store.resumen())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+# los módulos del proyecto se importan por nombre (como en los scripts)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """App de Flask con sus bases SQLite en un directorio temporal (nada
+       en temp_uploads/). Se importa una sola vez por sesión: app lee las
+       variables PEDIMENTO_* al importarse."""
+    from tests.sinteticos import app_temporal
+    return app_temporal(str(tmp_path_factory.mktemp("app")))
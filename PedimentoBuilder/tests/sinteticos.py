@@ -0,0 +1,226 @@
+# tests/sinteticos.py
+"""
+Pedimentos sintéticos y utilidades compartidas por las pruebas (pytest)
+y los benchmarks (bench.py).
+"""
+
+import os
+import random
+
+
+# ===================================================================
+#  GENERADOR DE PEDIMENTOS SINTÉTICOS
+# ===================================================================
+def nodo(tag, valor):
+    return f"<{tag}>{valor}</{tag}>"
+
+
+def generar_xml(path, n_fracciones=100, items_por_fraccion=5, seed=7):
+    """Escribe un pedimento XML sintético con la estructura que lee el builder."""
+    rnd = random.Random(seed)
+    codigos = [f"ITM-{i:05d}" for i in range(max(1, n_fracciones * items_por_fraccion // 3))]
+
+    with open(path, "w", encoding="utf-8") as out:
+        out.write("<Pedimento>")
+        out.write(nodo("IdPedimento", "1"))
+        out.write(nodo("NumerodePedimento", 5004469 + seed))
+        out.write(nodo("NumerodePedimentoCompleto", f"25 47 3999 {5004469 + seed}"))
+        out.write(nodo("FechaDePagoDelPedimento", "2025-11-20"))
+        out.write(nodo("TipoDeCambio", "18.3345"))
+        out.write(nodo("ValorAduana", "1250000.50"))
+        out.write(nodo("ValorComercialPrecioPagado", "1180000.25"))
+
+        out.write("<Cliente>")
+        out.write(nodo("RazonSocial", "CLIENTE DEMO SA DE CV"))
+        out.write(nodo("RFC", "CDE010101AAA"))
+        out.write(nodo("Ciudad", "MONTERREY"))
+        out.write("</Cliente>")
+
+        out.write("<Facturas>")
+        for n in range(3):
+            out.write("<Factura>")
+            out.write(nodo("Orden", n + 1))
+            out.write(nodo("Folio", f"F-{n:04d}"))
+            out.write(nodo("Fecha", "2025-11-01"))
+            out.write(nodo("MonedaFactura", "USD"))
+            out.write("<ProveedorComprador>")
+            out.write(nodo("RazonSocial", f"PROVEEDOR {n}"))
+            out.write(nodo("RfcTaxId", f"TAX{n:06d}"))
+            out.write(nodo("Pais", "USA"))
+            out.write("</ProveedorComprador>")
+            out.write(nodo("ValorDolares", f"{rnd.uniform(1e4, 1e5):.2f}"))
+            out.write("</Factura>")
+        out.write("</Facturas>")
+
+        out.write("<Fracciones>")
+        for f in range(n_fracciones):
+            out.write("<Fraccion>")
+            out.write(nodo("Orden", f + 1))
+            out.write(nodo("NumeroFraccion", f"{84000000 + f:08d}"))
+            out.write(nodo("Descripcion", f"FRACCION {f}"))
+            out.write(nodo("CantidadFactura", items_por_fraccion))
+            out.write(nodo("DTA", f"{rnd.uniform(10, 500):.2f}"))
+            out.write(nodo("ValorAduana", f"{rnd.uniform(1e3, 1e5):.2f}"))
+            out.write(nodo("ValorDolares", f"{rnd.uniform(100, 5e3):.2f}"))
+            out.write("<Impuestos>")
+            for clave, tasa in (("6", "1"), ("3", "1"), ("2", "0"), ("9", "1")):
+                out.write("<Contribucion>")
+                out.write(nodo("FormaDePago", "0"))
+                out.write(nodo("ClaveImpuesto", clave))
+                out.write(nodo("ConceptoImpuesto", f"IMP{clave}"))
+                out.write(nodo("Importe", f"{rnd.uniform(0, 2e3):.2f}"))
+                out.write(nodo("Tasa", "16"))
+                out.write(nodo("TipoDeTasa", tasa))
+                out.write("</Contribucion>")
+            out.write("</Impuestos>")
+            out.write("<Permisos><PermisoFraccion>")
+            out.write(nodo("Permiso", "NM"))
+            out.write(nodo("NumeroPermiso", f"P{f}"))
+            out.write("</PermisoFraccion></Permisos>")
+            out.write("<Items>")
+            for i in range(items_por_fraccion):
+                cantidad = rnd.randint(1, 50)
+                precio = rnd.uniform(1, 300)
+                out.write("<Item>")
+                out.write(nodo("Orden", i + 1))
+                out.write(nodo("Origen", "USA"))
+                out.write(nodo("Factura", "F-0000"))
+                out.write(nodo("ItemNumber", rnd.choice(codigos)))
+                out.write(nodo("UnidadFactura", "6"))
+                out.write(nodo("UnidadTarifa", "6"))
+                out.write(nodo("UnidadVU", "6"))
+                out.write(nodo("Cantidad", cantidad))
+                out.write(nodo("CantidadTarifa", cantidad))
+                out.write(nodo("CantidadVU", cantidad))
+                out.write(nodo("PrecioUnitario", f"{precio:.4f}"))
+                out.write(nodo("Total", f"{cantidad * precio:.2f}"))
+                out.write(nodo("Fraccion", f"{84000000 + f:08d}"))
+                out.write(nodo("Nico", "00"))
+                out.write("<DescripcionesEspecificas><DescripcionEspecifica>")
+                out.write(nodo("Marca", "ACME"))
+                out.write(nodo("Modelo", f"M-{i}"))
+                out.write("</DescripcionEspecifica></DescripcionesEspecificas>")
+                out.write("</Item>")
+            out.write("</Items>")
+            out.write("</Fraccion>")
+        out.write("</Fracciones>")
+
+        out.write("<Identificadores><IdentificadorPedimento>")
+        out.write(nodo("Identificador", "ED"))
+        out.write(nodo("ComplementoUno", "0000"))
+        out.write("</IdentificadorPedimento></Identificadores>")
+
+        out.write("<Incrementables>")
+        for n in range(3):
+            out.write("<OtrosPagos>")
+            out.write(nodo("Id", n + 1))
+            out.write(nodo("Concepto", f"FLETE {n}"))
+            out.write(nodo("ImporteMN", f"{rnd.uniform(1e3, 1e4):.2f}"))
+            out.write("</OtrosPagos>")
+        out.write("</Incrementables>")
+
+        out.write("<Impuestos>")
+        for clave, importe in (("1", "4521.00"), ("15", "290.00"), ("23", "46.00")):
+            out.write("<Contribucion>")
+            out.write(nodo("ClaveImpuesto", clave))
+            out.write(nodo("Importe", importe))
+            out.write(nodo("TipoDeTasa", "1"))
+            out.write("</Contribucion>")
+        out.write("</Impuestos>")
+        out.write("</Pedimento>")
+
+    return path
+
+
+GENERALES = (("1", "452.00"), ("15", "29.00"))
+
+
+def escribir_pedimento(path, fracciones, generales=GENERALES):
+    """XML mínimo con las fracciones dadas: [(claves, items)] con claves
+       [(clave, importe)] e items [(codigo, cantidad, precio unitario)];
+       generales: contribuciones del pedimento [(clave, importe)]."""
+    partes = ["<Pedimento>"]
+    partes += [
+        nodo("NumerodePedimento", "5004469"),
+        nodo("NumerodePedimentoCompleto", "25 47 3999 5004469"),
+        nodo("FechaDePagoDelPedimento", "2025-11-20"),
+        nodo("TipoDeCambio", "18.3345"),
+        nodo("ValorAduana", "125000.50"),
+        nodo("ValorComercialPrecioPagado", "118000.25"),
+    ]
+    partes.append("<Fracciones>")
+    for f, (claves, items) in enumerate(fracciones):
+        partes.append("<Fraccion>")
+        partes += [
+            nodo("NumeroFraccion", f"{84000000 + f:08d}"),
+            nodo("DTA", f"{15.5 + f:.2f}"),
+            nodo("ValorAduana", "1000.00"),
+        ]
+        partes.append("<Impuestos>")
+        for clave, importe in claves:
+            partes.append("<Contribucion>")
+            partes += [nodo("ClaveImpuesto", clave), nodo("Importe", importe), nodo("TipoDeTasa", "1")]
+            partes.append("</Contribucion>")
+        partes.append("</Impuestos>")
+        partes.append("<Items>")
+        for codigo, cantidad, precio in items:
+            partes.append("<Item>")
+            partes += [
+                nodo("ItemNumber", codigo),
+                nodo("Cantidad", cantidad),
+                nodo("PrecioUnitario", f"{precio:.4f}"),
+                nodo("Total", f"{cantidad * precio:.2f}"),
+            ]
+            partes.append("</Item>")
+        partes.append("</Items>")
+        partes.append("</Fraccion>")
+    partes.append("</Fracciones>")
+    partes.append("<Impuestos>")
+    for clave, importe in generales:
+        partes.append("<Contribucion>")
+        partes += [nodo("ClaveImpuesto", clave), nodo("Importe", importe), nodo("TipoDeTasa", "1")]
+        partes.append("</Contribucion>")
+    partes.append("</Impuestos>")
+    partes.append("</Pedimento>")
+
+    path.write_text("".join(partes), encoding="utf-8")
+    return str(path)
+
+
+# ===================================================================
+#  UTILIDADES
+# ===================================================================
+def mismo_objeto(a, b):
+    """Compara dos grafos de dominio atributo por atributo."""
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(mismo_objeto(x, y) for x, y in zip(a, b))
+    if hasattr(type(a), "__slots__"):
+        return type(a) is type(b) and all(mismo_objeto(getattr(a, k), getattr(b, k)) for k in type(a).__slots__)
+    return a == b
+
+
+def mismo_resultado(a, b):
+    """Igualdad exacta de dos resultados de costeo, incluido el orden de claves."""
+    if a["pedimento"] != b["pedimento"] or len(a["items"]) != len(b["items"]):
+        return False
+    return all(
+        x == y and list(x) == list(y)
+        for x, y in zip(a["items"], b["items"])
+    )
+
+
+def app_temporal(tmp):
+    """La app de Flask con sus bases SQLite (trabajos, historial y
+       almacén) en tmp, para que importarla no cree archivos en
+       temp_uploads/, y sin caché en memoria para que todas las peticiones
+       costeen de verdad. Las variables se leen al importar app."""
+    for variable, nombre in (
+        ("PEDIMENTO_JOBS_DB", "jobs.sqlite3"),
+        ("PEDIMENTO_HISTORIAL_DB", "historial.sqlite3"),
+        ("PEDIMENTO_STORE_DB", "pedimentos.sqlite3"),
+    ):
+        os.environ[variable] = os.path.join(tmp, nombre)
+    os.environ["PEDIMENTO_CACHE_MAX_ITEMS"] = "0"
+    os.environ.pop("PEDIMENTO_CACHE_DIR", None)
+    from app import app
+    return app
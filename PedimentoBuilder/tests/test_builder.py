@@ -0,0 +1,45 @@
+# tests/test_builder.py
+
+from pathlib import Path
+
+import pytest
+
+from builder import PedimentoBuilder, PedimentoStreamBuilder
+from tests.sinteticos import generar_xml, mismo_objeto
+
+DATOS = Path(__file__).parent / "datos"
+
+
+def construir_fluido(xml_source, numerico):
+    return (
+        PedimentoBuilder(xml_source, numerico=numerico)
+        .build_header()
+        .build_cliente()
+        .build_facturas()
+        .build_fracciones()
+        .build_identificadores()
+        .build_incrementables()
+        .build_contribuciones_generales()
+        .build()
+    )
+
+
+def xmls_de_prueba(tmp_path):
+    yield from sorted(str(p) for p in DATOS.glob("*.xml"))
+    for seed, (fracciones, items) in enumerate(((1, 1), (25, 4), (60, 2))):
+        yield generar_xml(str(tmp_path / f"s{seed}.xml"), fracciones, items, seed=seed)
+
+
+@pytest.mark.parametrize("numerico", [False, True])
+def test_streaming_igual_que_fluido(tmp_path, numerico):
+    for xml_path in xmls_de_prueba(tmp_path):
+        fluido = construir_fluido(xml_path, numerico)
+        stream = PedimentoStreamBuilder(xml_path, numerico=numerico).build()
+        assert mismo_objeto(fluido, stream), xml_path
+
+
+def test_streaming_desde_bytes(tmp_path):
+    xml_path = generar_xml(str(tmp_path / "b.xml"), 10, 3)
+    with open(xml_path, "rb") as f:
+        desde_bytes = PedimentoStreamBuilder(f.read(), numerico=True).build()
+    assert mismo_objeto(construir_fluido(xml_path, True), desde_bytes)
@@ -0,0 +1,96 @@
+# tests/test_cache.py
+
+import os
+
+import cache
+from cache import ResultCache, clave_resultado, version_reglas
+
+XML = b"<Pedimento><NumerodePedimento>1</NumerodePedimento></Pedimento>"
+
+
+class Reloj:
+    """time.time controlable para probar el TTL."""
+
+    def __init__(self, ahora=1_000_000.0):
+        self.ahora = ahora
+
+    def __call__(self):
+        return self.ahora
+
+
+def test_ttl_expira_en_memoria(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache.time, "time", reloj)
+    c = ResultCache(max_items=10, ttl=60)
+
+    c.put("a", {"n": 1})
+    reloj.ahora += 59
+    assert c.get("a") == {"n": 1}
+    reloj.ahora += 2
+    assert c.get("a") is None
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_ttl_cero_no_expira(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache.time, "time", reloj)
+    c = ResultCache(ttl=0)
+    c.put("a", 1)
+    reloj.ahora += 10 ** 9
+    assert c.get("a") == 1
+
+
+def test_lru_saca_la_menos_usada():
+    c = ResultCache(max_items=2, ttl=0)
+    c.put("a", 1)
+    c.put("b", 2)
+    assert c.get("a") == 1        # "a" pasa a ser la más reciente
+    c.put("c", 3)                 # sale "b"
+    assert c.get("b") is None
+    assert c.get("a") == 1
+    assert c.get("c") == 3
+    assert c.stats()["items_memoria"] == 2
+
+
+def test_disco_sobrevive_y_expira(tmp_path, monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(cache.time, "time", reloj)
+    disco = str(tmp_path / "cache")
+
+    ResultCache(ttl=60, disk_dir=disco).put("a", {"n": 1})
+    nueva = ResultCache(ttl=60, disk_dir=disco)
+    assert nueva.get("a") == {"n": 1}
+    assert nueva.disk_hits == 1
+
+    reloj.ahora += 61
+    assert ResultCache(ttl=60, disk_dir=disco).get("a") is None
+    assert not os.listdir(disco)   # la entrada vencida se borra
+
+
+def test_cambio_de_reglas_invalida_la_clave(monkeypatch):
+    c = ResultCache(ttl=0)
+    clave = clave_resultado(XML)
+    c.put(clave, {"n": 1})
+    assert c.get(clave_resultado(XML)) == {"n": 1}
+
+    version = version_reglas()
+    monkeypatch.setitem(cache.MAP_CLAVE_IMPUESTO, "99", "OTRO")
+    assert version_reglas() != version
+    assert c.get(clave_resultado(XML)) is None
+
+    monkeypatch.undo()
+    monkeypatch.setitem(cache.BASES_PRORRATEO_GENERAL, "DTA", "valor_aduana")
+    assert c.get(clave_resultado(XML)) is None
+
+
+def test_escritura_atomica_no_deja_temporales_si_falla(tmp_path):
+    destino = tmp_path / "x.json"
+    destino.write_text("viejo")
+    try:
+        with cache.escritura_atomica(destino) as f:
+            f.write("nuevo a medias")
+            raise RuntimeError("falla")
+    except RuntimeError:
+        pass
+    assert destino.read_text() == "viejo"
+    assert os.listdir(tmp_path) == ["x.json"]
@@ -0,0 +1,50 @@
+# tests/test_concurrencia.py
+
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.sinteticos import generar_xml
+from processor import PedimentoProcessor
+
+
+def test_peticiones_en_paralelo_igual_que_secuencial(app, tmp_path):
+    """Pedimentos distintos enviados en paralelo al endpoint: cada
+       respuesta debe ser igual a su resultado secuencial (sin estado
+       compartido entre peticiones)."""
+    xmls = []
+    for n in range(4):
+        path = generar_xml(str(tmp_path / f"p{n}.xml"), 20 + n * 7, 3, seed=n)
+        with open(path, "rb") as f:
+            xmls.append(f.read())
+
+    esperados = [
+        json.loads(json.dumps(PedimentoProcessor().procesar_pedimento(x)))
+        for x in xmls
+    ]
+
+    def subir(i):
+        r = app.test_client().post(
+            "/api/pedimento/procesar",
+            data={"file": (io.BytesIO(xmls[i]), f"p{i}.xml")},
+        )
+        return i, r.status_code, r.get_json()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        respuestas = list(pool.map(subir, [i % len(xmls) for i in range(3 * len(xmls))]))
+
+    for i, status, body in respuestas:
+        assert status == 200
+        assert body["data"] == esperados[i]
+
+
+def test_bases_fuera_de_temp_uploads(app):
+    import app as modulo
+
+    for db in (
+        modulo.job_runner.store.db_path,
+        modulo.historial_costos.db_path,
+        modulo.pedimento_store.db_path,
+    ):
+        assert "temp_uploads" not in os.path.abspath(db).split(os.sep)
@@ -0,0 +1,84 @@
+# tests/test_exporter.py
+
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from builder import PedimentoStreamBuilder
+from exporter import exportar_excel_pedimento_premium
+
+DATOS = Path(__file__).parent / "datos"
+
+
+@pytest.fixture
+def libro(tmp_path):
+    """Exporta con DataFrames chicos y regresa (libro reabierto, costos, contribuciones)."""
+    pedimento = PedimentoStreamBuilder(str(DATOS / "sintetico.xml")).build()
+    df_costos = pd.DataFrame({
+        "item_number": [f"ITM-{i}" for i in range(5)],
+        "cantidad": [1.0, 2.5, 3.0, 4.0, 5.0],
+        "valor_aduana": [10.0, 20.0, 30.0, 40.0, 50.0],
+        "dta_prorrateado": [0.5, 0.25, 0.0, 1.0, 2.0],
+        "costo_total_item": [11.5, 22.75, 33.0, 45.0, 57.0],
+        "proveedor": ["PROVEEDOR 0", "PROVEEDOR 1", "PROVEEDOR 2", "PROVEEDOR 0", "UN PROVEEDOR CON NOMBRE LARGO"],
+    })
+    df_contrib = pd.DataFrame({
+        "item_number": ["ITM-0", "ITM-1"],
+        "concepto_impuesto": ["IGI", "IVA"],
+        "importe_contribucion": [3.25, 16.0],
+    })
+    salida = tmp_path / "premium.xlsx"
+    exportar_excel_pedimento_premium(pedimento, df_costos, df_contrib, str(salida))
+    return openpyxl.load_workbook(salida), pedimento, df_costos, df_contrib
+
+
+def valores(ws):
+    return [list(fila) for fila in ws.iter_rows(values_only=True)]
+
+
+def test_portada(libro):
+    wb, pedimento, _, _ = libro
+    ws = wb["Portada"]
+    assert wb.sheetnames == ["Portada", "Costos por Item", "Contribuciones"]
+
+    assert [str(r) for r in ws.merged_cells.ranges] == ["A1:D1"]
+    assert ws["A1"].value == "REPORTE DE COSTOS POR PEDIMENTO"
+    assert ws["A1"].font.bold and ws["A1"].alignment.horizontal == "center"
+    assert ws["B3"].value == pedimento.numero_completo
+    assert ws["B5"].value == pedimento.facturas[0].proveedor_comprador.razon_social
+    assert ws.column_dimensions["D"].width == 35
+
+
+def test_cada_fila_conserva_sus_valores(libro):
+    """Las celdas de datos se reutilizan por columna: cada fila escrita
+       debe quedar con sus propios valores y estilo."""
+    wb, _, df_costos, df_contrib = libro
+    ws = wb["Costos por Item"]
+    filas = valores(ws)
+
+    assert filas[0] == list(df_costos.columns)
+    assert filas[1:-1] == [list(r) for r in df_costos.itertuples(index=False)]
+    assert filas[-1] == ["TOTAL GENERAL:", None, None, None, "=SUM(E2:E6)", None]
+
+    assert {c.style for c in ws[1]} == {"encabezado"}
+    assert all(c.style == "dato" and c.border.left.style == "thin" for fila in ws.iter_rows(min_row=2, max_row=6) for c in fila)
+    assert ws["A7"].style == "total" and ws["E7"].style == "total_borde"
+    # texto más largo + 2
+    assert ws.column_dimensions["F"].width == len("UN PROVEEDOR CON NOMBRE LARGO") + 2
+
+    contrib = valores(wb["Contribuciones"])
+    assert contrib == [list(df_contrib.columns)] + [list(r) for r in df_contrib.itertuples(index=False)]
+
+
+def test_tabla_vacia(tmp_path):
+    pedimento = PedimentoStreamBuilder(str(DATOS / "cantidad_cero.xml")).build()
+    vacio = pd.DataFrame(columns=["item_number", "cantidad"])
+    salida = tmp_path / "vacio.xlsx"
+    exportar_excel_pedimento_premium(pedimento, vacio, vacio, str(salida))
+
+    wb = openpyxl.load_workbook(salida)
+    assert valores(wb["Contribuciones"]) == [["item_number", "cantidad"]]
+    # sin facturas no hay proveedor
+    assert wb["Portada"]["B5"].value is None
@@ -0,0 +1,110 @@
+# tests/test_historial.py
+
+import pytest
+
+from historial import HistorialCostos
+
+
+def resultado(numero, fecha, *items):
+    """Resultado de costear() reducido a lo que usa el historial:
+       items [(codigo, cantidad, costo_total)]."""
+    return {
+        "pedimento": {"numero_completo": numero, "fecha_pago": fecha},
+        "items": [
+            {
+                "codigo": codigo,
+                "cantidad": cantidad,
+                "costo_total": costo_total,
+                "costo_final": costo_total / cantidad if cantidad else 0,
+                "tipo_de_cambio": 18.5,
+            }
+            for codigo, cantidad, costo_total in items
+        ],
+    }
+
+
+@pytest.fixture
+def historial(tmp_path):
+    return HistorialCostos(str(tmp_path / "historial.sqlite3"))
+
+
+def test_acumulados_y_ultimo_costo(historial):
+    # se registran fuera de orden: el último costo es el de fecha mayor
+    historial.registrar(resultado("P2", "2025-03-01", ("A", 10, 200.0), ("B", 1, 5.0)))
+    historial.registrar(resultado("P1", "2025-01-01", ("A", 30, 300.0)))
+
+    costos = historial.costos("A")
+    assert costos["pedimentos"] == 2
+    assert costos["cantidad_total"] == 40
+    assert costos["costo_total"] == 500.0
+    assert costos["promedio_ponderado"] == pytest.approx(12.5)
+    assert costos["ultimo_costo"] == {"costo_final": 20.0, "fecha": "2025-03-01", "numero_completo": "P2"}
+    assert [r["numero_completo"] for r in costos["serie"]] == ["P1", "P2"]
+    assert historial.costos("NO-EXISTE") is None
+
+
+def test_reprocesar_reemplaza_sin_duplicar(historial):
+    historial.registrar(resultado("P1", "2025-01-01", ("A", 10, 100.0)))
+    historial.registrar(resultado("P2", "2025-02-01", ("A", 10, 300.0)))
+    historial.registrar(resultado("P2", "2025-02-01", ("A", 20, 500.0)))
+    historial.registrar(resultado("P2", "2025-02-01", ("A", 20, 500.0)))
+
+    costos = historial.costos("A")
+    assert costos["pedimentos"] == 2
+    assert costos["cantidad_total"] == 30
+    assert costos["costo_total"] == 600.0
+    assert [(r["numero_completo"], r["cantidad"]) for r in costos["serie"]] == [("P1", 10), ("P2", 20)]
+    assert costos["ultimo_costo"]["costo_final"] == 25.0
+
+
+def test_reprocesar_sin_un_codigo_lo_quita(historial):
+    historial.registrar(resultado("P1", "2025-01-01", ("A", 10, 100.0)))
+    historial.registrar(resultado("P2", "2025-02-01", ("A", 5, 100.0), ("B", 2, 8.0)))
+    historial.registrar(resultado("P2", "2025-02-01", ("B", 2, 8.0)))
+
+    costos = historial.costos("A")
+    assert costos["pedimentos"] == 1
+    assert costos["costo_total"] == 100.0
+    # el último era el pedimento reprocesado: vuelve al anterior
+    assert costos["ultimo_costo"]["numero_completo"] == "P1"
+
+    historial.registrar(resultado("P2", "2025-02-01", ("A", 1, 1.0)))
+    assert historial.costos("B") is None
+
+
+def test_reprocesar_con_otra_fecha_recalcula_el_ultimo(historial):
+    historial.registrar(resultado("P1", "2025-01-01", ("A", 10, 100.0)))
+    historial.registrar(resultado("P2", "2025-02-01", ("A", 10, 300.0)))
+    historial.registrar(resultado("P2", "2024-12-01", ("A", 10, 300.0)))
+
+    ultimo = historial.costos("A")["ultimo_costo"]
+    assert (ultimo["numero_completo"], ultimo["fecha"]) == ("P1", "2025-01-01")
+
+
+def test_limite_conserva_los_mas_recientes(historial):
+    historial.registrar_lote([
+        resultado(f"P{mes:02d}", f"2025-{mes:02d}-01", ("A", 1, float(mes)))
+        for mes in (5, 1, 12, 3, 8, 10)
+    ])
+    historial.registrar(resultado("SIN_FECHA", "", ("A", 1, 99.0)))
+
+    serie = historial.costos("A", limite=3)["serie"]
+    assert [r["fecha"] for r in serie] == ["2025-08-01", "2025-10-01", "2025-12-01"]
+
+    completa = historial.costos("A")["serie"]
+    # sin fecha cuenta como la más antigua
+    assert [r["numero_completo"] for r in completa] == ["SIN_FECHA", "P01", "P03", "P05", "P08", "P10", "P12"]
+
+    rango = historial.costos("A", desde="2025-03-01", hasta="2025-08-31", limite=2)["serie"]
+    assert [r["fecha"] for r in rango] == ["2025-05-01", "2025-08-01"]
+    # los acumulados no dependen del recorte
+    assert historial.costos("A", limite=1)["pedimentos"] == 7
+
+
+def test_fecha_dd_mm_aaaa_y_sin_numero(historial):
+    assert historial.registrar(resultado("", "2025-01-01", ("A", 1, 1.0))) == 0
+    historial.registrar(resultado("P1", "20/11/2025", ("A", 1, 1.0), ("", 1, 1.0)))
+
+    costos = historial.costos("A")
+    assert costos["pedimentos"] == 1
+    assert costos["serie"][0]["fecha"] == "2025-11-20"
@@ -0,0 +1,102 @@
+# tests/test_jobs.py
+
+import os
+import sqlite3
+import time
+
+from jobs import ERROR, JobRunner, JobStore, PENDIENTE, PROCESANDO, TERMINADO
+
+
+def _envejecer(store, job_id, segundos):
+    with sqlite3.connect(store.db_path) as con:
+        con.execute(
+            "UPDATE jobs SET creado = creado - ?, actualizado = actualizado - ? WHERE id = ?",
+            (segundos, segundos, job_id),
+        )
+
+
+def test_solo_expiran_los_trabajos_terminados(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), ttl=60, stale_after=30)
+
+    en_cola = store.crear()
+    terminado = store.crear()
+    store.actualizar(terminado, estado=TERMINADO, resultado={"items": []})
+    fallido = store.crear()
+    store.actualizar(fallido, estado=ERROR, error="x")
+    for job_id in (en_cola, terminado, fallido):
+        _envejecer(store, job_id, 120)
+
+    # el polling ya no ve los terminados vencidos, pero sí el de la cola
+    assert store.obtener(terminado) is None
+    assert store.obtener(fallido) is None
+    assert store.obtener(en_cola)["estado"] == PENDIENTE
+
+    # la purga de crear() tampoco borra el de la cola: su resultado llega
+    store.crear()
+    store.actualizar(en_cola, estado=TERMINADO, resultado={"items": [1]})
+    assert store.obtener(en_cola)["resultado"] == {"items": [1]}
+
+
+def test_procesando_sin_latido_se_reporta_interrumpido(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), ttl=60, stale_after=30)
+    job_id = store.crear()
+    store.actualizar(job_id, estado=PROCESANDO)
+    _envejecer(store, job_id, 45)
+    assert store.obtener(job_id)["estado"] == ERROR
+
+    # muerto desde hace más de ttl + stale_after: se purga
+    _envejecer(store, job_id, 60)
+    store.crear()
+    assert store.obtener(job_id) is None
+
+
+def test_marcar_interrumpidos_solo_del_pid(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.crear()
+    assert store.marcar_interrumpidos(-1) == 0
+    assert store.marcar_interrumpidos(os.getpid()) == 1
+    assert store.obtener(job_id)["estado"] == ERROR
+
+
+class ProcessorLento:
+    """Processor de prueba: costear tarda segundos."""
+
+    def __init__(self, segundos):
+        self.segundos = segundos
+
+    def load_pedimento(self, xml_source):
+        return xml_source
+
+    def total_fracciones(self, pedimento):
+        return 1
+
+    def costear(self, pedimento, progreso=None):
+        time.sleep(self.segundos)
+        return {"pedimento": {"total_fracciones": 1}, "items": []}
+
+
+def test_shutdown_termina_los_trabajos_dentro_del_plazo(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, ProcessorLento(0.3), workers=1)
+    en_proceso = runner.submit(b"<Pedimento/>")
+    en_cola = runner.submit(b"<Pedimento/>")
+
+    latidos = []
+    runner.shutdown(espera=10, latido=lambda: latidos.append(1))
+
+    assert store.obtener(en_proceso)["estado"] == TERMINADO
+    assert store.obtener(en_cola)["estado"] == TERMINADO
+    assert latidos
+
+
+def test_shutdown_marca_error_lo_que_no_alcanza(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, ProcessorLento(1.0), workers=1)
+    en_proceso = runner.submit(b"<Pedimento/>")
+    en_cola = runner.submit(b"<Pedimento/>")
+    time.sleep(0.1)
+
+    runner.shutdown(espera=0.2)
+
+    assert store.obtener(en_proceso)["estado"] == ERROR
+    assert store.obtener(en_cola)["estado"] == ERROR
@@ -0,0 +1,112 @@
+# tests/test_manifest.py
+
+import os
+
+import cache
+from batch import procesar_incremental
+from manifest import Manifest, hash_archivo
+from tests.sinteticos import generar_xml
+
+
+def preparar(tmp_path, n=3):
+    """n XML chicos y un manifest con todos registrados (Excel incluido)."""
+    entrada = tmp_path / "Pedimentos"
+    entrada.mkdir()
+    xmls = [str(generar_xml(entrada / f"P{i}.xml", n_fracciones=3, items_por_fraccion=2, seed=i)) for i in range(n)]
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    for xml in xmls:
+        salida = tmp_path / f"Costo {os.path.basename(xml)}.xlsx"
+        salida.write_bytes(b"xlsx")
+        manifest.registrar(xml, hash_archivo(xml), str(salida))
+    manifest.guardar()
+    return xmls, manifest
+
+
+def test_sin_cambios_todo_vigente(tmp_path):
+    xmls, _ = preparar(tmp_path)
+    pendientes, vigentes, eliminados = Manifest(str(tmp_path / "manifest.json")).planear(xmls)
+    assert pendientes == []
+    assert [p for p, _ in vigentes] == xmls
+    assert eliminados == []
+
+
+def test_mtime_distinto_mismo_contenido_sigue_vigente(tmp_path):
+    xmls, manifest = preparar(tmp_path)
+    stat = os.stat(xmls[0])
+    os.utime(xmls[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    pendientes, vigentes, _ = manifest.planear(xmls)
+    assert pendientes == []
+    assert len(vigentes) == 3
+    # el mtime nuevo se guarda para no volver a calcular el hash
+    manifest.guardar()
+    assert Manifest(manifest.path).archivos[Manifest.clave(xmls[0])]["mtime_ns"] == stat.st_mtime_ns + 5_000_000_000
+
+
+def test_contenido_modificado_se_recostea(tmp_path):
+    xmls, manifest = preparar(tmp_path)
+    generar_xml(xmls[1], n_fracciones=4, items_por_fraccion=2, seed=1)
+
+    pendientes, vigentes, _ = manifest.planear(xmls)
+    assert pendientes == [(xmls[1], hash_archivo(xmls[1]))]
+    assert [p for p, _ in vigentes] == [xmls[0], xmls[2]]
+
+
+def test_cambio_de_reglas_recostea_todo(tmp_path, monkeypatch):
+    xmls, manifest = preparar(tmp_path)
+    monkeypatch.setitem(cache.MAP_CLAVE_IMPUESTO, "99", "OTRO")
+
+    pendientes, vigentes, _ = manifest.planear(xmls)
+    assert [p for p, _ in pendientes] == xmls
+    assert vigentes == []
+
+
+def test_salida_borrada_se_recostea(tmp_path):
+    xmls, manifest = preparar(tmp_path)
+    os.unlink(manifest.archivos[Manifest.clave(xmls[2])]["salida"])
+
+    pendientes, _, _ = manifest.planear(xmls)
+    assert [p for p, _ in pendientes] == [xmls[2]]
+
+
+def test_archivo_borrado_queda_en_eliminados(tmp_path):
+    xmls, manifest = preparar(tmp_path)
+    os.unlink(xmls[0])
+
+    _, vigentes, eliminados = manifest.planear(xmls[1:])
+    assert len(vigentes) == 2
+    assert eliminados == [Manifest.clave(xmls[0])]
+    # un glob que no incluye un archivo existente no lo elimina
+    assert manifest.planear(xmls[2:])[2] == [Manifest.clave(xmls[0])]
+
+
+def test_guardar_conserva_lo_de_otro_proceso(tmp_path):
+    xmls, _ = preparar(tmp_path, n=2)
+    a = Manifest(str(tmp_path / "manifest.json"))
+    b = Manifest(str(tmp_path / "manifest.json"))
+    a.eliminar(Manifest.clave(xmls[0]))
+    b.registrar(xmls[0], "otro", "otra salida")
+    b.guardar()
+    a.guardar()
+    # a solo aplica su eliminación; la entrada de xmls[1] sigue ahí
+    assert set(Manifest(a.path).archivos) == {Manifest.clave(xmls[1])}
+
+
+def test_procesar_incremental_solo_costea_lo_nuevo(tmp_path):
+    xmls, _ = preparar(tmp_path)
+    salida = str(tmp_path / "salida")
+
+    primera = procesar_incremental(xmls, salida, workers=1)
+    assert all(r["ok"] and not r.get("reutilizado") for r in primera)
+
+    generar_xml(xmls[1], n_fracciones=4, items_por_fraccion=2, seed=1)
+    segunda = procesar_incremental(xmls, salida, workers=1)
+    assert [bool(r.get("reutilizado")) for r in segunda] == [True, False, True]
+    assert segunda[0]["resultado"] == primera[0]["resultado"]
+    assert segunda[1]["resultado"]["pedimento"]["total_fracciones"] == 4
+
+    os.unlink(xmls[2])
+    tercera = procesar_incremental(xmls[:2], salida, workers=1)
+    assert all(r.get("reutilizado") for r in tercera)
+    assert not os.path.exists(segunda[2]["salida"])
+    assert Manifest.clave(xmls[2]) not in Manifest(os.path.join(salida, ".manifest.json")).archivos
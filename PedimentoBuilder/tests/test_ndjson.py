@@ -0,0 +1,32 @@
+# tests/test_ndjson.py
+
+import json
+
+from tests.sinteticos import generar_xml
+
+
+def test_ndjson_igual_que_json_y_registra_historial(app, tmp_path):
+    import app as modulo
+
+    with open(generar_xml(str(tmp_path / "n.xml"), 30, 3, seed=41), "rb") as f:
+        xml = f.read()
+    cliente = app.test_client()
+
+    r = cliente.post("/api/pedimento/procesar?formato=ndjson", data=xml, content_type="application/xml")
+    lineas = [json.loads(linea) for linea in r.data.splitlines()]
+    assert r.mimetype == "application/x-ndjson"
+
+    # el stream registra el historial por sí solo
+    numero = lineas[0]["data"]["numero_completo"]
+    item = lineas[1]["data"]
+    serie = [
+        fila for fila in modulo.historial_costos.costos(item["codigo"])["serie"]
+        if fila["numero_completo"] == numero
+    ]
+    assert len(serie) == 1
+    assert serie[0]["costo_final"] == item["costo_final"]
+
+    completo = cliente.post("/api/pedimento/procesar", data=xml, content_type="application/xml").get_json()["data"]
+    assert lineas[0] == {"tipo": "pedimento", "data": completo["pedimento"]}
+    assert [linea["data"] for linea in lineas[1:-1]] == completo["items"]
+    assert lineas[-1] == {"tipo": "fin", "items": len(completo["items"])}
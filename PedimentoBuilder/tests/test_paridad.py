@@ -0,0 +1,86 @@
+# tests/test_paridad.py
+
+import json
+from pathlib import Path
+
+import pytest
+
+from tests.sinteticos import escribir_pedimento, mismo_resultado
+from vectorized import MOTORES
+
+# XML de prueba y su resultado con el PedimentoProcessor original (app.py
+# del commit base, antes de los motores nuevos y de prorrateo.py)
+DATOS = Path(__file__).parent / "datos"
+BASE = sorted(p.name[:-len(".base.json")] for p in DATOS.glob("*.base.json"))
+
+# (clave de impuesto, importe) por fracción; tipo de tasa 1 (se suman)
+IGI_IVA = (("6", "120.50"), ("3", "310.25"))
+OTRAS = (("9", "45.10"), ("3", "75.00"), ("7", "12.30"))
+
+
+def costear_con(motor, xml_path):
+    processor = MOTORES[motor]()
+    pedimento = processor.load_pedimento(xml_path)
+    assert pedimento is not None
+    return processor.costear(pedimento)
+
+
+CASOS = {
+    "sin_items": [
+        (IGI_IVA, []),
+        (OTRAS, []),
+    ],
+    "fraccion_sin_items": [
+        (IGI_IVA, [("A-1", 10, 2.5), ("B-1", 4, 12.0)]),
+        (OTRAS, []),
+    ],
+    "cantidad_cero": [
+        (IGI_IVA, [("A-1", 0, 2.5), ("B-1", 4, 12.0)]),
+        (OTRAS, [("C-1", 0, 7.0), ("C-1", 0, 3.0), ("B-1", 0, 1.0)]),
+    ],
+    # mismo código en fracciones con distintas claves de contribución:
+    # las claves que no trae su primer item se agregan en orden de aparición
+    "codigo_repetido_otras_claves": [
+        (IGI_IVA, [("A-1", 10, 2.5), ("B-1", 3, 8.0)]),
+        (OTRAS, [("B-1", 5, 1.5), ("A-1", 2, 4.0), ("C-1", 1, 9.0)]),
+        ((("7", "3.00"), ("6", "8.00")), [("C-1", 6, 2.0), ("A-1", 1, 1.0)]),
+        ((), [("B-1", 2, 2.0)]),
+    ],
+}
+
+
+@pytest.mark.parametrize("motor", ["vectorizado", "columnar"])
+@pytest.mark.parametrize("caso", sorted(CASOS))
+def test_misma_salida_que_dicts(tmp_path, caso, motor):
+    xml_path = escribir_pedimento(tmp_path / f"{caso}.xml", CASOS[caso])
+    esperado = costear_con("dicts", xml_path)
+    resultado = costear_con(motor, xml_path)
+    assert mismo_resultado(esperado, resultado), (esperado, resultado)
+
+
+def test_sin_items_no_regresa_items(tmp_path):
+    xml_path = escribir_pedimento(tmp_path / "vacio.xml", CASOS["sin_items"])
+    for motor in MOTORES:
+        resultado = costear_con(motor, xml_path)
+        assert resultado["items"] == []
+        assert resultado["pedimento"]["total_fracciones"] == 2
+
+
+def test_cantidad_cero_costo_final_cero(tmp_path):
+    xml_path = escribir_pedimento(tmp_path / "cero.xml", CASOS["cantidad_cero"])
+    for motor in MOTORES:
+        items = {item["codigo"]: item for item in costear_con(motor, xml_path)["items"]}
+        assert items["C-1"]["cantidad"] == 0
+        assert items["C-1"]["costo_final"] == 0
+
+
+@pytest.mark.parametrize("motor", sorted(MOTORES))
+@pytest.mark.parametrize("nombre", BASE)
+def test_misma_salida_que_el_costeo_original(nombre, motor):
+    """Contra resultados guardados, no contra otro motor nuevo: un error
+       compartido (p. ej. en prorratear) no pasa desapercibido."""
+    esperado = json.loads((DATOS / f"{nombre}.base.json").read_text(encoding="utf-8"))
+    resultado = json.loads(json.dumps(costear_con(motor, str(DATOS / f"{nombre}.xml"))))
+    # fecha_pago se agregó al encabezado después (historial de costos)
+    resultado["pedimento"].pop("fecha_pago")
+    assert mismo_resultado(esperado, resultado)
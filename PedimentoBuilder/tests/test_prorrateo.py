@@ -0,0 +1,50 @@
+# tests/test_prorrateo.py
+
+import numpy as np
+import pytest
+
+from prorrateo import factores, prorratear
+
+# importes cuya suma secuencial difiere en el último bit de la suma por
+# concepto: (671.82 + 3818.87) + (4237.17 + 1275.35)
+CONCEPTOS = ["DTA", "PRV", "DTA", "PRV"]
+IMPORTES = [671.82, 4237.17, 3818.87, 1275.35]
+
+
+def test_total_con_una_base_es_el_de_la_suma_secuencial():
+    cantidad = np.array([3.0, 7.0, 11.0])
+    total_secuencial = 0
+    for importe in IMPORTES:
+        total_secuencial += importe
+
+    asignado, desglose = prorratear(
+        {"cantidad": cantidad}, CONCEPTOS, IMPORTES,
+        base_default="cantidad", por_concepto=True, total_importes=total_secuencial,
+    )
+
+    # igual bit a bit que el costeo original: total * (cantidad / suma)
+    assert asignado.tolist() == [total_secuencial * (c / 21.0) for c in cantidad.tolist()]
+    assert desglose["DTA"].tolist() == (factores(cantidad) * (671.82 + 3818.87)).tolist()
+
+
+def test_varias_bases_reparten_cada_concepto_con_la_suya():
+    bases = {"cantidad": [1.0, 3.0], "valor_aduana": [100.0, 100.0]}
+    asignado, desglose = prorratear(
+        bases, ["DTA", "PRV"], [40.0, 10.0],
+        reglas={"PRV": "valor_aduana"}, base_default="cantidad",
+        por_concepto=True, total_importes=50.0,
+    )
+    assert desglose["DTA"].tolist() == [10.0, 30.0]
+    assert desglose["PRV"].tolist() == [5.0, 5.0]
+    assert asignado.tolist() == [15.0, 35.0]
+
+
+def test_base_no_disponible_es_error():
+    with pytest.raises(ValueError, match="peso"):
+        prorratear({"cantidad": [1.0]}, ["FLETES"], [10.0], reglas={"FLETES": "peso"})
+
+
+def test_sin_importes_ni_base():
+    asignado, desglose = prorratear({"cantidad": [0.0, 0.0]}, ["DTA"], [5.0], base_default="cantidad")
+    assert asignado.tolist() == [0.0, 0.0]
+    assert desglose is None
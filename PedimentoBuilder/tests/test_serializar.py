@@ -0,0 +1,83 @@
+# tests/test_serializar.py
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import utils
+from tests.test_builder import construir_fluido
+from utils import object_to_dict, object_to_json, save_json, stream_json
+
+# <nombre>.pedimento.json: object_to_json(pedimento) con builder.py y
+# utils.py del commit base, antes de los convertidores precompilados
+DATOS = Path(__file__).parent / "datos"
+BASE = sorted(p.name[:-len(".pedimento.json")] for p in DATOS.glob("*.pedimento.json"))
+
+# atributos del dominio agregados después del commit base
+CAMPOS_NUEVOS = {"fecha_pago", "factor_valor_aduana"}
+
+
+def como_el_original(original, actual):
+    """Compara con la salida del serializador original. Ese registraba en
+       _visited también los primitivos, así que las repeticiones de un str
+       que CPython comparte ("" y los de un carácter) salían como null; ahí
+       se acepta el valor. Los CAMPOS_NUEVOS no se comparan."""
+    if original is None and actual is not None:
+        return isinstance(actual, str) and len(actual) <= 1
+    if isinstance(original, dict):
+        actual = {k: v for k, v in actual.items() if k not in CAMPOS_NUEVOS}
+        return list(original) == list(actual) and all(como_el_original(original[k], actual[k]) for k in original)
+    if isinstance(original, list):
+        return len(original) == len(actual) and all(como_el_original(o, a) for o, a in zip(original, actual))
+    return original == actual
+
+
+def reflexivo(obj, monkeypatch):
+    """object_to_dict sin convertidores: el recorrido genérico por __slots__."""
+    with monkeypatch.context() as m:
+        m.setattr(utils, "CONVERTIDORES", {})
+        return object_to_dict(obj)
+
+
+@pytest.mark.parametrize("nombre", BASE)
+def test_mismo_json_que_el_serializador_original(nombre):
+    original = json.loads((DATOS / f"{nombre}.pedimento.json").read_text(encoding="utf-8"))
+    pedimento = construir_fluido(str(DATOS / f"{nombre}.xml"), numerico=False)
+    assert como_el_original(original, json.loads(object_to_json(pedimento)))
+
+
+@pytest.mark.parametrize("numerico", [False, True])
+@pytest.mark.parametrize("nombre", BASE)
+def test_convertidores_igual_que_recorrido_generico(nombre, numerico, monkeypatch):
+    pedimento = construir_fluido(str(DATOS / f"{nombre}.xml"), numerico)
+    esperado = reflexivo(pedimento, monkeypatch)
+
+    # mismo texto que json.dumps sobre el dict del recorrido genérico
+    assert object_to_json(pedimento) == json.dumps(esperado, indent=2, ensure_ascii=False)
+    assert json.loads(object_to_json(pedimento, indent=None)) == esperado
+
+    f = io.StringIO()
+    stream_json(pedimento, f)
+    assert json.loads(f.getvalue()) == esperado
+
+
+def test_save_json_compacto_en_streaming(tmp_path):
+    pedimento = construir_fluido(str(DATOS / "sintetico.xml"), numerico=True)
+    save_json(pedimento, tmp_path / "p.json", indent=None)
+    save_json(pedimento, tmp_path / "p2.json")
+    assert json.loads((tmp_path / "p.json").read_text(encoding="utf-8")) == object_to_dict(pedimento)
+    assert (tmp_path / "p2.json").read_text(encoding="utf-8") == object_to_json(pedimento)
+
+
+def test_repetidos_y_compartidos_no_salen_como_none():
+    cliente = {"rfc": "X"}
+    data = object_to_dict([cliente, cliente, "", "", 1, 1])
+    assert data == [{"rfc": "X"}, {"rfc": "X"}, "", "", 1, 1]
+
+
+def test_ciclo_sale_como_none():
+    ciclo = []
+    ciclo.append(ciclo)
+    assert object_to_dict(ciclo) == [None]
@@ -0,0 +1,119 @@
+# tests/test_snapshot.py
+
+import os
+import stat
+
+import pytest
+
+import snapshot
+from builder import PedimentoStreamBuilder
+from tests.sinteticos import generar_xml, mismo_objeto
+
+
+class Construir:
+    """Builder de streaming que cuenta cuántas veces se parseó el XML."""
+
+    def __init__(self):
+        self.llamadas = 0
+
+    def __call__(self, src):
+        self.llamadas += 1
+        return PedimentoStreamBuilder(src, numerico=True).build()
+
+
+@pytest.fixture
+def xml(tmp_path):
+    return generar_xml(str(tmp_path / "P.xml"), n_fracciones=4, items_por_fraccion=3)
+
+
+@pytest.fixture(autouse=True)
+def sin_variables(monkeypatch, tmp_path):
+    monkeypatch.delenv("PEDIMENTO_SNAPSHOT_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def test_por_omision_en_cache_privado_del_usuario(tmp_path, xml):
+    construir = Construir()
+    snapshot.cargar(xml, construir, "numerico")
+
+    directorio = tmp_path / "cache" / "pedimentos" / "snapshots"
+    assert len(list(directorio.glob("*.pkl"))) == 1
+    assert stat.S_IMODE(directorio.stat().st_mode) == 0o700
+    # nada junto al XML
+    assert sorted(os.listdir(tmp_path)) == ["P.xml", "cache"]
+
+
+def test_variable_de_entorno_y_cache_dir(tmp_path, xml, monkeypatch):
+    monkeypatch.setenv("PEDIMENTO_SNAPSHOT_DIR", str(tmp_path / "env"))
+    assert snapshot.directorio_snapshots() == tmp_path / "env"
+    assert snapshot.directorio_snapshots(tmp_path / "explicito") == tmp_path / "explicito"
+
+
+def test_segunda_carga_sale_del_snapshot(tmp_path, xml):
+    construir = Construir()
+    primero = snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    segundo = snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    assert construir.llamadas == 1
+    assert mismo_objeto(primero, segundo)
+
+
+def test_mtime_distinto_mismo_contenido_no_invalida(tmp_path, xml):
+    construir = Construir()
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    info = os.stat(xml)
+    os.utime(xml, ns=(info.st_atime_ns, info.st_mtime_ns + 5_000_000_000))
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    assert construir.llamadas == 1
+
+
+def test_xml_modificado_invalida(tmp_path, xml):
+    construir = Construir()
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    generar_xml(xml, n_fracciones=5, items_por_fraccion=3)
+
+    pedimento = snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    assert construir.llamadas == 2
+    assert len(pedimento.fracciones) == 5
+
+
+def test_otra_version_del_builder_invalida(tmp_path, xml, monkeypatch):
+    construir = Construir()
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    monkeypatch.setattr(snapshot, "VERSION_BUILDER", "otraversion")
+
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    assert construir.llamadas == 2
+    # el snapshot de la versión anterior se borra
+    assert [p.name.split(".")[2] for p in (tmp_path / "s").glob("*.pkl")] == ["otraversion"]
+
+
+def test_tipos_distintos_no_se_mezclan(tmp_path, xml):
+    construir = Construir()
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    snapshot.cargar(xml, construir, "texto", tmp_path / "s")
+    assert construir.llamadas == 2
+
+
+def test_snapshot_ilegible_se_reconstruye(tmp_path, xml):
+    construir = Construir()
+    snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    snapshot.ruta_snapshot(xml, "numerico", tmp_path / "s").write_bytes(b"basura")
+
+    pedimento = snapshot.cargar(xml, construir, "numerico", tmp_path / "s")
+    assert construir.llamadas == 2
+    assert len(pedimento.fracciones) == 4
+
+
+def test_directorio_con_escritura_de_otros_no_se_usa(tmp_path, xml):
+    compartido = tmp_path / "compartido"
+    compartido.mkdir()
+    compartido.chmod(0o777)
+    construir = Construir()
+
+    snapshot.cargar(xml, construir, "numerico", compartido)
+    # aunque alguien deje un snapshot con el nombre esperado, no se lee
+    snapshot.ruta_snapshot(xml, "numerico", compartido).write_bytes(b"no es de confianza")
+    pedimento = snapshot.cargar(xml, construir, "numerico", compartido)
+
+    assert construir.llamadas == 2
+    assert len(pedimento.fracciones) == 4
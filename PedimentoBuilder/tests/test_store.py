@@ -0,0 +1,131 @@
+# tests/test_store.py
+
+from collections import Counter, defaultdict
+
+import pytest
+
+from builder import PedimentoStreamBuilder
+from store import PedimentoStore, cargar_directorio
+from tests.sinteticos import generar_xml
+
+# (seed, fecha de pago, RFC del cliente): A y C son del mismo cliente
+PEDIMENTOS = {
+    "A": (1, "2025-01-15", "AAA010101AAA"),
+    "B": (2, "15/03/2025", "BBB010101BBB"),
+    "C": (3, "2025-06-01", "AAA010101AAA"),
+}
+FECHAS = {"A": "2025-01-15", "B": "2025-03-15", "C": "2025-06-01"}
+
+
+def escribir(tmp_path, nombre, fracciones=6):
+    seed, fecha, rfc = PEDIMENTOS[nombre]
+    path = tmp_path / f"{nombre}.xml"
+    generar_xml(str(path), n_fracciones=fracciones, items_por_fraccion=4, seed=seed)
+    texto = path.read_text(encoding="utf-8")
+    texto = texto.replace("2025-11-20", fecha).replace("CDE010101AAA", rfc)
+    path.write_text(texto, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def cargado(tmp_path):
+    """Store con A, B y C, y los Pedimento construidos para calcular lo esperado."""
+    store = PedimentoStore(str(tmp_path / "store.sqlite3"))
+    xmls = {nombre: escribir(tmp_path, nombre) for nombre in PEDIMENTOS}
+    for xml in xmls.values():
+        store.cargar_xml(xml)
+    construidos = {n: PedimentoStreamBuilder(x, numerico=True).build() for n, x in xmls.items()}
+    return store, construidos
+
+
+def test_items_por_item_number_y_rango(cargado):
+    store, construidos = cargado
+    por_pedimento = {
+        n: Counter(i.item_number for f in p.fracciones for i in f.items)
+        for n, p in construidos.items()
+    }
+    codigo = (por_pedimento["A"] & por_pedimento["B"] & por_pedimento["C"]).most_common(1)[0][0]
+
+    todos = store.items(codigo)
+    assert len(todos) == sum(c[codigo] for c in por_pedimento.values())
+    # más reciente primero
+    fechas = [r["fecha_pago"] for r in todos]
+    assert fechas == sorted(fechas, reverse=True)
+    assert set(fechas) == set(FECHAS.values())
+
+    rango = store.items(codigo, desde="2025-02-01", hasta="2025-05-31")
+    assert len(rango) == por_pedimento["B"][codigo]
+    assert {r["fecha_pago"] for r in rango} == {"2025-03-15"}
+    assert len(store.items(codigo, desde="2025-01-15", hasta="2025-01-15")) == por_pedimento["A"][codigo]
+    assert len(store.items(codigo, limite=2)) == 2
+    assert store.items("NO-EXISTE") == []
+
+
+def test_fracciones_por_numero(cargado):
+    store, _ = cargado
+    assert {r["fecha_pago"] for r in store.fracciones("84000002")} == set(FECHAS.values())
+    assert [r["fecha_pago"] for r in store.fracciones("84000002", desde="2025-03-01")] == ["2025-06-01", "2025-03-15"]
+
+
+def test_impuestos_por_fraccion(cargado):
+    store, construidos = cargado
+    esperado = defaultdict(float)
+    for n, p in construidos.items():
+        if FECHAS[n] >= "2025-03-01":
+            for f in p.fracciones:
+                for c in f.contribuciones:
+                    if c.clave_impuesto == "3":
+                        esperado[f.numero_fraccion] += c.importe
+
+    filas = store.impuestos_por_fraccion("3", desde="2025-03-01")
+    assert {r["numero_fraccion"]: r["importe"] for r in filas} == pytest.approx(dict(esperado))
+    assert {r["pedimentos"] for r in filas} == {2}
+    importes = [r["importe"] for r in filas]
+    assert importes == sorted(importes, reverse=True)
+    # las contribuciones generales (claves 1, 15, 23) no tienen fracción
+    assert store.impuestos_por_fraccion("1") == []
+
+
+def test_pedimentos_por_rfc(cargado):
+    store, construidos = cargado
+    cliente = store.pedimentos(rfc="AAA010101AAA")
+    assert [r["numero_completo"] for r in cliente] == [construidos[n].numero_completo for n in ("C", "A")]
+    assert cliente[0]["items"] == 24 and cliente[0]["fracciones"] == 6
+
+    # también por RFC/Tax ID del proveedor de alguna factura
+    assert len(store.pedimentos(rfc="TAX000001")) == 3
+    assert store.pedimentos(rfc="ZZZ") == []
+    assert [r["fecha_pago"] for r in store.pedimentos(hasta="2025-03-15")] == ["2025-03-15", "2025-01-15"]
+    assert len(store.pedimentos(limite=1)) == 1
+
+
+def test_recargar_reemplaza_el_pedimento(tmp_path, cargado):
+    store, _ = cargado
+    antes = store.resumen()
+
+    store.cargar_xml(escribir(tmp_path, "A", fracciones=3))
+    despues = store.resumen()
+    assert despues["pedimentos"] == antes["pedimentos"]
+    assert despues["fracciones"] == antes["fracciones"] - 3
+    assert despues["items"] == antes["items"] - 12
+
+
+def test_lote_con_repetidos_gana_el_ultimo(tmp_path):
+    store = PedimentoStore(str(tmp_path / "store.sqlite3"))
+    viejo = PedimentoStreamBuilder(escribir(tmp_path, "A", fracciones=2), numerico=True).build()
+    nuevo = PedimentoStreamBuilder(escribir(tmp_path, "A", fracciones=5), numerico=True).build()
+
+    ids = store.cargar([(viejo, "viejo.xml", "h1"), (nuevo, "nuevo.xml", "h2")])
+    assert ids[0] == ids[1]
+    assert [r["archivo"] for r in store.pedimentos()] == ["nuevo.xml"]
+    assert store.resumen()["fracciones"] == 5
+    assert store.hashes_cargados() == {"h2"}
+
+
+def test_cargar_directorio_omite_lo_ya_cargado(tmp_path):
+    store = PedimentoStore(str(tmp_path / "store.sqlite3"))
+    xmls = [escribir(tmp_path, nombre) for nombre in PEDIMENTOS]
+
+    assert cargar_directorio(store, xmls[:2], lote=1) == (2, 0, [])
+    assert cargar_directorio(store, xmls, lote=1) == (1, 2, [])
+    assert store.resumen()["pedimentos"] == 3
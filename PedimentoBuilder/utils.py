@@ -1,16 +1,114 @@
 # utils.py
 
+import datetime as dt
 import json
+from operator import attrgetter
 
+from domain import (
+    Cliente, ProveedorComprador, Factura, Contribucion, Permiso,
+    DescripcionEspecifica, Item, Fraccion, Identificador, Incrementable,
+    Pedimento, PedimentoColumnar,
+)
+
+try:
+    import orjson   # opcional: JSON compacto mucho más rápido
+except ImportError:
+    orjson = None
+
+
+# ===================================================================
+#  ESQUEMA DEL DOMINIO
+# ===================================================================
+# Campos que contienen objetos del dominio: {atributo: Clase} para un
+# objeto y {atributo: [Clase]} para una lista. Los demás son valores.
+ANIDADOS = {
+    Cliente: {},
+    ProveedorComprador: {},
+    Factura: {"proveedor_comprador": ProveedorComprador},
+    Contribucion: {},
+    Permiso: {},
+    DescripcionEspecifica: {},
+    Item: {"descripciones": [DescripcionEspecifica]},
+    Fraccion: {
+        "contribuciones": [Contribucion],
+        "permisos": [Permiso],
+        "items": [Item],
+    },
+    Identificador: {},
+    Incrementable: {},
+    Pedimento: {
+        "cliente": Cliente,
+        "facturas": [Factura],
+        "fracciones": [Fraccion],
+        "identificadores": [Identificador],
+        "incrementables": [Incrementable],
+        "contribuciones_generales": [Contribucion],
+    },
+}
+
+
+def _compilar(clase, convertidores):
+    """Convertidor de una clase: un attrgetter con todos sus __slots__
+       (en orden) y solo los campos anidados se vuelven a convertir."""
+    nombres = clase.__slots__
+    valores = attrgetter(*nombres)
+    anidados = [
+        (attr, isinstance(tipo, list), tipo[0] if isinstance(tipo, list) else tipo)
+        for attr, tipo in ANIDADOS[clase].items()
+    ]
+
+    if not anidados:
+        return lambda obj: dict(zip(nombres, valores(obj)))
+
+    def convertir(obj):
+        data = dict(zip(nombres, valores(obj)))
+        for attr, es_lista, tipo in anidados:
+            conv = convertidores[tipo]
+            valor = data[attr]
+            data[attr] = [conv(v) for v in valor] if es_lista else conv(valor)
+        return data
+
+    return convertir
+
+
+def _columnar_a_dict(columnar):
+    data = {"pedimento": CONVERTIDORES[Pedimento](columnar.pedimento)}
+    for tabla in PedimentoColumnar.__slots__[1:]:
+        data[tabla] = {col: arr.tolist() for col, arr in getattr(columnar, tabla).items()}
+    return data
+
+
+# clase -> función obj -> dict, armadas una vez al importar
+CONVERTIDORES = {}
+for _clase in ANIDADOS:
+    CONVERTIDORES[_clase] = _compilar(_clase, CONVERTIDORES)
+CONVERTIDORES[PedimentoColumnar] = _columnar_a_dict
+
+
+# ===================================================================
+#  A DICT
+# ===================================================================
 def object_to_dict(obj, _visited=None):
     """
-    Convierte recursivamente un objeto del dominio a un dict profundo.
-    Soporta:
-    - Objetos con __dict__
+    Convierte un objeto del dominio a un dict profundo.
+    Las clases de domain.py usan su convertidor precompilado; para el
+    resto (listas, dicts, otros objetos) se recorre genéricamente:
+    - Objetos con __slots__ o __dict__
     - Listas/tuplas
     - Diccionarios
     - Valores primitivos
     """
+    convertir = CONVERTIDORES.get(type(obj))
+    if convertir is not None:
+        return convertir(obj)
+
+    # ---------------------------------------
+    # Tipos primitivos -> devolver tal cual
+    # (antes de registrar ids: un mismo str o int puede aparecer
+    # muchas veces y no es un ciclo)
+    # ---------------------------------------
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
 
     if _visited is None:
         _visited = set()
@@ -23,32 +121,34 @@ def object_to_dict(obj, _visited=None):
         return None  # evitar loops
     _visited.add(obj_id)
 
-    # ---------------------------------------
-    # Tipos primitivos -> devolver tal cual
-    # ---------------------------------------
-    if isinstance(obj, (str, int, float, bool)) or obj is None:
-        return obj
+    try:
+        # ---------------------------------------
+        # Listas o tuplas -> convertir cada elemento
+        # ---------------------------------------
+        if isinstance(obj, (list, tuple)):
+            return [object_to_dict(item, _visited) for item in obj]
 
-    # ---------------------------------------
-    # Listas o tuplas -> convertir cada elemento
-    # ---------------------------------------
-    if isinstance(obj, (list, tuple)):
-        return [object_to_dict(item, _visited) for item in obj]
+        # ---------------------------------------
+        # Diccionarios -> convertir valores
+        # ---------------------------------------
+        if isinstance(obj, dict):
+            return {k: object_to_dict(v, _visited) for k, v in obj.items()}
 
-    # ---------------------------------------
-    # Diccionarios -> convertir valores
-    # ---------------------------------------
-    if isinstance(obj, dict):
-        return {k: object_to_dict(v, _visited) for k, v in obj.items()}
+        # ---------------------------------------
+        # Objetos con __slots__
+        # ---------------------------------------
+        if hasattr(type(obj), "__slots__"):
+            return {key: object_to_dict(getattr(obj, key), _visited) for key in type(obj).__slots__}
 
-    # ---------------------------------------
-    # Objetos de dominio -> usar __dict__
-    # ---------------------------------------
-    if hasattr(obj, "__dict__"):
-        data = {}
-        for key, value in vars(obj).items():
-            data[key] = object_to_dict(value, _visited)
-        return data
+        # ---------------------------------------
+        # Otros objetos -> usar __dict__
+        # ---------------------------------------
+        if hasattr(obj, "__dict__"):
+            return {key: object_to_dict(value, _visited) for key, value in vars(obj).items()}
+    finally:
+        # solo los ancestros cuentan como ciclo, no los objetos hermanos
+        # que se repiten (el mismo Cliente en dos lugares)
+        _visited.discard(obj_id)
 
     # ---------------------------------------
     # Tipo desconocido -> representarlo como string
@@ -56,11 +156,68 @@ def object_to_dict(obj, _visited=None):
     return str(obj)
 
 
+# ===================================================================
+#  A JSON
+# ===================================================================
+def _dumps_compacto(data):
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
 def object_to_json(obj, indent=2):
     """
     Convierte cualquier objeto a JSON (usando object_to_dict internamente).
+    indent=None da JSON compacto (con orjson si está instalado).
     """
-    return json.dumps(object_to_dict(obj), indent=indent, ensure_ascii=False)
+    data = object_to_dict(obj)
+    if indent is None:
+        return _dumps_compacto(data)
+    return json.dumps(data, indent=indent, ensure_ascii=False)
+
+
+def stream_json(obj, f):
+    """
+    Escribe obj como JSON compacto en el archivo de texto f, sin armar
+    el dict completo: las listas de primer nivel (fracciones, facturas...)
+    se convierten y escriben elemento por elemento.
+    """
+    clase = type(obj)
+    if clase not in ANIDADOS:
+        f.write(_dumps_compacto(object_to_dict(obj)))
+        return
+
+    anidados = ANIDADOS[clase]
+    f.write("{")
+    for n, attr in enumerate(clase.__slots__):
+        if n:
+            f.write(",")
+        f.write(json.dumps(attr))
+        f.write(":")
+
+        valor = getattr(obj, attr)
+        tipo = anidados.get(attr)
+        if isinstance(tipo, list):
+            conv = CONVERTIDORES[tipo[0]]
+            f.write("[")
+            for i, elemento in enumerate(valor):
+                if i:
+                    f.write(",")
+                f.write(_dumps_compacto(conv(elemento)))
+            f.write("]")
+        elif tipo is not None:
+            f.write(_dumps_compacto(CONVERTIDORES[tipo](valor)))
+        else:
+            f.write(_dumps_compacto(valor))
+    f.write("}")
+
+
+def linea_ndjson(data):
+    """
+    Una línea de NDJSON: data (dicts, listas y valores) como JSON
+    compacto terminado en salto de línea.
+    """
+    return _dumps_compacto(data) + "\n"
 
 
 def pretty_print(obj):
@@ -70,9 +227,26 @@ def pretty_print(obj):
     print(object_to_json(obj, indent=2))
 
 
-def save_json(obj, path):
+def save_json(obj, path, indent=2):
     """
     Guarda el objeto como JSON en un archivo.
+    indent=None lo escribe compacto y en streaming (pedimentos grandes).
     """
     with open(path, "w", encoding="utf-8") as f:
-        f.write(object_to_json(obj, indent=2))
+        if indent is None:
+            stream_json(obj, f)
+        else:
+            f.write(object_to_json(obj, indent=indent))
+
+
+def parse_fecha(texto):
+    """FechaDePagoDelPedimento como date (ISO o dd/mm/aaaa); None si no se reconoce."""
+    texto = (texto or "").strip()
+    try:
+        return dt.date.fromisoformat(texto[:10])
+    except ValueError:
+        pass
+    try:
+        return dt.datetime.strptime(texto[:10], "%d/%m/%Y").date()
+    except ValueError:
+        return None
@@ -0,0 +1,294 @@
+# vectorized.py
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from builder import PedimentoColumnarBuilder
+from processor import (
+    PedimentoProcessor, CLAVES_NO_ACUMULABLES, MAP_CLAVE_IMPUESTO,
+    BASES_PRORRATEO_GENERAL, BASE_PRORRATEO_DEFAULT,
+)
+from prorrateo import prorratear
+
+
+def _suma_por_grupo(grupo, valores, n_grupos):
+    # bincount acumula en el orden de los items, igual que el += del
+    # camino con dicts, así que los resultados son idénticos bit a bit
+    return np.bincount(grupo, weights=valores, minlength=n_grupos)
+
+
+def costos_columnas(
+    codigos, cantidad, total, precio_unitario, frac_idx,
+    fracciones_dta, fracciones_contrib,
+    factor_aduana, tipo_de_cambio, contrib_gen_total, contrib_gen_keys,
+):
+    """Motor columnar del costeo.
+
+    Items (un elemento por item):
+        codigos, cantidad, total, precio_unitario, frac_idx (índice de fracción)
+    Fracciones (un elemento por fracción):
+        fracciones_dta, fracciones_contrib [(total, {clave: importe})]
+    Pedimento:
+        factor_aduana (ValorAduana / precio pagado), tipo_de_cambio,
+        contrib_gen_total, contrib_gen_keys (se prorratean con
+        prorrateo.prorratear)
+
+    Hace el prorrateo, la agrupación por código y los totales con
+    operaciones vectorizadas y regresa (número de items agrupados,
+    generador de sus dicts): los mismos dicts que
+    PedimentoProcessor._costos_finales, cada uno armado al pedirlo."""
+    n = len(codigos)
+    if n == 0:
+        return 0, iter(())
+
+    cantidad = np.asarray(cantidad, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    precio_unitario = np.asarray(precio_unitario, dtype=np.float64)
+    frac_idx = np.asarray(frac_idx, dtype=np.int64)
+
+    # ------------------------------------------------------------
+    #  VALORES POR ITEM
+    # ------------------------------------------------------------
+    tc = float(tipo_de_cambio or 0)
+    va = (total * tc) * factor_aduana
+
+    # columnas de impuestos: claves de fracción (NaN = el item no la trae)
+    # y después las generales prorrateadas, que pisan a las de fracción
+    columnas = {}
+    for _, keys in fracciones_contrib:
+        for clave in keys:
+            if clave not in columnas:
+                por_fraccion = np.array(
+                    [k.get(clave, np.nan) for _, k in fracciones_contrib], dtype=np.float64
+                )
+                columnas[clave] = por_fraccion[frac_idx]
+    asignado, desglose = prorratear(
+        {"cantidad": cantidad, "valor_aduana": va},
+        list(contrib_gen_keys), list(contrib_gen_keys.values()),
+        reglas=BASES_PRORRATEO_GENERAL, base_default=BASE_PRORRATEO_DEFAULT,
+        por_concepto=True, total_importes=contrib_gen_total,
+    )
+    columnas.update(desglose)
+    columnas["contrib_gen_prorrateado"] = asignado
+
+    # ------------------------------------------------------------
+    #  AGRUPAR POR CÓDIGO (orden de primera aparición)
+    # ------------------------------------------------------------
+    grupo, uniques = pd.factorize(np.asarray(codigos, dtype=object), sort=False)
+    n_grupos = len(uniques)
+    _, primero = np.unique(grupo, return_index=True)
+
+    agrupadas = {
+        "cantidad": _suma_por_grupo(grupo, cantidad, n_grupos),
+        "valor_aduana": _suma_por_grupo(grupo, va, n_grupos),
+    }
+    presentes = {}
+    for clave, col in columnas.items():
+        presente = ~np.isnan(col)
+        if clave in CLAVES_NO_ACUMULABLES:
+            # se conserva el valor del primer item del grupo
+            agrupadas[clave] = col[primero]
+            presentes[clave] = presente[primero]
+        else:
+            agrupadas[clave] = _suma_por_grupo(grupo, np.where(presente, col, 0.0), n_grupos)
+            presentes[clave] = _suma_por_grupo(grupo, presente, n_grupos) > 0
+
+    # ------------------------------------------------------------
+    #  COSTOS FINALES
+    # ------------------------------------------------------------
+    def col(clave):
+        if clave not in agrupadas:
+            return np.zeros(n_grupos)
+        return np.where(presentes.get(clave, True), agrupadas[clave], 0.0)
+
+    # el dta no es columna de impuestos: es el de la fracción del primer item
+    dta_grupo = np.asarray(fracciones_dta, dtype=np.float64)[frac_idx[primero]]
+    costo_total = (
+        col("valor_aduana") + col("IVA") + col("IGI/IGE") + col("PRV")
+        + col("IVA/PRV") + dta_grupo + col("CC")
+    )
+    cantidad_g = agrupadas["cantidad"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        costo_final = np.where(cantidad_g != 0, costo_total / cantidad_g, 0.0)
+
+    # ------------------------------------------------------------
+    #  ARMAR DICTS (mismo orden de claves que el camino con dicts)
+    # ------------------------------------------------------------
+    frac_primero = frac_idx[primero]
+    claves_frac = [list(fracciones_contrib[f][1]) for f in range(len(fracciones_contrib))]
+    claves_gen = list(contrib_gen_keys) + ["contrib_gen_prorrateado"]
+
+    # claves acumulables que no trae el primer item: se agregan al final
+    # en el orden en que aparecen en los items siguientes
+    extras_por_grupo = [[] for _ in range(n_grupos)]
+    posiciones = np.arange(n)
+    for clave, col_item in columnas.items():
+        if clave in CLAVES_NO_ACUMULABLES or clave in claves_gen:
+            continue
+        presente = ~np.isnan(col_item)
+        aparicion = np.full(n_grupos, n)
+        np.minimum.at(aparicion, grupo[presente], posiciones[presente])
+        for g in np.flatnonzero(aparicion < n):
+            if clave not in fracciones_contrib[frac_primero[g]][1]:
+                extras_por_grupo[g].append((aparicion[g], clave))
+
+    cantidad_l = cantidad_g.tolist()
+    va_l = agrupadas["valor_aduana"].tolist()
+    pu_l = precio_unitario[primero].tolist()
+    costo_total_l = costo_total.tolist()
+    costo_final_l = costo_final.tolist()
+    agrupadas_l = {k: v.tolist() for k, v in agrupadas.items()}
+
+    def armar():
+        for g in range(n_grupos):
+            f = frac_primero[g]
+            vals = {
+                "codigo": uniques[g],
+                "valor_aduana": va_l[g],
+                "precio_unitario": pu_l[g],
+                "cantidad": cantidad_l[g],
+                "dta": fracciones_dta[f],
+                "contribuciones_fraccion": fracciones_contrib[f][0],
+                "tipo_de_cambio": tc,
+            }
+            for clave in claves_frac[f]:
+                vals[clave] = agrupadas_l[clave][g]
+            for clave in claves_gen:
+                vals[clave] = agrupadas_l[clave][g]
+            for _, clave in sorted(extras_por_grupo[g], key=lambda e: (e[0], claves_frac[frac_idx[e[0]]].index(e[1]))):
+                vals[clave] = agrupadas_l[clave][g]
+
+            vals["costo_final"] = costo_final_l[g] if cantidad_l[g] else 0
+            vals["costo_total"] = costo_total_l[g]
+            yield vals
+
+    return n_grupos, armar()
+
+
+class VectorizedProcessor(PedimentoProcessor):
+    """Mismo costeo que PedimentoProcessor, pero convierte fracciones e
+       items a arreglos una sola vez y hace prorrateo, agrupación por
+       item_number y totales de forma vectorizada."""
+
+    def _columnas(self, pedimento, progreso=None):
+        codigos, cantidad, total, precio_unitario, frac_idx = [], [], [], [], []
+        fracciones_dta, fracciones_contrib = [], []
+        total_fracciones = len(pedimento.fracciones)
+
+        for i, fraccion in enumerate(pedimento.fracciones):
+            fracciones_dta.append(float(fraccion.dta or 0))
+            fracciones_contrib.append(self._procesar_contribuciones_fraccion(fraccion))
+
+            for item in fraccion.items:
+                codigos.append(item.item_number)
+                cantidad.append(float(item.cantidad or 0))
+                total.append(float(item.total or 0))
+                precio_unitario.append(float(item.precio_unitario or 0))
+                frac_idx.append(i)
+
+            if progreso is not None:
+                progreso(i + 1, total_fracciones)
+
+        return codigos, cantidad, total, precio_unitario, frac_idx, fracciones_dta, fracciones_contrib
+
+    def costear_stream(self, pedimento, progreso=None):
+        """(info del pedimento, generador de items finales), ver
+        PedimentoProcessor.costear_stream"""
+        contrib_gen_total, contrib_gen_keys = self._procesar_contribuciones_generales(pedimento)
+
+        columnas = self._columnas(pedimento, progreso)
+        n_items, items = costos_columnas(
+            *columnas,
+            self._factor_valor_aduana(pedimento) if columnas[0] else None,
+            pedimento.tipo_de_cambio,
+            contrib_gen_total,
+            contrib_gen_keys,
+        )
+
+        info_pedimento = self._info_pedimento(
+            pedimento, len(pedimento.fracciones), n_items,
+            contrib_gen_total, contrib_gen_keys,
+        )
+        return info_pedimento, items
+
+
+def tabla_dataframe(tabla):
+    """DataFrame de una tabla de PedimentoColumnar (sin copiar columnas)."""
+    return pd.DataFrame(tabla, copy=False)
+
+
+class ColumnarProcessor(VectorizedProcessor):
+    """Costeo sobre PedimentoColumnar: las columnas de items que lee el
+       builder columnar entran directo a costos_columnas, sin crear un
+       objeto por fracción, item o descripción."""
+
+    def load_pedimento(self, xml_source):
+        """Carga el pedimento en columnas (None si falla)"""
+        try:
+            return PedimentoColumnarBuilder(xml_source).build()
+        except Exception as e:
+            logging.error(f"Error cargando pedimento: {e}")
+            return None
+
+    def total_fracciones(self, columnar):
+        return len(columnar.fracciones["dta"])
+
+    def _contribuciones_por_fraccion(self, columnar):
+        """(total, importes por clave) de cada fracción, con las mismas
+           reglas que _procesar_contribuciones_fraccion"""
+        contrib = columnar.contribuciones
+        por_fraccion = [(0, {}) for _ in range(self.total_fracciones(columnar))]
+
+        for fraccion_id, tipo, importe, clave_raw in zip(
+            contrib["fraccion_id"].tolist(), contrib["tipo_de_tasa"],
+            contrib["importe"].tolist(), contrib["clave_impuesto"],
+        ):
+            if tipo == "0":
+                continue
+
+            total, keys = por_fraccion[fraccion_id]
+            clave = MAP_CLAVE_IMPUESTO.get(clave_raw, f"CONTRIB_{clave_raw}")
+            keys[clave] = keys.get(clave, 0) + importe
+            por_fraccion[fraccion_id] = (total + importe, keys)
+
+        return por_fraccion
+
+    def costear_stream(self, columnar, progreso=None):
+        """(info del pedimento, generador de items finales) de un
+        PedimentoColumnar, ver PedimentoProcessor.costear_stream"""
+        pedimento = columnar.pedimento
+        items = columnar.items
+        total_fracciones = self.total_fracciones(columnar)
+        contrib_gen_total, contrib_gen_keys = self._procesar_contribuciones_generales(pedimento)
+
+        n_items, items_final = costos_columnas(
+            items["item_number"],
+            items["cantidad"],
+            items["total"],
+            items["precio_unitario"],
+            items["fraccion_id"],
+            columnar.fracciones["dta"].tolist(),
+            self._contribuciones_por_fraccion(columnar),
+            self._factor_valor_aduana(pedimento) if len(items["item_number"]) else None,
+            pedimento.tipo_de_cambio,
+            contrib_gen_total,
+            contrib_gen_keys,
+        )
+        if progreso is not None:
+            progreso(total_fracciones, total_fracciones)
+
+        info_pedimento = self._info_pedimento(
+            pedimento, total_fracciones, n_items,
+            contrib_gen_total, contrib_gen_keys,
+        )
+        return info_pedimento, items_final
+
+
+# Motores de costeo disponibles (PEDIMENTO_MOTOR en el API, --motor en batch.py)
+MOTORES = {
+    "dicts": PedimentoProcessor,
+    "vectorizado": VectorizedProcessor,
+    "columnar": ColumnarProcessor,
+}
@@ -0,0 +1,400 @@
+# watcher.py
+"""
+Servicio que vigila un directorio de pedimentos y costea cada XML nuevo o
+modificado en cuanto termina de escribirse.
+
+- Detección: inotify (con watchdog, si está instalado) o polling.
+  Además se hace un barrido inicial y uno periódico de respaldo.
+- Debounce: un archivo se procesa cuando su tamaño y mtime no cambian
+  durante --estable segundos (copias a medias, uploads lentos).
+- Cola acotada (--cola) y pool de --workers procesos: si la cola se llena
+  los archivos esperan en el debounce (backpressure) en lugar de acumularse.
+- Mismas salidas, manifest y resultados guardados que batch.py --incremental,
+  así que un reinicio no vuelve a costear lo ya hecho; los dos pueden correr
+  a la vez sobre la misma carpeta (ver Manifest.guardar).
+- Un XML borrado o movido fuera del directorio se quita del manifest junto
+  con su Excel (evento de watchdog o, si no, el siguiente barrido).
+- Con --historial los costos se registran en el historial por item_number
+  (ver historial.py).
+- GET /status en --puerto: profundidad de la cola, en proceso y latencias.
+
+Uso:
+    python3 watcher.py Pedimentos/ --salida "Files Pedimentos" --workers 2
+    python3 watcher.py Pedimentos/ --polling --intervalo 10
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from batch import DIR_RESULTADOS, NOMBRE_MANIFEST, costear_archivo, listar_xmls
+from cache import ResultCache, clave_por_hash
+from historial import HistorialCostos
+from manifest import Manifest
+from vectorized import MOTORES
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # sin watchdog: solo polling
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _EventosXml(FileSystemEventHandler):
+    """Pasa al watcher cada XML creado, modificado, movido o borrado."""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notificar(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notificar(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.eliminar(event.src_path)
+            self.watcher.notificar(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.eliminar(event.src_path)
+
+
+class PedimentoWatcher:
+
+    # cada cuánto se revisan los archivos en debounce
+    INTERVALO_DEBOUNCE = 0.5
+
+    def __init__(self, entrada, salida_dir, workers=2, max_cola=100, estable=2.0,
+                 intervalo=30.0, polling=False, motor="dicts", parquet_dir=None, historial_db=None):
+        self.entrada = Path(entrada)
+        self.salida_dir = salida_dir
+        self.workers = workers
+        self.estable = estable
+        self.intervalo = intervalo
+        self.polling = polling or Observer is None
+        self.motor = motor
+        self.parquet_dir = parquet_dir
+        self.historial = HistorialCostos(historial_db) if historial_db else None
+
+        os.makedirs(salida_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(salida_dir, NOMBRE_MANIFEST))
+        self.guardados = ResultCache(max_items=0, ttl=0, disk_dir=os.path.join(salida_dir, DIR_RESULTADOS))
+
+        self.cola = queue.Queue(maxsize=max_cola)
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(workers)
+
+        # path -> [size, mtime_ns, detectado (monotonic), último cambio (monotonic)]
+        self._candidatos = {}
+        # path -> (size, mtime_ns) ya encolado o terminado en esta ejecución
+        self._vistos = {}
+        self._en_proceso = 0
+
+        self.procesados = 0
+        self.sin_cambios = 0
+        self.errores = 0
+        self._latencias = deque(maxlen=1000)   # detección -> resultado escrito
+        self._duraciones = deque(maxlen=1000)  # solo el costeo
+
+        self._pool = None
+        self._observer = None
+        self._hilos = []
+
+    # ============================================================
+    #  DETECCIÓN
+    # ============================================================
+    def notificar(self, path):
+        """Registra (o refresca) un XML candidato; lo llaman inotify y el barrido."""
+        if not path.lower().endswith(".xml"):
+            return
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return
+
+        ahora = time.monotonic()
+        with self._lock:
+            if self._vistos.get(path) == (stat.st_size, stat.st_mtime_ns):
+                return
+            actual = self._candidatos.get(path)
+            if actual is None:
+                self._candidatos[path] = [stat.st_size, stat.st_mtime_ns, ahora, ahora]
+            elif (actual[0], actual[1]) != (stat.st_size, stat.st_mtime_ns):
+                actual[0], actual[1], actual[3] = stat.st_size, stat.st_mtime_ns, ahora
+
+    def barrer(self):
+        for xml_path in listar_xmls(str(self.entrada)):
+            self.notificar(str(xml_path))
+        # respaldo de on_deleted (polling o eventos perdidos)
+        with self._manifest_lock:
+            eliminados = self.manifest.eliminados(self.entrada)
+        for clave in eliminados:
+            self.eliminar(clave)
+
+    def eliminar(self, path):
+        """XML borrado o movido fuera: se quita del manifest junto con su
+           Excel individual, como en batch.py --incremental."""
+        if not path.lower().endswith(".xml") or os.path.exists(path):
+            return
+        with self._lock:
+            self._candidatos.pop(path, None)
+            self._vistos.pop(path, None)
+        with self._manifest_lock:
+            entrada = self.manifest.eliminar(Manifest.clave(path))
+            if entrada is None:
+                return
+            self.manifest.guardar()
+        try:
+            os.unlink(entrada["salida"])
+        except FileNotFoundError:
+            pass
+        logging.info(f"{Path(path).name}: ya no existe, se borra {entrada['salida']}")
+
+    def _loop_barrido(self):
+        while not self._stop.wait(self.intervalo):
+            self.barrer()
+
+    # ============================================================
+    #  DEBOUNCE + BACKPRESSURE
+    # ============================================================
+    def _loop_debounce(self):
+        while not self._stop.wait(self.INTERVALO_DEBOUNCE):
+            ahora = time.monotonic()
+            with self._lock:
+                listos = [
+                    (path, c[2]) for path, c in self._candidatos.items()
+                    if ahora - c[3] >= self.estable
+                ]
+
+            for path, detectado in listos:
+                self.notificar(path)   # refresca size/mtime antes de decidir
+                with self._lock:
+                    c = self._candidatos.get(path)
+                    if c is None or time.monotonic() - c[3] < self.estable:
+                        continue
+                if not self._encolar(path, detectado):
+                    break   # cola llena: el resto espera en debounce
+
+    def _encolar(self, path, detectado):
+        """Regresa False si la cola está llena (el archivo sigue en debounce)."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._candidatos.pop(path, None)
+            return True
+
+        with self._manifest_lock:
+            entrada, contenido = self.manifest.revisar(path)
+        with self._lock:
+            if entrada is not None and not (self.parquet_dir and entrada.get("parquet") != self.parquet_dir):
+                self._candidatos.pop(path, None)
+                self._vistos[path] = (stat.st_size, stat.st_mtime_ns)
+                self.sin_cambios += 1
+                return True
+
+        if contenido is None:
+            contenido = entrada["hash"]
+        try:
+            self.cola.put_nowait((path, contenido, detectado))
+        except queue.Full:
+            return False
+
+        with self._lock:
+            self._candidatos.pop(path, None)
+            self._vistos[path] = (stat.st_size, stat.st_mtime_ns)
+        return True
+
+    # ============================================================
+    #  COSTEO (pool de procesos acotado)
+    # ============================================================
+    def _loop_despacho(self):
+        while not self._stop.is_set():
+            try:
+                path, contenido, detectado = self.cola.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # a lo más `workers` archivos en el pool; el resto espera en la cola
+            self._slots.acquire()
+            with self._lock:
+                self._en_proceso += 1
+            try:
+                futuro = self._pool.submit(costear_archivo, path, self.salida_dir, self.motor, self.parquet_dir)
+            except Exception as e:   # pool roto o cerrándose
+                futuro = Future()
+                futuro.set_exception(e)
+            futuro.add_done_callback(lambda f, p=path, h=contenido, d=detectado: self._terminado(f, p, h, d))
+
+    def _terminado(self, futuro, path, contenido, detectado):
+        try:
+            r = futuro.result()
+        except Exception as e:   # el proceso hijo murió
+            r = {"archivo": Path(path).name, "ok": False, "error": f"{type(e).__name__}: {e}", "segundos": 0.0}
+
+        try:
+            if r["ok"]:
+                self.guardados.put(clave_por_hash(contenido), r["resultado"])
+                with self._manifest_lock:
+                    self.manifest.registrar(path, contenido, r["salida"], self.parquet_dir)
+                    self.manifest.guardar()
+                if self.historial is not None:
+                    self.historial.registrar(r["resultado"])
+                logging.info(f"{r['archivo']}: {len(r['resultado']['items'])} items ({r['segundos']:.2f}s)")
+            else:
+                logging.error(f"{r['archivo']}: {r['error']}")
+        finally:
+            with self._lock:
+                self._en_proceso -= 1
+                if r["ok"]:
+                    self.procesados += 1
+                    self._latencias.append(time.monotonic() - detectado)
+                    self._duraciones.append(r["segundos"])
+                else:
+                    self.errores += 1
+            self._slots.release()
+
+    # ============================================================
+    #  ESTADO
+    # ============================================================
+    def status(self):
+        def resumen(valores):
+            if not valores:
+                return None
+            orden = sorted(valores)
+            return {
+                "ultimo_ms": round(valores[-1] * 1000, 1),
+                "promedio_ms": round(sum(orden) / len(orden) * 1000, 1),
+                "p95_ms": round(orden[int(0.95 * (len(orden) - 1))] * 1000, 1),
+            }
+
+        with self._lock:
+            return {
+                "modo": "polling" if self.polling else "inotify",
+                "directorio": str(self.entrada),
+                "cola": self.cola.qsize(),
+                "max_cola": self.cola.maxsize,
+                "en_proceso": self._en_proceso,
+                "workers": self.workers,
+                "en_debounce": len(self._candidatos),
+                "procesados": self.procesados,
+                "sin_cambios": self.sin_cambios,
+                "errores": self.errores,
+                "latencia": resumen(list(self._latencias)),
+                "costeo": resumen(list(self._duraciones)),
+            }
+
+    # ============================================================
+    #  CICLO DE VIDA
+    # ============================================================
+    def start(self):
+        # spawn: los hijos no heredan por fork los hilos ni locks del watcher
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+        if not self.polling:
+            self._observer = Observer()
+            self._observer.schedule(_EventosXml(self), str(self.entrada), recursive=False)
+            self._observer.start()
+
+        self.barrer()
+        for destino in (self._loop_debounce, self._loop_despacho, self._loop_barrido):
+            hilo = threading.Thread(target=destino, daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+        logging.info(f"Vigilando {self.entrada} ({self.status()['modo']}, {self.workers} workers)")
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        for hilo in self._hilos:
+            hilo.join()
+        # termina lo que ya está en el pool; lo que quedó en cola se
+        # retoma en el barrido inicial del siguiente arranque
+        self._pool.shutdown(wait=True)
+
+
+def servidor_status(watcher, puerto):
+    """HTTP mínimo (hilo aparte) con GET /status."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("/status", "/health"):
+                self.send_error(404)
+                return
+            cuerpo = json.dumps(watcher.status(), ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", puerto), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+# ============================================================
+#  PROGRAMA PRINCIPAL
+# ============================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entrada", help="directorio de pedimentos XML a vigilar")
+    parser.add_argument("--salida", default="Files Pedimentos", help="directorio de salida")
+    parser.add_argument("--workers", type=int, default=2, help="procesos de costeo")
+    parser.add_argument("--cola", type=int, default=100, help="máximo de archivos en cola")
+    parser.add_argument("--estable", type=float, default=2.0, help="segundos sin cambios para considerar un XML completo")
+    parser.add_argument("--intervalo", type=float, default=30.0, help="segundos entre barridos del directorio")
+    parser.add_argument("--polling", action="store_true", help="no usar inotify aunque watchdog esté instalado")
+    parser.add_argument("--motor", choices=sorted(MOTORES), default="dicts", help="motor de costeo")
+    parser.add_argument("--parquet", metavar="DIR", help="escribir también el dataset Parquet en DIR")
+    parser.add_argument("--historial", metavar="DB", help="registrar los costos en el historial SQLite DB (ver historial.py)")
+    parser.add_argument("--puerto", type=int, default=8081, help="puerto de GET /status")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    watcher = PedimentoWatcher(
+        args.entrada, args.salida,
+        workers=args.workers, max_cola=args.cola, estable=args.estable,
+        intervalo=args.intervalo, polling=args.polling,
+        motor=args.motor, parquet_dir=args.parquet, historial_db=args.historial,
+    )
+    watcher.start()
+    servidor = servidor_status(watcher, args.puerto)
+
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+    signal.signal(signal.SIGINT, lambda *_: detener.set())
+    detener.wait()
+
+    logging.info("Deteniendo watcher...")
+    servidor.shutdown()
+    watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
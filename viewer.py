@@ -5,57 +5,132 @@ xml_viewer_local.py
 Convierte cualquier XML (ej. pedimento aduanal) en un archivo HTML navegable,
 tipo árbol expandible (como jsonformatter.org/xml-viewer), pero 100 % local.
 
+El XML se lee con iterparse y el HTML se escribe al disco conforme se lee,
+sin recursión (no hay límite de profundidad) y sin armar el documento en
+memoria.
+
+Modo lazy (XML de más de 1 MB, o con --niveles): solo los primeros niveles
+van como HTML; cada subárbol más profundo va embebido como un bloque JSON
+compacto que el navegador convierte en HTML al expandirlo, un nivel a la vez.
+
 Uso:
     python3 xml_viewer_local.py archivo.xml
+    python3 xml_viewer_local.py archivo.xml --niveles 3
+    python3 xml_viewer_local.py archivo.xml --completo
 Resultado:
     archivo_viewer.html
 """
 
+import argparse
 import sys
 import xml.etree.ElementTree as ET
 from pathlib import Path
 import html
+import json
+
+# XML más grandes se muestran en modo lazy salvo --completo
+UMBRAL_LAZY = 1024 * 1024
+NIVELES_LAZY = 2
+
 
-def generar_html(element):
-    """Crea HTML recursivo con estructura expandible."""
-    tag = html.escape(element.tag)
+def _valor(element):
     text = (element.text or "").strip()
-    valor = f": <span class='valor'>{html.escape(text)}</span>" if text else ": <span class='valor'>null</span>"
-
-    contenido = ""
-    for attr, val in element.attrib.items():
-        contenido += f"<div class='atributo'>@{html.escape(attr)} = '{html.escape(val)}'</div>"
-
-    hijos = list(element)
-    if hijos:
-        contenido_hijos = "".join(generar_html(hijo) for hijo in hijos)
-        return f"""
-        <li>
-            <span class="caret">{tag}{valor}</span>
-            <ul class="nested">
-                {contenido}{contenido_hijos}
-            </ul>
-        </li>
-        """
-    else:
-        return f"<li><span class='leaf'>{tag}{valor}</span>{contenido}</li>"
+    return f": <span class='valor'>{html.escape(text)}</span>" if text else ": <span class='valor'>null</span>"
 
-def main():
-    if len(sys.argv) < 2:
-        print("❌ Uso: python3 xml_viewer_local.py archivo.xml")
-        sys.exit(1)
 
-    path = Path(sys.argv[1])
-    if not path.exists():
-        print(f"❌ Archivo no encontrado: {path}")
-        sys.exit(1)
+def _atributos(element):
+    return "".join(
+        f"<div class='atributo'>@{html.escape(attr)} = '{html.escape(val)}'</div>"
+        for attr, val in element.attrib.items()
+    )
+
+
+def _hoja(element):
+    return f"<li><span class='leaf'>{html.escape(element.tag)}{_valor(element)}</span>{_atributos(element)}</li>\n"
+
+
+def _abrir(element):
+    """<li> de un nodo con hijos, sin cerrar: los hijos se escriben después."""
+    return (
+        f'<li><span class="caret">{html.escape(element.tag)}{_valor(element)}</span>'
+        f'<ul class="nested">{_atributos(element)}\n'
+    )
+
+
+CIERRE = "</ul></li>\n"
+
+
+def nodos_subarbol(element):
+    """Subárbol como lista plana en preorden de [tag, texto, atributos, padre]
+    (padre = índice en la lista, -1 para la raíz del subárbol). Plana para
+    que ni json.dumps ni el navegador tengan que recorrerla recursivamente."""
+    nodos = []
+    pila = [(element, -1)]
+    while pila:
+        nodo, padre = pila.pop()
+        indice = len(nodos)
+        nodos.append([nodo.tag, (nodo.text or "").strip(), dict(nodo.attrib) or None, padre])
+        pila.extend((hijo, indice) for hijo in reversed(nodo))
+    return nodos
+
+
+def _diferido(element, chunk):
+    """Nodo del último nivel renderizado: el subárbol va en un bloque JSON."""
+    datos = json.dumps(nodos_subarbol(element), ensure_ascii=False, separators=(",", ":"))
+    datos = datos.replace("<", "\\u003c")   # nunca cierra el <script>
+    return (
+        f'<li><span class="caret" data-chunk="{chunk}" data-nodo="0">'
+        f'{html.escape(element.tag)}{_valor(element)}</span><ul class="nested"></ul>'
+        f'<script type="application/json" id="c{chunk}">{datos}</script></li>\n'
+    )
+
+
+def escribir_arbol(xml_path, out, niveles=None):
+    """Escribe en out los <li> del árbol, en un solo recorrido con iterparse.
+
+    niveles=None renderiza todo; con niveles=N los nodos de profundidad N
+    con hijos se difieren a un bloque JSON. Cada nodo ya escrito se suelta
+    del árbol, así que la memoria queda acotada por el subárbol más grande
+    que se difiere (o por un nodo, en modo completo).
+    Regresa el número de bloques diferidos."""
+    limite = float("inf") if niveles is None else niveles
+    abiertos = []   # [elemento, encabezado escrito] por nivel renderizado
+    nivel = -1
+    chunks = 0
+
+    for evento, el in ET.iterparse(str(xml_path), events=("start", "end")):
+        if evento == "start":
+            nivel += 1
+            # el primer hijo confirma que el padre no es hoja; en este punto
+            # el texto del padre ya está completo
+            if 0 < nivel <= limite and not abiertos[-1][1]:
+                out.write(_abrir(abiertos[-1][0]))
+                abiertos[-1][1] = True
+            if nivel < limite:
+                abiertos.append([el, False])
+            continue
+
+        if nivel < limite:
+            _, abierto = abiertos.pop()
+            out.write(CIERRE if abierto else _hoja(el))
+        elif nivel == limite:
+            if len(el):
+                out.write(_diferido(el, chunks))
+                chunks += 1
+            else:
+                out.write(_hoja(el))
+
+        if nivel <= limite:
+            if abiertos:
+                abiertos[-1][0].remove(el)
+            el.clear()
+        nivel -= 1
 
-    tree = ET.parse(str(path))
-    root = tree.getroot()
-    html_body = generar_html(root)
+    return chunks
 
-    html_output = f"""
-    <!DOCTYPE html>
+
+def _inicio(nombre):
+    return f"""<!DOCTYPE html>
     <html lang="es">
     <head>
         <meta charset="utf-8">
@@ -125,53 +200,138 @@ def main():
         </style>
     </head>
     <body>
-        <h1>Visor XML Local - {html.escape(path.name)}</h1>
+        <h1>Visor XML Local - {html.escape(nombre)}</h1>
         <div class="botones">
             <button onclick="expandAll()">Expandir todo</button>
             <button onclick="collapseAll()">Colapsar todo</button>
         </div>
-        <ul id="myUL">{html_body}</ul>
+        <ul id="myUL">
+"""
+
+
+FIN = """        </ul>
         <script>
-            const togglers = document.getElementsByClassName("caret");
-            for (let i = 0; i < togglers.length; i++) {{
-                togglers[i].addEventListener("click", function() {{
-                    const nested = this.parentElement.querySelector(".nested");
-                    if (nested) {{
-                        nested.classList.toggle("active");
-                        this.classList.toggle("caret-down");
-                    }}
-                }});
-            }}
-            function expandAll() {{
+            // los nodos diferidos se arman desde su bloque JSON al expandirlos
+            const chunks = new Map();
+
+            function datosChunk(id) {
+                if (!chunks.has(id)) {
+                    const nodos = JSON.parse(document.getElementById("c" + id).textContent);
+                    const hijos = nodos.map(() => []);
+                    for (let i = 1; i < nodos.length; i++) {
+                        hijos[nodos[i][3]].push(i);
+                    }
+                    chunks.set(id, {nodos, hijos});
+                }
+                return chunks.get(id);
+            }
+
+            function esc(texto) {
+                return texto.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;")
+                            .replace(/"/g, "&quot;").replace(/'/g, "&#x27;");
+            }
+
+            function atributos(attrs) {
+                let salida = "";
+                for (const k in attrs || {}) {
+                    salida += `<div class='atributo'>@${esc(k)} = '${esc(attrs[k])}'</div>`;
+                }
+                return salida;
+            }
+
+            function cargar(caret) {
+                const id = caret.dataset.chunk;
+                const n = Number(caret.dataset.nodo);
+                const {nodos, hijos} = datosChunk(id);
+                let salida = atributos(nodos[n][2]);
+                for (const h of hijos[n]) {
+                    const [tag, texto, attrs] = nodos[h];
+                    const valor = ": <span class='valor'>" + (texto ? esc(texto) : "null") + "</span>";
+                    if (hijos[h].length) {
+                        salida += `<li><span class="caret" data-chunk="${id}" data-nodo="${h}">${esc(tag)}${valor}</span><ul class="nested"></ul></li>`;
+                    } else {
+                        salida += `<li><span class='leaf'>${esc(tag)}${valor}</span>${atributos(attrs)}</li>`;
+                    }
+                }
+                caret.parentElement.querySelector(".nested").innerHTML = salida;
+                caret.removeAttribute("data-chunk");
+            }
+
+            document.getElementById("myUL").addEventListener("click", function(e) {
+                const caret = e.target.closest(".caret");
+                if (!caret) return;
+                if (caret.dataset.chunk !== undefined) cargar(caret);
+                const nested = caret.parentElement.querySelector(".nested");
+                if (nested) {
+                    nested.classList.toggle("active");
+                    caret.classList.toggle("caret-down");
+                }
+            });
+
+            function expandAll() {
+                // carga primero todos los diferidos (nivel por nivel)
+                let pendientes = document.querySelectorAll(".caret[data-chunk]");
+                while (pendientes.length) {
+                    pendientes.forEach(cargar);
+                    pendientes = document.querySelectorAll(".caret[data-chunk]");
+                }
                 const all = document.getElementsByClassName('nested');
-                for (let i = 0; i < all.length; i++) {{
+                for (let i = 0; i < all.length; i++) {
                     all[i].classList.add('active');
-                }}
+                }
                 const carets = document.getElementsByClassName('caret');
-                for (let i = 0; i < carets.length; i++) {{
+                for (let i = 0; i < carets.length; i++) {
                     carets[i].classList.add('caret-down');
-                }}
-            }}
-            function collapseAll() {{
+                }
+            }
+            function collapseAll() {
                 const all = document.getElementsByClassName('nested');
-                for (let i = 0; i < all.length; i++) {{
+                for (let i = 0; i < all.length; i++) {
                     all[i].classList.remove('active');
-                }}
+                }
                 const carets = document.getElementsByClassName('caret');
-                for (let i = 0; i < carets.length; i++) {{
+                for (let i = 0; i < carets.length; i++) {
                     carets[i].classList.remove('caret-down');
-                }}
-            }}
+                }
+            }
         </script>
     </body>
     </html>
-    """
+"""
+
+
+def generar_visor(xml_path, output_file, niveles=None):
+    """Escribe el HTML del visor directo al disco. Regresa los bloques diferidos."""
+    with open(output_file, "w", encoding="utf-8") as out:
+        out.write(_inicio(Path(xml_path).name))
+        chunks = escribir_arbol(xml_path, out, niveles)
+        out.write(FIN)
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("xml", help="archivo XML")
+    parser.add_argument("--niveles", type=int, help="niveles en HTML; los demás se cargan al expandir")
+    parser.add_argument("--completo", action="store_true", help="todo el árbol en HTML (sin modo lazy)")
+    args = parser.parse_args()
+
+    path = Path(args.xml)
+    if not path.exists():
+        print(f"❌ Archivo no encontrado: {path}")
+        sys.exit(1)
+
+    niveles = args.niveles
+    if niveles is None and not args.completo and path.stat().st_size > UMBRAL_LAZY:
+        niveles = NIVELES_LAZY
 
     # ✅ Guardar concatenando nombre del XML
     output_file = path.stem + "_viewer.html"
-    Path(output_file).write_text(html_output, encoding="utf-8")
+    chunks = generar_visor(path, output_file, niveles)
 
     print(f"✅ Archivo generado: {output_file}")
+    if chunks:
+        print(f"🗂️  Modo lazy: {niveles} niveles en HTML, {chunks} subárboles se cargan al expandir")
     print("🌐 Ábrelo en tu navegador (sin conexión).")
 
 if __name__ == "__main__":
@@ -11,19 +11,26 @@ Convierte un pedimento XML en un Excel con:
 
 Uso:
     python3 pedimento_excel_full_extended.py pedimento.xml
+    python3 pedimento_excel_full_extended.py pedimento.xml --base FLETES=peso --base SEGUROS=valor_dolares
 
 Resultado:
     pedimento_full_extended.xlsx
 """
 
+import argparse
 import sys
 import xml.etree.ElementTree as ET
 from pathlib import Path
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
 
-from PedimentoBuilder.builder import get
+# builder.py importa sus módulos hermanos (domain) por nombre
+sys.path.insert(0, str(Path(__file__).resolve().parent / "PedimentoBuilder"))
+from builder import get
+from prorrateo import BASES, prorratear
 
 
 # ============================================================
@@ -35,33 +42,66 @@ def find_text(element, path):
     return el.text.strip() if el is not None and el.text else ""
 
 
-def aplicar_formato_excel(path_excel):
-    """Aplica formato general a todas las hojas del Excel."""
-    wb = load_workbook(path_excel)
+def estilos_excel(wb):
+    """Registra en el libro los estilos compartidos de todas las hojas."""
     border = Border(left=Side(style="thin"), right=Side(style="thin"),
                     top=Side(style="thin"), bottom=Side(style="thin"))
-    header_fill = PatternFill("solid", fgColor="D9E1F2")
-    bold = Font(bold=True)
 
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        ws.freeze_panes = "A2"
-
-        for col in ws.columns:
-            ws.column_dimensions[col[0].column_letter].width = 22
-
-        for cell in ws[1]:
-            cell.font = bold
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            cell.border = border
-
-        for row in ws.iter_rows(min_row=2):
-            for cell in row:
-                cell.border = border
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-    wb.save(path_excel)
+    encabezado = NamedStyle(
+        "encabezado",
+        font=Font(bold=True),
+        fill=PatternFill("solid", fgColor="D9E1F2"),
+        alignment=Alignment(horizontal="center", vertical="center"),
+        border=border,
+    )
+    celda = NamedStyle(
+        "celda",
+        alignment=Alignment(wrap_text=True, vertical="top"),
+        border=border,
+    )
+    wb.add_named_style(encabezado)
+    wb.add_named_style(celda)
+
+
+def escribir_hoja(wb, nombre, df):
+    """Escribe un DataFrame como hoja ya formateada, en una sola pasada:
+    encabezado congelado, ancho 22 y bordes en todas las celdas."""
+    ws = wb.create_sheet(nombre)
+    ws.freeze_panes = "A2"
+
+    for col in range(1, len(df.columns) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 22
+
+    # una hoja sin columnas conserva A1 vacía con estilo de encabezado
+    encabezado = []
+    for col_name in list(df.columns) or [None]:
+        cell = WriteOnlyCell(ws, value=col_name)
+        cell.style = "encabezado"
+        encabezado.append(cell)
+    ws.append(encabezado)
+
+    # una celda con estilo por columna; el writer la serializa al agregar
+    # la fila, así que se reutiliza en todas las filas
+    celdas = []
+    for _ in df.columns:
+        cell = WriteOnlyCell(ws)
+        cell.style = "celda"
+        celdas.append(cell)
+
+    for row in df.itertuples(index=False):
+        for cell, value in zip(celdas, row):
+            cell.value = None if pd.isna(value) else value
+        ws.append(celdas)
+
+
+def exportar_excel(output_xlsx, hojas):
+    """Genera el Excel con formato en una sola escritura (sin reabrirlo).
+    hojas: lista de (nombre, DataFrame)."""
+    wb = Workbook(write_only=True)
+    estilos_excel(wb)
+    for nombre, df in hojas:
+        escribir_hoja(wb, nombre, df)
+    wb.save(output_xlsx)
 
 
 # ============================================================
@@ -113,6 +153,7 @@ def extraer_fracciones(root):
         num_frac = find_text(fr, "NumeroFraccion")
         descripcion = find_text(fr, "Descripcion")
         cantidad_fac = float(find_text(fr, "CantidadFactura") or 0)
+        cantidad_tarifa = float(find_text(fr, "CantidadTarifa") or 0)
         unidad_fac = find_text(fr, "UnidadFactura")
 
         if num_frac:
@@ -121,6 +162,7 @@ def extraer_fracciones(root):
                 "Descripcion": descripcion,
                 "CantidadFactura": cantidad_fac,
                 "UnidadFactura": unidad_fac,
+                "CantidadTarifa": cantidad_tarifa,
                 "ValorAduana": valor_aduana,
                 "ValorDolares": valor_dolares,
             })
@@ -181,18 +223,39 @@ def extraer_impuestos_gastos(root):
     return pd.DataFrame(regs)
 
 
-def prorrateo(df_fracs, df_regs):
-    """Distribuye gastos proporcionalmente al valor en aduana."""
+# Base con que se reparte cada gasto (Concepto de OtrosPagos, en
+# mayúsculas); los que no aparecen van por valor en aduana.
+# Bases: valor_aduana, cantidad, peso, valor_dolares
+BASES_GASTO = {}
+
+
+def bases_fracciones(df_fracs):
+    """Columnas de la hoja Fracciones que sirven como base de prorrateo.
+    El XML no trae peso por fracción: se usa la cantidad en UMT
+    (CantidadTarifa), que para la mayoría de las fracciones es kg."""
+    return {
+        "valor_aduana": df_fracs["ValorAduana"].to_numpy(dtype=float),
+        "cantidad": df_fracs["CantidadFactura"].to_numpy(dtype=float),
+        "peso": df_fracs["CantidadTarifa"].to_numpy(dtype=float),
+        "valor_dolares": df_fracs["ValorDolares"].to_numpy(dtype=float),
+    }
+
+
+def prorrateo(df_fracs, df_regs, bases=None):
+    """Distribuye gastos entre las fracciones; cada concepto con su base
+    (BASES_GASTO, o bases si se pasa), por omisión el valor en aduana."""
     if df_regs.empty or df_fracs.empty:
         return df_fracs
 
     df = df_fracs.copy()
-    total_val_aduana = df["ValorAduana"].sum() or 1
-    df["GastoAsignado"] = 0.0
-
-    for _, reg in df_regs[df_regs["Tipo"] == "GASTO"].iterrows():
-        monto = reg["Importe"]
-        df["GastoAsignado"] += (df["ValorAduana"] / total_val_aduana) * monto
+    gastos = df_regs[df_regs["Tipo"] == "GASTO"]
+    asignado, _ = prorratear(
+        bases_fracciones(df),
+        gastos["Concepto"].str.upper().to_numpy(),
+        gastos["Importe"].to_numpy(dtype=float),
+        reglas=BASES_GASTO if bases is None else bases,
+    )
+    df["GastoAsignado"] = asignado
 
     df["CostoTotal"] = df["ValorAduana"] + df["GastoAsignado"]
     df["CostoUnitario"] = df["CostoTotal"] / df["CantidadFactura"].replace(0, 1)
@@ -202,8 +265,26 @@ def prorrateo(df_fracs, df_regs):
 # ============================================================
 # 🔹 PROGRAMA PRINCIPAL
 # ============================================================
+def leer_bases(valores):
+    """["FLETES=peso", ...] -> {"FLETES": "peso"}"""
+    bases = dict(BASES_GASTO)
+    for valor in valores:
+        concepto, _, base = valor.partition("=")
+        if base not in BASES:
+            raise SystemExit(f"❌ Base inválida en {valor!r} (usar: {', '.join(BASES)})")
+        bases[concepto.strip().upper()] = base
+    return bases
+
+
 def main():
-    input_file = sys.argv[1] if len(sys.argv) > 1 else "5004477.xml"
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("xml", nargs="?", default="5004477.xml", help="pedimento XML")
+    parser.add_argument("--base", action="append", default=[], metavar="CONCEPTO=BASE",
+                        help=f"base de prorrateo de un gasto ({', '.join(BASES)})")
+    args = parser.parse_args()
+
+    input_file = args.xml
+    bases = leer_bases(args.base)
     path = Path(input_file)
 
     if not path.exists():
@@ -220,18 +301,19 @@ def main():
     df_facturas = extraer_facturas(root)
     df_fracs, df_items = extraer_fracciones(root)
     df_regs = extraer_impuestos_gastos(root)
-    df_fracs_cost = prorrateo(df_fracs, df_regs)
+    df_fracs_cost = prorrateo(df_fracs, df_regs, bases)
 
     # Generar Excel
     output_xlsx = path.stem + "_full_extended.xlsx"
-    with pd.ExcelWriter(output_xlsx, engine="openpyxl") as writer:
-        df_resumen.to_excel(writer, index=False, sheet_name="Resumen")
-        df_facturas.to_excel(writer, index=False, sheet_name="Facturas")
-        df_fracs_cost.to_excel(writer, index=False, sheet_name="Fracciones")
-        df_items.to_excel(writer, index=False, sheet_name="ItemsDetallados")
-        df_regs.to_excel(writer, index=False, sheet_name="ImpuestosGastos")
-
-    aplicar_formato_excel(output_xlsx)
+    exportar_excel(output_xlsx, [
+        ("Resumen", df_resumen),
+        ("Facturas", df_facturas),
+        # CantidadTarifa solo se lee como base "peso" del prorrateo; la
+        # hoja Fracciones conserva sus columnas de siempre
+        ("Fracciones", df_fracs_cost.drop(columns="CantidadTarifa", errors="ignore")),
+        ("ItemsDetallados", df_items),
+        ("ImpuestosGastos", df_regs),
+    ])
     print(f"✅ Archivo Excel generado correctamente: {output_xlsx}")
 
 